@@ -0,0 +1,196 @@
+import pandas as pd
+import argparse
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import metricas
+from analizador_acciones import AnalizadorAccion, JUECES, nivel_riesgo
+from exportacion import abrir_escritor
+from proveedores_datos import (ProveedorCache, ProveedorConReintentos, ProveedorYFinance, LimitadorTasa,
+                               MAX_REINTENTOS, RUTA_CACHE_POR_DEFECTO, plazo_descargas, tiempo_restante)
+
+# ==============================================================================
+# SECCIÓN 1: CONFIGURACIÓN DEL MODO LOTE
+# ==============================================================================
+MAX_TRABAJADORES = 8
+LLAMADAS_POR_SEGUNDO = 5.0
+TIMEOUT_POR_SIMBOLO = 120
+COLUMNAS_RANKING = ['simbolo', 'nombre', 'sector', 'precio_actual', 'probabilidad_base', 'factor_penalizacion',
+                    'probabilidad_ajustada', 'nivel_riesgo', 'recomendacion', 'estado', 'error', 'segundos']
+
+
+# ==============================================================================
+# SECCIÓN 2: ANÁLISIS CONCURRENTE DE UN UNIVERSO DE SÍMBOLOS
+# ==============================================================================
+def crear_proveedor_lote(llamadas_por_segundo=LLAMADAS_POR_SEGUNDO, max_reintentos=MAX_REINTENTOS, ruta_cache=RUTA_CACHE_POR_DEFECTO, tam_lote_precios=None):
+    # El limitador y los reintentos van por debajo de la cache: los aciertos locales no consumen cuota.
+    limitador = LimitadorTasa(llamadas_por_segundo)
+    red = ProveedorConReintentos(ProveedorYFinance(), limitador, max_reintentos)
+    if tam_lote_precios:
+        # Precios en lotes con yf.download; lo que no llegue en su lote se pide suelto (con reintentos) a `red`.
+        from descarga_lotes import ProveedorPreciosLote
+        red = ProveedorPreciosLote(red, tam_lote_precios, limitador=limitador)
+    return ProveedorCache(red, ruta=ruta_cache)
+
+
+def _fila_vacia(simbolo, estado, error=None, segundos=0.0):
+    fila = dict.fromkeys(COLUMNAS_RANKING)
+    fila.update(simbolo=simbolo, estado=estado, error=error, segundos=round(segundos, 3))
+    return fila
+
+
+@metricas.medido('simbolo')
+def _analizar_simbolo(simbolo, proveedor, inicios, jueces=None, memo=None, timeout=None, indice_percentiles=None):
+    inicios[simbolo] = time.monotonic()
+    analizador = AnalizadorAccion(simbolo, proveedor=proveedor, indice_percentiles=indice_percentiles)
+    # Las descargas del símbolo comparten su plazo: una llamada colgada a yfinance suelta el trabajador al vencer.
+    with plazo_descargas(timeout):
+        if not analizador.datos_completos:
+            segundos = time.monotonic() - inicios[simbolo]
+            if timeout and tiempo_restante() <= 0:
+                metricas.contar('simbolos_timeout')
+                return _fila_vacia(simbolo, 'timeout', f"Más de {timeout}s", segundos), None
+            return _fila_vacia(simbolo, 'sin_datos', segundos=segundos), None
+        # Un símbolo cuya info no llegó en la carga inicial del índice entra ahora (si ya estaba, no cambia nada).
+        if indice_percentiles is not None: indice_percentiles.actualizar(simbolo, analizador.info)
+        if memo is not None:
+            from memo_etapas import ejecutar_memoizado
+            ejecutar_memoizado(analizador, memo)
+        else: analizador.ejecutar_analisis(jueces)
+    # Solo se conserva el registro compacto; los DataFrames del analizador se liberan al salir.
+    r = analizador.resultado(liberar=True)
+    # Un dataset que no se pudo descargar ni con reintentos no es "sin datos", y con solo algunos jueces la puntuación
+    # no es comparable: en ambos casos la fila queda fuera del ranking.
+    motivos = []
+    if r.datasets_fallidos: motivos.append(f"Fallo al obtener: {', '.join(r.datasets_fallidos)}")
+    if r.jueces_omitidos: motivos.append(f"Jueces no ejecutados: {', '.join(r.jueces_omitidos)}")
+    parcial = bool(motivos)
+    if parcial: metricas.contar('simbolos_parciales')
+    return {
+        'simbolo': simbolo, 'nombre': r.nombre, 'sector': r.sector,
+        'precio_actual': r.precio_actual, 'probabilidad_base': r.probabilidad_base, 'factor_penalizacion': r.factor_penalizacion,
+        'probabilidad_ajustada': round(r.probabilidad_ajustada, 2), 'nivel_riesgo': nivel_riesgo(r.factor_penalizacion)[0],
+        'recomendacion': r.recomendacion, 'estado': 'parcial' if parcial else 'ok',
+        'error': '; '.join(motivos) if parcial else None, 'segundos': round(time.monotonic() - inicios[simbolo], 3)
+    }, r
+
+
+def analizar_universo(simbolos, proveedor=None, max_trabajadores=MAX_TRABAJADORES, timeout_por_simbolo=TIMEOUT_POR_SIMBOLO, jueces=None, escritor=None, memo=None,
+                      indice_percentiles=None):
+    """Analiza los símbolos en paralelo y devuelve (ranking por probabilidad_ajustada, estadísticas).
+    Con `escritor` (exportacion.abrir_escritor) cada ResultadoAnalisis se exporta en cuanto termina.
+    Con `memo` (memo_etapas.CacheEtapas) cada etapa se reutiliza si sus entradas y su configuración no cambiaron.
+    Con `indice_percentiles` (percentiles_sector.IndicePercentiles) se llena primero con la info de todo el lote y el juez
+    fundamental puntúa contra los cuartiles actuales de cada sector."""
+    if memo is not None and jueces is not None: raise ValueError("La memorización de etapas requiere el análisis completo (sin jueces).")
+    simbolos = list(dict.fromkeys(s.strip().upper() for s in simbolos if s and s.strip()))
+    proveedor = proveedor or crear_proveedor_lote()
+    inicios, filas = {}, []
+    inicio_lote = time.monotonic()
+    proveedor.precargar(simbolos, 'precios_historicos')
+    executor = ThreadPoolExecutor(max_workers=max_trabajadores, thread_name_prefix='analizador')
+    try:
+        if indice_percentiles is not None and (jueces is None or 'fundamental' in jueces):
+            # Antes de puntuar a nadie: los primeros símbolos no deben ver un sector a medio llenar.
+            indice_percentiles.cargar_proveedor(proveedor, simbolos, max_trabajadores, timeout_por_simbolo)
+            logging.info(f"Umbrales adaptativos: {len(indice_percentiles)} símbolos en el índice de percentiles.")
+        logging.info(f"Analizando {len(simbolos)} símbolos con {max_trabajadores} trabajadores...")
+        pendientes = {executor.submit(_analizar_simbolo, s, proveedor, inicios, jueces, memo, timeout_por_simbolo, indice_percentiles): s
+                      for s in simbolos}
+        while pendientes:
+            terminados, _ = wait(pendientes, timeout=1.0, return_when=FIRST_COMPLETED)
+            for futuro in terminados:
+                simbolo = pendientes.pop(futuro)
+                try:
+                    fila, resultado = futuro.result()
+                    filas.append(fila)
+                    if escritor is not None and resultado is not None: escritor.escribir(resultado)
+                except Exception as e:
+                    logging.error(f"Fallo analizando {simbolo}: {e}")
+                    metricas.contar('simbolos_fallidos')
+                    filas.append(_fila_vacia(simbolo, 'error', str(e), time.monotonic() - inicios.get(simbolo, inicio_lote)))
+            # Un símbolo lento se abandona para no bloquear el resto del lote; su hilo queda libre en cuanto vence el
+            # plazo de sus descargas (plazo_descargas), aunque yfinance no responda.
+            ahora = time.monotonic()
+            for futuro, simbolo in list(pendientes.items()):
+                if simbolo in inicios and ahora - inicios[simbolo] > timeout_por_simbolo:
+                    logging.warning(f"{simbolo} superó {timeout_por_simbolo}s. Se descarta del lote.")
+                    pendientes.pop(futuro)
+                    metricas.contar('simbolos_timeout')
+                    filas.append(_fila_vacia(simbolo, 'timeout', f"Más de {timeout_por_simbolo}s", ahora - inicios[simbolo]))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        proveedor.descartar_precarga()
+    duracion = time.monotonic() - inicio_lote
+    ranking = pd.DataFrame(filas, columns=COLUMNAS_RANKING)
+    # Solo las filas 'ok' se ordenan por puntuación; parciales, sin datos, errores y timeouts van detrás.
+    ranking['_orden'] = ranking['estado'] != 'ok'
+    ranking = ranking.sort_values(['_orden', 'probabilidad_ajustada'], ascending=[True, False], na_position='last')
+    ranking = ranking.drop(columns='_orden').reset_index(drop=True)
+    ranking.index += 1
+    estadisticas = {
+        'simbolos': len(simbolos), 'correctos': int((ranking['estado'] == 'ok').sum()),
+        'parciales': int((ranking['estado'] == 'parcial').sum()), 'fallidos': int((~ranking['estado'].isin(['ok', 'parcial'])).sum()),
+        'segundos': round(duracion, 2),
+        'simbolos_por_segundo': round(len(simbolos) / duracion, 2) if duracion > 0 else None
+    }
+    logging.info(f"Lote terminado: {estadisticas['correctos']}/{len(simbolos)} correctos ({estadisticas['parciales']} parciales) en {duracion:.1f}s "
+                 f"({estadisticas['simbolos_por_segundo']} símbolos/s).")
+    return ranking, estadisticas
+
+
+def leer_simbolos(ruta):
+    with open(ruta, encoding='utf-8') as f:
+        return [linea.split('#', 1)[0].strip() for linea in f if linea.split('#', 1)[0].strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analiza un universo de acciones en paralelo y las ordena por puntuación ajustada.")
+    parser.add_argument('simbolos', nargs='*', help="Símbolos a analizar (p. ej. AAPL MSFT KO).")
+    parser.add_argument('--archivo', help="Fichero con un símbolo por línea.")
+    parser.add_argument('--trabajadores', type=int, default=MAX_TRABAJADORES)
+    parser.add_argument('--llamadas-por-segundo', type=float, default=LLAMADAS_POR_SEGUNDO)
+    parser.add_argument('--reintentos', type=int, default=MAX_REINTENTOS)
+    parser.add_argument('--timeout', type=float, default=TIMEOUT_POR_SIMBOLO, help="Segundos máximos por símbolo.")
+    parser.add_argument('--salida', help="Ruta CSV donde guardar el ranking.")
+    parser.add_argument('--exportar', help="Exporta un registro completo por símbolo (.parquet, .arrow, .csv o .jsonl).")
+    parser.add_argument('--metricas', nargs='*', metavar='SUMIDERO',
+                        help="Activa la instrumentación por etapa; sumideros opcionales 'jsonl:RUTA' y/o 'prometheus:RUTA'.")
+    parser.add_argument('--lote-precios', type=int, metavar='N', help="Descarga los precios de N en N símbolos con una sola llamada (yf.download).")
+    parser.add_argument('--memo', nargs='?', const='', metavar='RUTA',
+                        help="Reutiliza salidas de etapas memorizadas en disco (memo_etapas.py; sin RUTA, la de por defecto).")
+    parser.add_argument('--jueces', nargs='+', choices=JUECES, help="Ejecuta solo estos jueces (descarga solo los datos que necesitan).")
+    parser.add_argument('--umbrales-adaptativos', action='store_true',
+                        help="Umbrales del juez fundamental según los cuartiles del sector en el propio lote (percentiles_sector.py).")
+    args = parser.parse_args()
+    simbolos = args.simbolos + (leer_simbolos(args.archivo) if args.archivo else [])
+    if not simbolos: parser.error("Indica al menos un símbolo o un --archivo.")
+    if args.metricas is not None: metricas.activar(*(metricas.crear_sumidero(e) for e in args.metricas))
+    proveedor = crear_proveedor_lote(args.llamadas_por_segundo, args.reintentos, tam_lote_precios=args.lote_precios)
+    escritor = abrir_escritor(args.exportar) if args.exportar else None
+    memo = None
+    if args.memo is not None:
+        if args.jueces: parser.error("--memo no se combina con --jueces.")
+        from memo_etapas import CacheEtapas
+        memo = CacheEtapas(args.memo) if args.memo else CacheEtapas()
+    indice = None
+    if args.umbrales_adaptativos:
+        from percentiles_sector import IndicePercentiles
+        indice = IndicePercentiles()
+    try:
+        ranking, estadisticas = analizar_universo(simbolos, proveedor, args.trabajadores, args.timeout, args.jueces, escritor, memo, indice)
+    finally:
+        if escritor is not None: escritor.cerrar()
+    registro = metricas.desactivar()
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(ranking[['simbolo', 'nombre', 'sector', 'probabilidad_ajustada', 'nivel_riesgo', 'recomendacion', 'estado']].to_string())
+    print(f"\n{estadisticas['correctos']}/{estadisticas['simbolos']} símbolos analizados en {estadisticas['segundos']}s "
+          f"({estadisticas['simbolos_por_segundo']} símbolos/s).")
+    if registro is not None:
+        print("\nTiempo por etapa (las etapas anidadas incluyen a las internas):")
+        print(registro.resumen().to_string(index=False))
+        print(f"Contadores: {dict(sorted(registro.contadores.items()))}")
+    if memo is not None:
+        print("\nMemo de etapas (ratio de aciertos por etapa):")
+        print(memo.ratios().to_string(index=False))
+    if args.salida: ranking.to_csv(args.salida, index_label='posicion')
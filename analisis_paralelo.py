@@ -0,0 +1,178 @@
+import numpy as np
+import pandas as pd
+import os
+import argparse
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from analizador_acciones import AnalizadorAccion, JUECES, RECOMENDACIONES, recomendacion_automatica
+from proveedores_datos import ProveedorMemoria, DATASETS, obtener_proveedor_por_defecto
+
+# ==============================================================================
+# SECCIÓN 1: CONFIGURACIÓN DEL MODO MULTIPROCESO
+# ==============================================================================
+TAM_LOTE = 50
+CAMPOS_REGISTRO = ('simbolo', *JUECES, 'probabilidad_base', 'factor_penalizacion', 'probabilidad_ajustada', 'recomendacion')
+_CATEGORIA_POR_TEXTO = {texto: categoria for categoria, texto in RECOMENDACIONES.items()}
+
+
+# ==============================================================================
+# SECCIÓN 2: PRECIOS EN MEMORIA COMPARTIDA
+# ==============================================================================
+class PreciosCompartidos:
+    """Cierres y fechas de todos los símbolos en dos bloques contiguos de memoria compartida.
+
+    Los procesos hijos solo reciben el nombre de los bloques y los offsets, y leen cada histórico
+    como una vista sobre el bloque: los DataFrames de precios nunca se serializan.
+    """
+
+    def __init__(self, historicos):
+        self.simbolos = list(historicos)
+        longitudes = np.array([len(h) for h in historicos.values()], dtype=np.int64)
+        self.offsets = np.concatenate([[0], np.cumsum(longitudes)])
+        total = max(int(self.offsets[-1]), 1)
+        self._shm_cierres = shared_memory.SharedMemory(create=True, size=total * 8)
+        self._shm_fechas = shared_memory.SharedMemory(create=True, size=total * 8)
+        cierres = np.ndarray((total,), dtype=np.float64, buffer=self._shm_cierres.buf)
+        fechas = np.ndarray((total,), dtype=np.int64, buffer=self._shm_fechas.buf)
+        self.zonas = []
+        for i, hist in enumerate(historicos.values()):
+            inicio, fin = self.offsets[i], self.offsets[i + 1]
+            indice = pd.DatetimeIndex(hist.index)
+            cierres[inicio:fin] = hist['Close'].to_numpy(dtype=np.float64)
+            fechas[inicio:fin] = (indice.tz_convert('UTC') if indice.tz is not None else indice).as_unit('ns').asi8
+            self.zonas.append(str(indice.tz) if indice.tz is not None else None)
+
+    def descriptor(self):
+        return {'cierres': self._shm_cierres.name, 'fechas': self._shm_fechas.name, 'offsets': self.offsets, 'zonas': self.zonas}
+
+    def cerrar(self):
+        for shm in (self._shm_cierres, self._shm_fechas):
+            shm.close()
+            shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+_compartido = {}
+
+def _inicializar_trabajador(descriptor, indice_percentiles=None):
+    # Los hijos comparten el resource_tracker del proceso principal, que es quien hace unlink al terminar.
+    # El índice de percentiles llega serializado una vez por proceso, no con cada lote.
+    logging.getLogger().setLevel(logging.WARNING)
+    shm_cierres = shared_memory.SharedMemory(name=descriptor['cierres'])
+    shm_fechas = shared_memory.SharedMemory(name=descriptor['fechas'])
+    total = max(int(descriptor['offsets'][-1]), 1)
+    _compartido.update(
+        shm=(shm_cierres, shm_fechas), offsets=descriptor['offsets'], zonas=descriptor['zonas'],
+        cierres=np.ndarray((total,), dtype=np.float64, buffer=shm_cierres.buf),
+        fechas=np.ndarray((total,), dtype=np.int64, buffer=shm_fechas.buf), indice_percentiles=indice_percentiles,
+    )
+
+
+def _precios_compartidos(indice):
+    inicio, fin = _compartido['offsets'][indice], _compartido['offsets'][indice + 1]
+    fechas = pd.DatetimeIndex(_compartido['fechas'][inicio:fin].view('datetime64[ns]'), tz='UTC')
+    zona = _compartido['zonas'][indice]
+    fechas = fechas.tz_convert(zona) if zona else fechas.tz_localize(None)
+    return pd.DataFrame({'Close': _compartido['cierres'][inicio:fin]}, index=fechas, copy=False)
+
+
+# ==============================================================================
+# SECCIÓN 3: TRABAJO DE CADA PROCESO Y REGISTROS COMPACTOS
+# ==============================================================================
+def registro_analizador(analizador):
+    sector = analizador.info.get('sector', 'N/A')
+    texto = recomendacion_automatica(analizador.probabilidad_ajustada, analizador.factor_penalizacion, sector)
+    return (analizador.simbolo, *(float(analizador.scores[j][0]) for j in JUECES), float(analizador.probabilidad_base),
+            float(analizador.factor_penalizacion), float(analizador.probabilidad_ajustada), _CATEGORIA_POR_TEXTO[texto])
+
+
+def _analizar_lote(tareas):
+    registros = []
+    for indice, simbolo, otros in tareas:
+        try:
+            datos = dict(otros, precios_historicos=_precios_compartidos(indice))
+            analizador = AnalizadorAccion(simbolo, proveedor=ProveedorMemoria({simbolo: datos}), indice_percentiles=_compartido['indice_percentiles'])
+            if not analizador.datos_completos: continue
+            analizador.ejecutar_analisis()
+            registros.append(registro_analizador(analizador))
+        except Exception as e:
+            logging.error(f"Fallo analizando {simbolo} en el proceso {os.getpid()}: {e}")
+    return registros
+
+
+def analizar_datos_paralelo(datos_por_simbolo, procesos=None, tam_lote=TAM_LOTE, umbrales_adaptativos=False):
+    """Analiza datos ya descargados ({simbolo: {dataset: valor}}) repartiendo los símbolos entre procesos.
+    Con umbrales_adaptativos, el juez fundamental usa los cuartiles por sector de la info de todo el universo."""
+    validos = {s: d for s, d in datos_por_simbolo.items()
+               if d.get('info') and d['info'].get('marketCap') is not None
+               and d.get('precios_historicos') is not None and not d['precios_historicos'].empty}
+    if not validos: return pd.DataFrame(columns=CAMPOS_REGISTRO)
+    procesos = procesos or os.cpu_count() or 1
+    indice = None
+    if umbrales_adaptativos:
+        from percentiles_sector import IndicePercentiles
+        indice = IndicePercentiles()
+        indice.cargar({s: d['info'] for s, d in validos.items()})
+    with PreciosCompartidos({s: d['precios_historicos'] for s, d in validos.items()}) as compartidos:
+        tareas = [(i, s, {k: v for k, v in d.items() if k != 'precios_historicos'}) for i, (s, d) in enumerate(validos.items())]
+        lotes = [tareas[i:i + tam_lote] for i in range(0, len(tareas), tam_lote)]
+        with ProcessPoolExecutor(max_workers=procesos, initializer=_inicializar_trabajador, initargs=(compartidos.descriptor(), indice)) as executor:
+            registros = [r for lote in executor.map(_analizar_lote, lotes) for r in lote]
+    return pd.DataFrame.from_records(registros, columns=CAMPOS_REGISTRO).set_index('simbolo')
+
+
+def analizar_universo_paralelo(simbolos, proveedor=None, procesos=None, tam_lote=TAM_LOTE, hilos_descarga=8, umbrales_adaptativos=False):
+    """Descarga con hilos (E/S) y analiza con procesos (CPU). Devuelve un registro por símbolo."""
+    proveedor = proveedor or obtener_proveedor_por_defecto()
+
+    def descargar(simbolo):
+        try:
+            return simbolo, {dataset: proveedor.obtener(simbolo, dataset) for dataset in DATASETS}
+        except Exception as e:
+            logging.error(f"No se pudieron obtener datos de {simbolo}: {e}")
+            return simbolo, {}
+
+    with ThreadPoolExecutor(max_workers=hilos_descarga) as executor:
+        datos = dict(executor.map(descargar, simbolos))
+    return analizar_datos_paralelo(datos, procesos, tam_lote, umbrales_adaptativos)
+
+
+# ==============================================================================
+# SECCIÓN 4: BENCHMARK DE ESCALADO
+# ==============================================================================
+def benchmark_escalado(n_simbolos=5000, lista_procesos=None, tam_lote=TAM_LOTE, semilla=0, umbrales_adaptativos=False):
+    from datos_sinteticos import GeneradorSintetico, simbolos_sinteticos
+    generador = GeneradorSintetico(semilla)
+    datos = {s: generador.datos_simbolo(s) for s in simbolos_sinteticos(n_simbolos)}
+    nucleos = os.cpu_count() or 1
+    lista_procesos = lista_procesos or sorted({1, 2, 4, 8, 16, 32, nucleos} & set(range(1, nucleos + 1)))
+    filas, base = [], None
+    for procesos in lista_procesos:
+        inicio = time.perf_counter()
+        registros = analizar_datos_paralelo(datos, procesos, tam_lote, umbrales_adaptativos)
+        segundos = time.perf_counter() - inicio
+        base = base or segundos
+        filas.append({'procesos': procesos, 'simbolos': len(registros), 'segundos': round(segundos, 2),
+                      'simbolos_por_segundo': round(len(registros) / segundos, 1),
+                      'aceleracion': round(base / segundos, 2), 'eficiencia': round(base / segundos / procesos, 2)})
+    return pd.DataFrame(filas)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Curva de escalado del análisis multiproceso sobre un universo sintético.")
+    parser.add_argument('--simbolos', type=int, default=5000)
+    parser.add_argument('--procesos', type=int, nargs='+', help="Números de procesos a medir (por defecto potencias de 2 hasta los núcleos).")
+    parser.add_argument('--tam-lote', type=int, default=TAM_LOTE)
+    parser.add_argument('--umbrales-adaptativos', action='store_true',
+                        help="Umbrales del juez fundamental según los cuartiles del sector en el universo (percentiles_sector.py).")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    print(f"Núcleos disponibles: {os.cpu_count()}")
+    print(benchmark_escalado(args.simbolos, args.procesos, args.tam_lote, umbrales_adaptativos=args.umbrales_adaptativos).to_string(index=False))
@@ -1,10 +1,11 @@
-import yfinance as yf
 import pandas as pd
-import pandas_ta as ta
 from datetime import datetime, timedelta
+import math
 import pytz
 import time
 import logging
+from proveedores_datos import obtener_proveedor_por_defecto, DATASETS
+from metricas import medir, medido, contar
 
 # ==============================================================================
 # SECCIÓN 0: CONFIGURACIÓN DE LOGGING
@@ -25,6 +26,9 @@ PONDERACION_CRECIMIENTO_DIV = 0.10
 PONDERACION_CRECIMIENTO_GENERAL = 0.10
 PONDERACION_CONFIANZA_MGMT = 0.05
 PONDERACION_TECNICA = 0.05
+JUECES = ('fundamental', 'consistencia_div', 'rendimiento_div_score', 'crecimiento_div_score', 'crecimiento_general', 'confianza_mgmt', 'tecnica')
+PONDERACIONES_JUECES = dict(zip(JUECES, [PONDERACION_FUNDAMENTAL, PONDERACION_CONSISTENCIA_DIV, PONDERACION_RENDIMIENTO_DIV, PONDERACION_CRECIMIENTO_DIV,
+                                         PONDERACION_CRECIMIENTO_GENERAL, PONDERACION_CONFIANZA_MGMT, PONDERACION_TECNICA]))
 SECTORES_CICLICOS = ['Energy', 'Basic Materials', 'Industrials', 'Consumer Cyclical']
 UMBRALES_POR_SECTOR = {
     'Technology': {'PE_BAJO': 20, 'PE_ALTO': 40, 'DEUDA_BAJA': 0.5, 'DEUDA_ALTA': 1.0, 'PB_BUENO': 5.0, 'PB_ALTO': 10.0},
@@ -53,57 +57,234 @@ FACTORES_PENALIZACION_ADAPTATIVOS = {
     "roe": [{"umbral": ROE_UMBRAL_ACEPTABLE, "factor": 0.94, "razon": f"Baja rentabilidad promedio (ROE 5 anos < {ROE_UMBRAL_ACEPTABLE:.0%}) (Moderado)"}],
     "deuda": [{"umbral": "tendencia_creciente", "factor": 0.95, "razon": "Tendencia de deuda creciente en 5 anos (Moderado)"}]
 }
+FACTOR_DIVIDENDO_JOVEN_NEGATIVO = 0.96
+FACTOR_PENALIZACION_MINIMO = 0.65
 CAGR_YEARS = 5
+# Filas de los estados financieros de yfinance actual -> etiqueta que leen las tendencias (la de versiones anteriores).
+ETIQUETAS_ESTADOS_ACTUALES = {
+    'Operating Cash Flow': 'Total Cash From Operating Activities',
+    'Capital Expenditure': 'Capital Expenditures',
+    'Stockholders Equity': 'Total Stockholder Equity',
+    'Total Liabilities Net Minority Interest': 'Total Liab',
+}
+# Qué lee cada valor derivado y cada juez. 'fecha' y 'anio' marcan cálculos que dependen del día/año en curso
+# (ventana de 12 meses del rendimiento, racha de dividendos y CAGR hasta el último año completo).
+DEPENDENCIAS = {
+    'precio_actual': ('precios_historicos',),
+    'hist_indicadores': ('precios_historicos',),
+    'tendencias': ('financials', 'cashflow', 'balance_sheet', 'dividendos', 'anio'),
+    'crecimiento_div_raw': ('tendencias', 'anio'),
+    'fundamental': ('info',),
+    'tecnica': ('hist_indicadores', 'precio_actual'),
+    'consistencia_div': ('tendencias',),
+    'rendimiento_div_score': ('dividendos', 'precio_actual', 'fecha'),
+    'crecimiento_div_score': ('info', 'crecimiento_div_raw', 'tendencias'),
+    'crecimiento_general': ('info',),
+    'confianza_mgmt': (),
+    'penalizacion': ('info', 'tendencias', 'crecimiento_div_raw'),
+}
 pd.set_option('future.no_silent_downcasting', True)
 
 
+def nivel_riesgo(factor_penalizacion):
+    if factor_penalizacion >= 0.98: return "Bajo", "[+]"
+    if factor_penalizacion >= 0.92: return "Moderado", "[!]"
+    if factor_penalizacion >= 0.85: return "Alto", "[!!]"
+    return "Critico", "[!!!]"
+
+RECOMENDACIONES = {
+    'COMPRA CÍCLICA': "COMPRA CÍCLICA: Buen momento del ciclo.",
+    'COMPRA FUERTE': "COMPRA FUERTE: Perfil ideal según tu estrategia.",
+    'COMPRA POTENCIAL': "COMPRA POTENCIAL: Requiere análisis adicional.",
+    'ZONA DE MONITOREO': "ZONA DE MONITOREO: No comprar aún, seguir evolución.",
+    'DESCARTAR': "DESCARTAR: No cumple criterios de inversión.",
+}
+# Con solo algunos jueces la puntuación no es comparable (otros pesos, sin penalización): no se recomienda nada.
+RECOMENDACION_PARCIAL = "PARCIAL: Solo se ejecutaron algunos jueces; sin recomendación."
+
+def recomendacion_automatica(score, factor_penalizacion, sector):
+    riesgo_txt, _ = nivel_riesgo(factor_penalizacion)
+    if sector in SECTORES_CICLICOS and score >= 60: return RECOMENDACIONES['COMPRA CÍCLICA']
+    if score >= 80 and riesgo_txt == 'Bajo': return RECOMENDACIONES['COMPRA FUERTE']
+    elif 70 <= score < 80 and riesgo_txt in ['Bajo', 'Moderado']: return RECOMENDACIONES['COMPRA POTENCIAL']
+    elif 55 <= score < 70: return RECOMENDACIONES['ZONA DE MONITOREO']
+    else: return RECOMENDACIONES['DESCARTAR']
+
+def indicadores_pandas_ta(hist_df):
+    import pandas_ta  # noqa: F401 (registra el accessor .ta; se importa solo si hace falta)
+    df_copy = hist_df.copy()
+    df_copy.ta.sma(length=50, append=True); df_copy.ta.sma(length=200, append=True)
+    df_copy.ta.rsi(append=True); df_copy.ta.macd(append=True)
+    for col in ['SMA_50', 'SMA_200', 'RSI_14', 'MACDh_12_26_9']:
+        if col not in df_copy.columns: df_copy[col] = pd.NA
+    return df_copy
+
+def etiquetas_canonicas(estado):
+    """Renombra las filas con nombre de yfinance actual a las etiquetas que leen las tendencias (si esas no están ya)."""
+    renombres = {actual: canonica for actual, canonica in ETIQUETAS_ESTADOS_ACTUALES.items() if actual in estado.index and canonica not in estado.index}
+    return estado.rename(index=renombres) if renombres else estado
+
+def tendencias_estados_financieros(financials, cashflow, balance_sheet):
+    """Métricas de tendencia (4 últimos ejercicios) que solo dependen de los estados financieros."""
+    tendencias = {}
+    financials_t = etiquetas_canonicas(financials.iloc[:, :4])
+    cashflow_t = etiquetas_canonicas(cashflow.iloc[:, :4])
+    balance_sheet_t = etiquetas_canonicas(balance_sheet.iloc[:, :4])
+    if 'Net Income' in financials_t.index: tendencias['anios_eps_neg'] = (financials_t.loc['Net Income'].fillna(0) < 0).sum()
+    if 'Total Cash From Operating Activities' in cashflow_t.index and 'Capital Expenditures' in cashflow_t.index:
+        fcf = cashflow_t.loc['Total Cash From Operating Activities'].fillna(0) - cashflow_t.loc['Capital Expenditures'].fillna(0)
+        tendencias['anios_fcf_neg'] = (fcf < 0).sum()
+    if 'Net Income' in financials_t.index and 'Total Stockholder Equity' in balance_sheet_t.index:
+        net_income_roe = financials_t.loc['Net Income'].fillna(0)
+        equity = balance_sheet_t.loc['Total Stockholder Equity'].replace(0, pd.NA).ffill().bfill()
+        if not equity.empty and equity.notna().all(): tendencias['roe_promedio_5a'] = (net_income_roe / equity).mean()
+    if 'Total Revenue' in financials_t.index:
+        ingresos = financials_t.loc['Total Revenue'].dropna()
+        if len(ingresos) > 1 and ingresos.iloc[-1] > 0: tendencias['ingresos_cagr_5a'] = ((ingresos.iloc[0] / ingresos.iloc[-1])**(1/len(ingresos))) - 1
+    if 'Total Liab' in balance_sheet_t.index:
+        deuda_total = balance_sheet_t.loc['Total Liab'].dropna()
+        if len(deuda_total) > 1: tendencias['deuda_creciente'] = deuda_total.iloc[0] > deuda_total.iloc[-1]
+    return tendencias
+
+
 # ==============================================================================
 # SECCIÓN 2: CLASE PRINCIPAL DEL ANALIZADOR
 # ==============================================================================
+class DatosAccion:
+    """Datos de un símbolo con la misma interfaz .get() que un dict; cada dataset se pide al proveedor la primera vez que se lee."""
+    _DERIVADOS = ('precio_actual', 'nombre', 'sector')
+
+    def __init__(self, simbolo, proveedor, info, precios_hist):
+        self.simbolo = simbolo
+        self.proveedor = proveedor
+        self._valores = {'info': info, 'precios_historicos': precios_hist}
+        self.fallidos = set()  # datasets cuya descarga falló (valen None, pero no porque no existan)
+
+    def _cargar(self, clave):
+        info = self._valores['info']
+        if clave == 'precio_actual': return self._valores['precios_historicos']['Close'].iloc[-1]
+        if clave == 'nombre': return info.get('longName', 'N/A')
+        if clave == 'sector': return info.get('sector', 'N/A')
+        try:
+            with medir(f"obtener.{clave}"):
+                return self.proveedor.obtener(self.simbolo, clave)
+        except Exception as e:
+            logging.error(f"Error obteniendo '{clave}' para {self.simbolo}: {e}")
+            contar('datasets_fallidos', dataset=clave)
+            self.fallidos.add(clave)
+            return None
+
+    def get(self, clave, defecto=None):
+        if clave not in self._valores:
+            if clave not in DATASETS and clave not in self._DERIVADOS: return defecto
+            self._valores[clave] = self._cargar(clave)
+        return self._valores[clave]
+
+    def __getitem__(self, clave):
+        return self.get(clave)
+
+    def __setitem__(self, clave, valor):
+        self._valores[clave] = valor
+        self.fallidos.discard(clave)
+
+    def cargados(self):
+        return [clave for clave in self._valores if clave not in self._DERIVADOS]
+
+
+_SIN_CARGAR = object()
+
+
 class AnalizadorAccion:
-    def __init__(self, simbolo):
+    def __init__(self, simbolo, proveedor=None, motor_indicadores=None, almacen_dividendos=None, indice_percentiles=None):
         self.simbolo = simbolo
-        self.datos_completos = None
-        self.info = {}
-        self.tendencias = {}
-        self.hist_indicadores = None
+        self.proveedor = proveedor or obtener_proveedor_por_defecto()
+        self.motor_indicadores = motor_indicadores
+        self.almacen_dividendos = almacen_dividendos
+        # Con un IndicePercentiles, el juez fundamental usa los cuartiles actuales del sector en lugar de la tabla estática.
+        self.indice_percentiles = indice_percentiles
+        # datos_completos, tendencias e hist_indicadores se calculan en el primer acceso.
+        self._datos_completos = _SIN_CARGAR
+        self._tendencias = _SIN_CARGAR
+        self._hist_indicadores = _SIN_CARGAR
+        self._info = {}
         self.scores = {}
         self.probabilidad_base = 0
         self.factor_penalizacion = 1.0
         self.razones_penalizacion = {}
         self.probabilidad_ajustada = 0
-        self._cargar_datos()
+
+    @property
+    def datos_completos(self):
+        if self._datos_completos is _SIN_CARGAR: self._cargar_datos()
+        return self._datos_completos
+
+    @datos_completos.setter
+    def datos_completos(self, valor):
+        self._datos_completos = valor
+
+    @property
+    def datasets_fallidos(self):
+        """Datasets que no se pudieron descargar (ni con reintentos): el análisis se hizo sin ellos."""
+        datos = self._datos_completos
+        if not isinstance(datos, DatosAccion): return ()
+        return tuple(d for d in DATASETS if d in datos.fallidos)
+
+    @property
+    def info(self):
+        if self._datos_completos is _SIN_CARGAR: self._cargar_datos()
+        return self._info
+
+    @info.setter
+    def info(self, valor):
+        self._info = valor
+
+    @property
+    def tendencias(self):
+        if self._tendencias is _SIN_CARGAR:
+            self._tendencias = self._analizar_tendencias_historicas() if self.datos_completos else {}
+        return self._tendencias
+
+    @tendencias.setter
+    def tendencias(self, valor):
+        self._tendencias = valor
+
+    @property
+    def hist_indicadores(self):
+        if self._hist_indicadores is _SIN_CARGAR:
+            self._hist_indicadores = self._calcular_indicadores_tecnicos() if self.datos_completos else None
+        return self._hist_indicadores
+
+    @hist_indicadores.setter
+    def hist_indicadores(self, valor):
+        self._hist_indicadores = valor
 
     def _cargar_datos(self):
         logging.info(f"Iniciando análisis para {self.simbolo}...")
-        self.datos_completos = self._obtener_datos_accion()
-        if self.datos_completos:
-            self.info = self.datos_completos.get('info', {})
-            self.tendencias = self._analizar_tendencias_historicas()
-            self.hist_indicadores = self._calcular_indicadores_tecnicos()
+        self._datos_completos = self._obtener_datos_accion()
+        if self._datos_completos:
+            self._info = self._datos_completos.get('info', {})
 
     def _obtener_datos_accion(self):
-        logging.info(f"Obteniendo datos de yfinance para {self.simbolo}...")
+        # Solo info y precios son imprescindibles; el resto de datasets se piden cuando un juez los necesita.
+        logging.info(f"Obteniendo datos de mercado para {self.simbolo}...")
         try:
-            stock = yf.Ticker(self.simbolo)
-            info = stock.info
+            with medir('obtener.info'):
+                info = self.proveedor.obtener(self.simbolo, 'info')
             if not info or info.get('marketCap') is None:
                 logging.warning(f"No se encontró información válida para {self.simbolo}. Se omite.")
                 return None
-            precios_hist = stock.history(period='1y', auto_adjust=True)
-            if precios_hist.empty:
+            with medir('obtener.precios_historicos'):
+                precios_hist = self.proveedor.obtener(self.simbolo, 'precios_historicos')
+            if precios_hist is None or precios_hist.empty:
                 logging.warning(f"No se pudieron obtener precios históricos para {self.simbolo}.")
                 return None
-            return {
-                'info': info, 'dividendos': stock.dividends,
-                'precios_historicos': precios_hist, 'precio_actual': precios_hist['Close'].iloc[-1],
-                'nombre': info.get('longName', 'N/A'), 'sector': info.get('sector', 'N/A'),
-                'financials': stock.financials, 'balance_sheet': stock.balance_sheet, 'cashflow': stock.cashflow
-            }
+            return DatosAccion(self.simbolo, self.proveedor, info, precios_hist)
         except Exception as e:
             logging.error(f"Error crítico obteniendo datos para {self.simbolo}: {e}")
+            contar('simbolos_sin_datos')
             return None
 
+    @medido('tendencias_historicas')
     def _analizar_tendencias_historicas(self):
         tendencias = {}
         financials = self.datos_completos.get('financials')
@@ -113,24 +294,13 @@ class AnalizadorAccion:
         if any(df is None or df.empty for df in [financials, cashflow, balance_sheet]):
             return tendencias
         try:
-            financials_t = financials.iloc[:, :4]
-            cashflow_t = cashflow.iloc[:, :4]
-            balance_sheet_t = balance_sheet.iloc[:, :4]
-            if 'Net Income' in financials_t.index: tendencias['anios_eps_neg'] = (financials_t.loc['Net Income'].fillna(0) < 0).sum()
-            if 'Total Cash From Operating Activities' in cashflow_t.index and 'Capital Expenditures' in cashflow_t.index:
-                fcf = cashflow_t.loc['Total Cash From Operating Activities'].fillna(0) - cashflow_t.loc['Capital Expenditures'].fillna(0)
-                tendencias['anios_fcf_neg'] = (fcf < 0).sum()
-            if 'Net Income' in financials_t.index and 'Total Stockholder Equity' in balance_sheet_t.index:
-                net_income_roe = financials_t.loc['Net Income'].fillna(0)
-                equity = balance_sheet_t.loc['Total Stockholder Equity'].replace(0, pd.NA).ffill().bfill()
-                if not equity.empty and equity.notna().all(): tendencias['roe_promedio_5a'] = (net_income_roe / equity).mean()
-            if 'Total Revenue' in financials_t.index:
-                ingresos = financials_t.loc['Total Revenue'].dropna()
-                if len(ingresos) > 1 and ingresos.iloc[-1] > 0: tendencias['ingresos_cagr_5a'] = ((ingresos.iloc[0] / ingresos.iloc[-1])**(1/len(ingresos))) - 1
-            if 'Total Liab' in balance_sheet_t.index:
-                deuda_total = balance_sheet_t.loc['Total Liab'].dropna()
-                if len(deuda_total) > 1: tendencias['deuda_creciente'] = deuda_total.iloc[0] > deuda_total.iloc[-1]
-            if dividendos is not None and not dividendos.empty:
+            tendencias.update(tendencias_estados_financieros(financials, cashflow, balance_sheet))
+            # Sin pagos también se registra (serie vacía): un símbolo que dejó de pagar no conserva sus pagos antiguos.
+            if dividendos is not None and self.almacen_dividendos is not None: self.almacen_dividendos.actualizar(self.simbolo, dividendos)
+            if dividendos is not None and not dividendos.empty and self.almacen_dividendos is not None:
+                tendencias['dividendos_anuales_data'] = self.almacen_dividendos.totales_anuales(self.simbolo)
+                tendencias['anios_consecutivos_dividendo'] = self.almacen_dividendos.racha(self.simbolo)
+            elif dividendos is not None and not dividendos.empty:
                 dividendos_anuales = dividendos.resample('YE').sum()
                 dividendos_anuales = dividendos_anuales[dividendos_anuales > 0]
                 tendencias['dividendos_anuales_data'] = dividendos_anuales
@@ -147,16 +317,14 @@ class AnalizadorAccion:
             logging.warning(f"Falta la métrica histórica '{e}' para {self.simbolo}.")
         return tendencias
 
+    @medido('indicadores_tecnicos')
     def _calcular_indicadores_tecnicos(self):
         hist_df = self.datos_completos.get('precios_historicos')
         if hist_df is None or len(hist_df) < 26: return None
         try:
-            df_copy = hist_df.copy()
-            df_copy.ta.sma(length=50, append=True); df_copy.ta.sma(length=200, append=True)
-            df_copy.ta.rsi(append=True); df_copy.ta.macd(append=True)
-            for col in ['SMA_50', 'SMA_200', 'RSI_14', 'MACDh_12_26_9']:
-                if col not in df_copy.columns: df_copy[col] = pd.NA
-            return df_copy
+            if self.motor_indicadores is not None:
+                return self.motor_indicadores.ultima_fila(self.simbolo, hist_df)
+            return indicadores_pandas_ta(hist_df)
         except Exception as e:
             logging.error(f"No se pudieron calcular los indicadores técnicos para {self.simbolo}: {e}")
             return None
@@ -192,6 +360,7 @@ class AnalizadorAccion:
         if not self.info: return 0.0, ["No hay datos fundamentales disponibles."]
         sector = self.info.get('sector', 'N/A')
         umbrales = UMBRALES_POR_SECTOR.get(sector, UMBRALES_POR_SECTOR['default'])
+        if self.indice_percentiles is not None: umbrales = self.indice_percentiles.umbrales(sector, umbrales)
         def to_float(v): return float(v) if v is not None else None
         pe = to_float(self.info.get('trailingPE'))
         if pe and pe > 0: 
@@ -259,13 +428,19 @@ class AnalizadorAccion:
         if dividendos is None or dividendos.empty or precio_actual <= 0: return None
         hace_un_anio = pd.Timestamp.now(tz=pytz.utc) - timedelta(days=365)
         try:
-            if dividendos.index.tz is None: dividendos.index = dividendos.index.tz_localize('UTC')
-            total_dividendos = dividendos[dividendos.index >= hace_un_anio].sum()
+            if self.almacen_dividendos is not None:
+                self.almacen_dividendos.actualizar(self.simbolo, dividendos)
+                return (self.almacen_dividendos.dividendos_12m(self.simbolo) / precio_actual) * 100
+            # Sin modificar el índice de la serie: es el mismo objeto que guardan la cache y los demás cálculos.
+            fechas = dividendos.index if dividendos.index.tz is not None else dividendos.index.tz_localize('UTC')
+            total_dividendos = dividendos[fechas >= hace_un_anio].sum()
             return (total_dividendos / precio_actual) * 100
         except Exception: return None
 
     def _calcular_crecimiento_dividendos(self, num_anios_cagr=CAGR_YEARS):
         if self.tendencias.get('anios_consecutivos_dividendo', 0) < 2: return None
+        if self.almacen_dividendos is not None and num_anios_cagr == CAGR_YEARS and self.simbolo in self.almacen_dividendos:
+            return self.almacen_dividendos.crecimiento(self.simbolo)
         try:
             dividendos_anuales = self.tendencias.get('dividendos_anuales_data')
             if dividendos_anuales is None or len(dividendos_anuales) < 2: return None
@@ -313,7 +488,7 @@ class AnalizadorAccion:
                             factor_total *= p["factor"]; razones["Crec. Div."] = (p["razon"], p["factor"])
                             break
                 elif crecimiento_div_raw < -0.01:
-                    factor_penalizacion_joven = 0.96
+                    factor_penalizacion_joven = FACTOR_DIVIDENDO_JOVEN_NEGATIVO
                     razon = f"Dividendo joven ({anios_consecutivos} años) con crecimiento negativo (Moderado)"
                     factor_total *= factor_penalizacion_joven; razones["Crec. Div."] = (razon, factor_penalizacion_joven)
         if self.tendencias.get('ingresos_cagr_5a', 1) < 0:
@@ -322,115 +497,221 @@ class AnalizadorAccion:
             p = FACTORES_PENALIZACION_ADAPTATIVOS["roe"][0]; factor_total *= p["factor"]; razones["ROE"] = (p["razon"], p["factor"])
         if self.tendencias.get('deuda_creciente', False):
             p = FACTORES_PENALIZACION_ADAPTATIVOS["deuda"][0]; factor_total *= p["factor"]; razones["Deuda"] = (p["razon"], p["factor"])
-        return max(factor_total, 0.65), razones
+        return max(factor_total, FACTOR_PENALIZACION_MINIMO), razones
 
     def _calcular_probabilidad_inversion(self):
         def clamp(score): return max(0.0, min(100.0, float(score or 0.0)))
-        ponderaciones = [PONDERACION_FUNDAMENTAL, PONDERACION_CONSISTENCIA_DIV, PONDERACION_RENDIMIENTO_DIV, PONDERACION_CRECIMIENTO_DIV, PONDERACION_CRECIMIENTO_GENERAL, PONDERACION_CONFIANZA_MGMT, PONDERACION_TECNICA]
-        lista_scores = [
-            self.scores['fundamental'][0], self.scores['consistencia_div'][0], self.scores['rendimiento_div_score'][0],
-            self.scores['crecimiento_div_score'][0], self.scores['crecimiento_general'][0], self.scores['confianza_mgmt'][0], self.scores['tecnica'][0]
-        ]
-        probabilidad = sum(clamp(s) * p for s, p in zip(lista_scores, ponderaciones))
+        pares = [(self.scores[juez][0], PONDERACIONES_JUECES[juez]) for juez in JUECES if juez in self.scores]
+        probabilidad = sum(clamp(s) * p for s, p in pares)
+        if len(pares) < len(JUECES):
+            # Análisis parcial: media ponderada solo sobre los jueces ejecutados.
+            peso_total = sum(p for _, p in pares)
+            probabilidad = probabilidad / peso_total if peso_total else 0.0
         return round(max(0.0, min(100.0, probabilidad)), 2)
 
-    def ejecutar_analisis(self):
-        if not self.datos_completos: return
-        crecimiento_div_raw = self._calcular_crecimiento_dividendos()
-        rendimiento_div = self._calcular_rendimiento_dividendos()
-        anios_consecutivos_div = self.tendencias.get('anios_consecutivos_dividendo', 0)
-        self.scores = {
-            'fundamental': self._calcular_puntuacion_fundamental(),
-            'tecnica': self._calcular_puntuacion_tecnica(),
-            'consistencia_div': self._evaluar_historial_pagos_div(),
-            'crecimiento_div_raw': (crecimiento_div_raw, []),
-            'crecimiento_general': self._score_crecimiento_general(),
-            'confianza_mgmt': self._score_confianza_management()
+    def _calculos_jueces(self):
+        return {
+            'fundamental': self._calcular_puntuacion_fundamental,
+            'tecnica': self._calcular_puntuacion_tecnica,
+            'consistencia_div': self._evaluar_historial_pagos_div,
+            'crecimiento_general': self._score_crecimiento_general,
+            'confianza_mgmt': self._score_confianza_management,
+            'rendimiento_div_score': lambda: self._score_rendimiento(self._calcular_rendimiento_dividendos()),
+            'crecimiento_div_score': lambda: self._score_crecimiento_div(
+                self.scores['crecimiento_div_raw'][0], self.tendencias.get('anios_consecutivos_dividendo', 0)),
         }
-        self.scores['rendimiento_div_score'] = self._score_rendimiento(rendimiento_div)
-        self.scores['crecimiento_div_score'] = self._score_crecimiento_div(crecimiento_div_raw, anios_consecutivos_div)
+
+    def ejecutar_analisis(self, jueces=None):
+        """Ejecuta los jueces indicados (todos por defecto). Solo se descargan los datasets que esos jueces leen."""
+        if not self.datos_completos: return
+        seleccion = JUECES if jueces is None else tuple(jueces)
+        desconocidos = set(seleccion) - set(JUECES)
+        if desconocidos: raise ValueError(f"Jueces desconocidos: {sorted(desconocidos)}")
+        completo = set(seleccion) == set(JUECES)
+        calculos = self._calculos_jueces()
+        self.scores = {}
+        if completo or 'crecimiento_div_score' in seleccion:
+            with medir('crecimiento_dividendos'):
+                self.scores['crecimiento_div_raw'] = (self._calcular_crecimiento_dividendos(), [])
+        for juez in JUECES:
+            if juez not in seleccion: continue
+            with medir(f"juez.{juez}"):
+                self.scores[juez] = calculos[juez]()
         self.probabilidad_base = self._calcular_probabilidad_inversion()
-        self.factor_penalizacion, self.razones_penalizacion = self._calcular_penalizacion_dinamica()
+        if completo:
+            with medir('penalizacion'):
+                self.factor_penalizacion, self.razones_penalizacion = self._calcular_penalizacion_dinamica()
+        else:
+            # La penalización depende de los estados financieros; en un análisis parcial no se aplica.
+            self.factor_penalizacion, self.razones_penalizacion = 1.0, {}
         self.probabilidad_ajustada = self.probabilidad_base * self.factor_penalizacion
 
+    def resultado(self, liberar=False):
+        """Resultado compacto e inmutable del último ejecutar_analisis(). Con liberar=True suelta los DataFrames del analizador."""
+        if not self.datos_completos or not self.scores: return None
+        info = self.info
+        sector = info.get('sector', 'N/A')
+        resumen = info.get('longBusinessSummary', "No hay un resumen del negocio disponible.")
+        rsi = None
+        if self._hist_indicadores is not _SIN_CARGAR and self.hist_indicadores is not None and not self.hist_indicadores.empty:
+            rsi = self.hist_indicadores.iloc[-1].get('RSI_14')
+        tendencias = self._tendencias if self._tendencias is not _SIN_CARGAR else {}
+        completo = all(j in self.scores for j in JUECES)
+        resultado = ResultadoAnalisis(
+            simbolo=self.simbolo, nombre=info.get('longName', 'Desconocido'), sector=sector,
+            precio_actual=float(self.datos_completos.get('precio_actual', 0)),
+            fecha_datos=self.datos_completos.get('precios_historicos').index[-1].strftime('%Y-%m-%d'),
+            resumen_negocio=resumen[:800].rsplit(' ', 1)[0] + '...' if len(resumen) > 800 else resumen,
+            puntuaciones=tuple(float(self.scores[j][0]) if j in self.scores else None for j in JUECES),
+            razones=tuple(tuple(self.scores[j][1]) if j in self.scores else () for j in JUECES),
+            probabilidad_base=float(self.probabilidad_base), factor_penalizacion=float(self.factor_penalizacion),
+            razones_penalizacion=tuple((tipo, razon, float(factor)) for tipo, (razon, factor) in self.razones_penalizacion.items()),
+            probabilidad_ajustada=float(self.probabilidad_ajustada),
+            recomendacion=recomendacion_automatica(self.probabilidad_ajustada, self.factor_penalizacion, sector) if completo else RECOMENDACION_PARCIAL,
+            per=info.get('trailingPE'), roe=info.get('returnOnEquity'), payout=info.get('payoutRatio'),
+            crecimiento_ingresos=info.get('revenueGrowth'), rsi=None if rsi is None or pd.isna(rsi) else float(rsi),
+            crecimiento_dividendo=self.scores.get('crecimiento_div_raw', (None,))[0],
+            anios_consecutivos_dividendo=tendencias.get('anios_consecutivos_dividendo'),
+            datasets_fallidos=self.datasets_fallidos,
+        )
+        if liberar:
+            self._datos_completos, self._info, self._tendencias, self._hist_indicadores = None, {}, {}, None
+        return resultado
+
+    @medido('informe')
     def generar_informe(self):
         if not self.datos_completos or not self.scores: return
-        nombre_empresa = self.info.get('longName', 'Desconocido')
-        sector = self.info.get('sector', 'N/A')
-        precio_actual = self.datos_completos.get('precio_actual', 0)
-        
-        def generar_alcances():
-            puntos_fuertes = []
-            umbrales = UMBRALES_POR_SECTOR.get(sector, UMBRALES_POR_SECTOR['default'])
-            if self.info.get('trailingPE') and self.info['trailingPE'] < umbrales['PE_BAJO']: puntos_fuertes.append("Valoración atractiva (PER bajo).")
-            if self.info.get('returnOnEquity') and self.info['returnOnEquity'] > ROE_UMBRAL_BUENO: puntos_fuertes.append(f"Excelente rentabilidad (ROE > {ROE_UMBRAL_BUENO:.0%}).")
-            if self.scores.get('rendimiento_div_score')[0] > 80: puntos_fuertes.append("Rendimiento por dividendo muy atractivo.")
-            if self.scores.get('crecimiento_div_score')[0] > 80: puntos_fuertes.append("Fuerte crecimiento del dividendo.")
-            if self.info.get('payoutRatio') and 0 < self.info['payoutRatio'] < 0.6: puntos_fuertes.append("Dividendo sostenible (Payout Ratio bajo).")
-            rsi = self.hist_indicadores.iloc[-1].get('RSI_14') if self.hist_indicadores is not None else None
-            if rsi and rsi < RSI_SOBREVENTA: puntos_fuertes.append(f"Momento técnico: Acción en sobreventa (RSI < {RSI_SOBREVENTA}).")
-            return puntos_fuertes
-
-        def obtener_nivel_riesgo():
-            if self.factor_penalizacion >= 0.98: return "Bajo", "[+]"
-            if self.factor_penalizacion >= 0.92: return "Moderado", "[!" ]"
-            if self.factor_penalizacion >= 0.85: return "Alto", "[!!]"
-            return "Critico", "[!!!]"
-
-        def generar_resumen_empresa():
-            resumen = self.info.get('longBusinessSummary', "No hay un resumen del negocio disponible.")
-            return resumen[:800].rsplit(' ', 1)[0] + '...' if len(resumen) > 800 else resumen
-
-        def generar_recomendacion():
-            riesgo_txt, _ = obtener_nivel_riesgo()
-            score = self.probabilidad_ajustada
-            if sector in SECTORES_CICLICOS and score >= 60: return "COMPRA CÍCLICA: Buen momento del ciclo."
-            if score >= 80 and riesgo_txt == 'Bajo': return "COMPRA FUERTE: Perfil ideal según tu estrategia."
-            elif 70 <= score < 80 and riesgo_txt in ['Bajo', 'Moderado']: return "COMPRA POTENCIAL: Requiere análisis adicional."
-            elif 55 <= score < 70: return "ZONA DE MONITOREO: No comprar aún, seguir evolución."
-            else: return "DESCARTAR: No cumple criterios de inversión."
-
-        def _imprimir_resumen_juez(nombre, datos_juez, peso):
-            score, razones = datos_juez
-            print(f"  - {nombre:<29} {score:>5.1f} / 100  (Peso: {peso:.0%})")
-            for razon in razones:
-                print(f"      - {razon}")
-
-        print("\n" + "="*70)
-        print(f"  INFORME DE ANÁLISIS v8.0 (Con Resumen de Jueces) PARA: {nombre_empresa} ({self.simbolo})")
-        print(f"  Sector: {sector} | Precio Actual: ${precio_actual:.2f}")
-        print("="*70)
-        print(f"\n[+] PUNTUACION GENERAL: {self.probabilidad_ajustada:.2f} / 100.00")
-        print(f"    RECOMENDACIÓN AUTOMÁTICA: {generar_recomendacion()}")
-        nivel_riesgo_txt, nivel_riesgo_icono = obtener_nivel_riesgo()
-        print(f" *  Nivel de Riesgo Basado en Tendencias: {nivel_riesgo_icono} {nivel_riesgo_txt}")
-        if self.factor_penalizacion < 1.0:
-            print(f"   (Puntuación base: {self.probabilidad_base:.2f}, ajustada por un factor de x{self.factor_penalizacion:.2f})")
-            if self.razones_penalizacion:
-                print("   Detalle de Penalizaciones Aplicadas:")
-                for tipo, (razon, _) in self.razones_penalizacion.items(): print(f"     - {razon}")
-        print("\n" + "="*28 + " PERFIL DE LA EMPRESA " + "="*27)
-        print(generar_resumen_empresa())
-        print("\n" + "="*24 + " DESGLOSE DE PUNTUACIONES " + "="*24)
-        _imprimir_resumen_juez("Juez Fundamental", self.scores['fundamental'], PONDERACION_FUNDAMENTAL)
-        _imprimir_resumen_juez("Juez Consistencia Dividendo", self.scores['consistencia_div'], PONDERACION_CONSISTENCIA_DIV)
-        _imprimir_resumen_juez("Juez Rendimiento Dividendo", self.scores['rendimiento_div_score'], PONDERACION_RENDIMIENTO_DIV)
-        _imprimir_resumen_juez("Juez Crecimiento Dividendo", self.scores['crecimiento_div_score'], PONDERACION_CRECIMIENTO_DIV)
-        _imprimir_resumen_juez("Juez Crecimiento General", self.scores['crecimiento_general'], PONDERACION_CRECIMIENTO_GENERAL)
-        _imprimir_resumen_juez("Juez Técnico (Oportunidad)", self.scores['tecnica'], PONDERACION_TECNICA)
-        print("\n" + "="*25 + " CONCLUSIONES Y ALCANCES " + "="*24)
-        puntos_fuertes = generar_alcances()
-        if not puntos_fuertes and not self.razones_penalizacion:
-            print("\nAnálisis neutral, sin métricas especialmente destacables.")
-        else:
-            if puntos_fuertes:
-                print("\n[+] PUNTOS FUERTES:")
-                for punto in puntos_fuertes: print(f"  - {punto}")
-            if self.razones_penalizacion:
-                print("\n[!] PUNTOS DÉBILES Y BANDERAS ROJAS (basado en tendencias):")
-                for tipo, (razon, _) in self.razones_penalizacion.items(): print(f"  - {razon}")
-        print("\n" + "="*70)
-        print("AVISO: Este es un análisis automatizado. Úselo como punto de partida para su propia investigación.")
+        print(informe_texto(self.resultado()))
+
+
+# ==============================================================================
+# SECCIÓN 3: RESULTADO COMPACTO E INFORME DE TEXTO
+# ==============================================================================
+ENTRADAS_RESULTADO = ('per', 'roe', 'payout', 'crecimiento_ingresos', 'rsi', 'crecimiento_dividendo', 'anios_consecutivos_dividendo')
+ENTRADAS_NUMERICAS = ENTRADAS_RESULTADO[:-1]
+
+
+def _numero(valor):
+    """float finito o None: info de yfinance puede traer 'Infinity', textos o NaN, y la exportación tipa la columna."""
+    try: valor = float(valor)
+    except (TypeError, ValueError): return None
+    return valor if math.isfinite(valor) else None
+
+
+class ResultadoAnalisis:
+    """Registro inmutable con lo que necesitan el informe y la exportación: puntuaciones, razones, penalización,
+    recomendación y entradas clave. No guarda DataFrames; puntuaciones y razones van alineadas con JUECES."""
+    __slots__ = ('simbolo', 'nombre', 'sector', 'precio_actual', 'fecha_datos', 'resumen_negocio', 'puntuaciones', 'razones',
+                 'probabilidad_base', 'factor_penalizacion', 'razones_penalizacion', 'probabilidad_ajustada',
+                 'recomendacion', *ENTRADAS_RESULTADO, 'datasets_fallidos')
+
+    def __init__(self, **campos):
+        desconocidos = set(campos) - set(self.__slots__)
+        if desconocidos: raise TypeError(f"Campos desconocidos en ResultadoAnalisis: {sorted(desconocidos)}")
+        for campo in self.__slots__: object.__setattr__(self, campo, campos.get(campo))
+        for campo in ENTRADAS_NUMERICAS: object.__setattr__(self, campo, _numero(campos.get(campo)))
+        anios = campos.get('anios_consecutivos_dividendo')
+        object.__setattr__(self, 'anios_consecutivos_dividendo', None if anios is None else int(anios))
+        object.__setattr__(self, 'datasets_fallidos', tuple(campos.get('datasets_fallidos') or ()))
+
+    def __setattr__(self, campo, valor):
+        raise AttributeError("ResultadoAnalisis es inmutable.")
+
+    def __delattr__(self, campo):
+        raise AttributeError("ResultadoAnalisis es inmutable.")
+
+    def __reduce__(self):
+        return (self.__class__._desde_valores, (tuple(getattr(self, c) for c in self.__slots__),))
+
+    @classmethod
+    def _desde_valores(cls, valores):
+        return cls(**dict(zip(cls.__slots__, valores)))
+
+    def __repr__(self):
+        return f"ResultadoAnalisis({self.simbolo}, {self.probabilidad_ajustada:.2f}, x{self.factor_penalizacion:.2f})"
+
+    @property
+    def jueces_omitidos(self):
+        """Jueces que no se ejecutaron (ejecutar_analisis(jueces=...)); si hay alguno, la recomendación es RECOMENDACION_PARCIAL."""
+        return tuple(j for j, p in zip(JUECES, self.puntuaciones) if p is None)
+
+    def puntuacion(self, juez):
+        return self.puntuaciones[JUECES.index(juez)]
+
+    def razones_juez(self, juez):
+        return self.razones[JUECES.index(juez)]
+
+    @staticmethod
+    def columnas():
+        return ['simbolo', 'nombre', 'sector', 'precio_actual', 'fecha_datos', 'probabilidad_base', 'factor_penalizacion',
+                'probabilidad_ajustada', 'nivel_riesgo', 'recomendacion', *(f"score_{j}" for j in JUECES),
+                *ENTRADAS_RESULTADO, *(f"razones_{j}" for j in JUECES), 'penalizaciones', 'datasets_fallidos', 'resumen_negocio']
+
+    def a_dict(self):
+        """Fila plana con las columnas de columnas(); las razones se unen con ' | '."""
+        fila = {c: getattr(self, c) for c in ('simbolo', 'nombre', 'sector', 'precio_actual', 'fecha_datos', 'probabilidad_base',
+                                              'factor_penalizacion', 'probabilidad_ajustada')}
+        fila['nivel_riesgo'] = nivel_riesgo(self.factor_penalizacion)[0]
+        fila['recomendacion'] = self.recomendacion
+        fila.update({f"score_{j}": p for j, p in zip(JUECES, self.puntuaciones)})
+        fila.update({c: getattr(self, c) for c in ENTRADAS_RESULTADO})
+        fila.update({f"razones_{j}": ' | '.join(r) for j, r in zip(JUECES, self.razones)})
+        fila['penalizaciones'] = ' | '.join(razon for _, razon, _ in self.razones_penalizacion)
+        fila['datasets_fallidos'] = ','.join(self.datasets_fallidos)
+        fila['resumen_negocio'] = self.resumen_negocio
+        return fila
+
+
+def informe_texto(r):
+    """Informe legible de un ResultadoAnalisis (el mismo texto que imprime generar_informe)."""
+    umbrales = UMBRALES_POR_SECTOR.get(r.sector, UMBRALES_POR_SECTOR['default'])
+    puntuaciones = {j: p for j, p in zip(JUECES, r.puntuaciones) if p is not None}
+    puntos_fuertes = []
+    if r.per and r.per < umbrales['PE_BAJO']: puntos_fuertes.append("Valoración atractiva (PER bajo).")
+    if r.roe and r.roe > ROE_UMBRAL_BUENO: puntos_fuertes.append(f"Excelente rentabilidad (ROE > {ROE_UMBRAL_BUENO:.0%}).")
+    if puntuaciones.get('rendimiento_div_score', 0) > 80: puntos_fuertes.append("Rendimiento por dividendo muy atractivo.")
+    if puntuaciones.get('crecimiento_div_score', 0) > 80: puntos_fuertes.append("Fuerte crecimiento del dividendo.")
+    if r.payout and 0 < r.payout < 0.6: puntos_fuertes.append("Dividendo sostenible (Payout Ratio bajo).")
+    if r.rsi and r.rsi < RSI_SOBREVENTA: puntos_fuertes.append(f"Momento técnico: Acción en sobreventa (RSI < {RSI_SOBREVENTA}).")
+    nivel_riesgo_txt, nivel_riesgo_icono = nivel_riesgo(r.factor_penalizacion)
+
+    lineas = ["\n" + "="*70,
+              f"  INFORME DE ANÁLISIS v8.0 (Con Resumen de Jueces) PARA: {r.nombre} ({r.simbolo})",
+              f"  Sector: {r.sector} | Precio Actual: ${r.precio_actual:.2f}",
+              "="*70,
+              f"\n[+] PUNTUACION GENERAL: {r.probabilidad_ajustada:.2f} / 100.00",
+              f"    RECOMENDACIÓN AUTOMÁTICA: {r.recomendacion}",
+              f" *  Nivel de Riesgo Basado en Tendencias: {nivel_riesgo_icono} {nivel_riesgo_txt}"]
+    if r.datasets_fallidos:
+        lineas.append(f"[!] ANÁLISIS PARCIAL: no se pudieron descargar {', '.join(r.datasets_fallidos)}; las puntuaciones que dependen de ellos no son fiables.")
+    if r.jueces_omitidos:
+        lineas.append(f"[!] ANÁLISIS PARCIAL: sin los jueces {', '.join(r.jueces_omitidos)} ni penalización; la puntuación no es comparable con la completa.")
+    if r.factor_penalizacion < 1.0:
+        lineas.append(f"   (Puntuación base: {r.probabilidad_base:.2f}, ajustada por un factor de x{r.factor_penalizacion:.2f})")
+        if r.razones_penalizacion:
+            lineas.append("   Detalle de Penalizaciones Aplicadas:")
+            lineas.extend(f"     - {razon}" for _, razon, _ in r.razones_penalizacion)
+    lineas += ["\n" + "="*28 + " PERFIL DE LA EMPRESA " + "="*27, r.resumen_negocio,
+               "\n" + "="*24 + " DESGLOSE DE PUNTUACIONES " + "="*24]
+    for nombre, juez in [("Juez Fundamental", 'fundamental'), ("Juez Consistencia Dividendo", 'consistencia_div'),
+                         ("Juez Rendimiento Dividendo", 'rendimiento_div_score'), ("Juez Crecimiento Dividendo", 'crecimiento_div_score'),
+                         ("Juez Crecimiento General", 'crecimiento_general'), ("Juez Técnico (Oportunidad)", 'tecnica')]:
+        if juez not in puntuaciones: continue
+        lineas.append(f"  - {nombre:<29} {puntuaciones[juez]:>5.1f} / 100  (Peso: {PONDERACIONES_JUECES[juez]:.0%})")
+        lineas.extend(f"      - {razon}" for razon in r.razones_juez(juez))
+    lineas.append("\n" + "="*25 + " CONCLUSIONES Y ALCANCES " + "="*24)
+    if not puntos_fuertes and not r.razones_penalizacion:
+        lineas.append("\nAnálisis neutral, sin métricas especialmente destacables.")
+    else:
+        if puntos_fuertes:
+            lineas.append("\n[+] PUNTOS FUERTES:")
+            lineas.extend(f"  - {punto}" for punto in puntos_fuertes)
+        if r.razones_penalizacion:
+            lineas.append("\n[!] PUNTOS DÉBILES Y BANDERAS ROJAS (basado en tendencias):")
+            lineas.extend(f"  - {razon}" for _, razon, _ in r.razones_penalizacion)
+    lineas += ["\n" + "="*70,
+               "AVISO: Este es un análisis automatizado. Úselo como punto de partida para su propia investigación."]
+    return '\n'.join(lineas)
 
 if __name__ == "__main__":
     while True:
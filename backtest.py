@@ -0,0 +1,249 @@
+import numpy as np
+import pandas as pd
+import argparse
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from analizador_acciones import CAGR_YEARS, indicadores_pandas_ta, tendencias_estados_financieros
+from proveedores_datos import ProveedorCache, ProveedorYFinance, RUTA_CACHE_POR_DEFECTO
+from puntuacion_vectorizada import puntuar_universo, recomendaciones
+
+# ==============================================================================
+# SECCIÓN 1: CONFIGURACIÓN DEL BACKTEST
+# ==============================================================================
+PERIODO_BACKTEST = '10y'
+FRECUENCIA_REBALANCEO = 'ME'
+RETRASO_PUBLICACION_DIAS = 90  # un ejercicio no se considera conocido hasta 90 días después de su cierre
+MIN_BARRAS_INDICADORES = 26
+HORIZONTES = {'ret_1m': 21, 'ret_3m': 63, 'ret_12m': 252}
+CAMPOS_FUNDAMENTALES = ['trailingPE', 'priceToBook', 'debtToEquity', 'returnOnEquity', 'payoutRatio', 'revenueGrowth']
+MAX_TRABAJADORES = 8
+
+
+def crear_proveedor_backtest(periodo=PERIODO_BACKTEST):
+    # Cache separada: la principal guarda solo el último año de precios.
+    return ProveedorCache(ProveedorYFinance(periodo), ruta=RUTA_CACHE_POR_DEFECTO.replace('.sqlite', f'_{periodo}.sqlite'))
+
+
+def _sin_zona(indice):
+    indice = pd.DatetimeIndex(indice)
+    return (indice.tz_localize(None) if indice.tz is not None else indice).normalize()
+
+
+# ==============================================================================
+# SECCIÓN 2: CARACTERÍSTICAS POINT-IN-TIME DE UN SÍMBOLO EN TODAS LAS FECHAS
+# ==============================================================================
+def factores_ajuste_dividendos(cierre, dividendos):
+    """Cierre ajustado / cierre negociado en cada barra, el factor que aplica yfinance con auto_adjust=True.
+
+    Cada dividendo multiplica las barras anteriores a su fecha ex por (1 - D / cierre real del día previo). Se deshace de la
+    última fecha ex hacia atrás: con F el factor de los dividendos posteriores, ese cierre real es ajustado / F + D.
+    """
+    factor = np.ones(len(cierre))
+    if dividendos is None or dividendos.empty or cierre.empty: return factor
+    indice, c = _sin_zona(cierre.index), cierre.to_numpy(dtype=float)
+    dividendos = dividendos.sort_index()
+    posterior = 1.0
+    for fecha, importe in zip(_sin_zona(dividendos.index)[::-1], dividendos.to_numpy(dtype=float)[::-1]):
+        previa = indice.searchsorted(fecha, side='left') - 1
+        if fecha > indice[-1] or importe <= 0: continue  # fecha ex posterior a la última barra: aún no está en los precios
+        if previa < 0: break
+        posterior *= 1 - importe / (c[previa] / posterior + importe)
+        factor[:previa + 1] = posterior
+    return factor
+
+
+def _caracteristicas_precios(precios, fechas, dividendos=None):
+    """Indicadores y precio en la última barra <= cada fecha, más los rendimientos futuros para evaluar.
+    Con `dividendos`, los cierres son ajustados por dividendos y 'precio_negociado' deshace ese ajuste."""
+    cierre = precios['Close'].dropna()
+    indice = _sin_zona(cierre.index)
+    pos = indice.searchsorted(fechas, side='right') - 1
+    validas = pos >= 0
+    pos = pos[validas]
+    indicadores = indicadores_pandas_ta(precios.loc[cierre.index])
+    c = cierre.to_numpy(dtype=float)
+    tabla = pd.DataFrame({'precio_actual': c[pos], 'tiene_indicadores': pos + 1 >= MIN_BARRAS_INDICADORES}, index=fechas[validas])
+    tabla['precio_negociado'] = c[pos] / factores_ajuste_dividendos(cierre, dividendos)[pos]
+    for col in ['SMA_50', 'SMA_200', 'RSI_14', 'MACDh_12_26_9']:
+        tabla[col] = pd.to_numeric(indicadores[col], errors='coerce').to_numpy(dtype=float)[pos]
+    for nombre, barras in HORIZONTES.items():
+        futuro = pos + barras
+        tabla[nombre] = np.where(futuro < len(c), c[np.minimum(futuro, len(c) - 1)] / c[pos] - 1, np.nan)
+    return tabla
+
+
+def _caracteristicas_dividendos(dividendos, fechas, precio_actual):
+    """Rendimiento TTM, racha de años con pago y CAGR del dividendo, con los pagos conocidos en cada fecha.
+    `precio_actual` debe ser el precio negociado entonces: los dividendos vienen sin ajustar."""
+    n = len(fechas)
+    if dividendos is None or dividendos.empty:
+        return np.full(n, np.nan), np.zeros(n, dtype=int), np.full(n, np.nan)
+    dividendos = dividendos.sort_index()
+    d_fechas, importes = _sin_zona(dividendos.index), dividendos.to_numpy(dtype=float)
+    acumulado = np.concatenate([[0.0], np.cumsum(importes)])
+    hasta = d_fechas.searchsorted(fechas, side='right')
+    desde = d_fechas.searchsorted(fechas - pd.Timedelta(days=365), side='left')
+    rendimiento = np.where(precio_actual > 0, (acumulado[hasta] - acumulado[desde]) / precio_actual * 100, np.nan)
+    # Racha: años consecutivos con pago que terminan en el último año con pago conocido.
+    anios_evento = d_fechas.year.to_numpy()
+    anios_unicos = np.unique(anios_evento)
+    racha = np.ones(len(anios_unicos), dtype=int)
+    for i in range(1, len(anios_unicos)):
+        if anios_unicos[i] == anios_unicos[i - 1] + 1: racha[i] = racha[i - 1] + 1
+    anio_fecha = fechas.year.to_numpy()
+    ultimo_anio = np.where(hasta > 0, anios_evento[np.maximum(hasta - 1, 0)], -1)
+    racha_fecha = racha[np.clip(np.searchsorted(anios_unicos, ultimo_anio), 0, len(anios_unicos) - 1)]
+    anios_consecutivos = np.where((hasta > 0) & (ultimo_anio >= anio_fecha - 1), racha_fecha, 0)
+    # CAGR: solo depende de los años completos anteriores al de la fecha.
+    anuales = dividendos.groupby(d_fechas.year).sum()
+    anuales = anuales[anuales > 0]
+    cagr_por_anio = {}
+    for anio in np.unique(anio_fecha):
+        recientes = anuales[anuales.index <= anio - 1].tail(CAGR_YEARS)
+        periodos = recientes.index[-1] - recientes.index[0] if len(recientes) >= 2 else 0
+        cagr_por_anio[anio] = ((recientes.iloc[-1] / recientes.iloc[0]) ** (1 / periodos) - 1) * 100 if periodos > 0 else np.nan
+    crecimiento = np.where(anios_consecutivos >= 2, [cagr_por_anio[a] for a in anio_fecha], np.nan)
+    return rendimiento, anios_consecutivos, crecimiento
+
+
+def _caracteristicas_estados(datos, fechas):
+    """Tendencias de estados financieros con los ejercicios publicados en cada fecha (un cálculo por conjunto distinto)."""
+    marcos = [datos.get(nombre) for nombre in ['financials', 'cashflow', 'balance_sheet']]
+    columnas = pd.DataFrame(index=fechas)
+    if any(m is None or m.empty for m in marcos):
+        return columnas.assign(tiene_tendencias=False)
+    # Clave por fecha: cuántos ejercicios de cada estado se habían publicado ya.
+    publicados = [(_sin_zona(m.columns) + pd.Timedelta(days=RETRASO_PUBLICACION_DIAS)).sort_values() for m in marcos]
+    claves = list(zip(*[p.searchsorted(fechas, side='right') for p in publicados]))
+    por_clave = {}
+    for clave in set(claves):
+        if min(clave) == 0:
+            por_clave[clave] = {'tiene_tendencias': False}
+            continue
+        # Columnas ordenadas de más reciente a más antigua: los ejercicios publicados son los últimos `k`.
+        recortes = [m.loc[:, sorted(m.columns, reverse=True)].iloc[:, -k:] for m, k in zip(marcos, clave)]
+        try:
+            por_clave[clave] = {'tiene_tendencias': True, **tendencias_estados_financieros(*recortes)}
+        except (KeyError, IndexError):
+            por_clave[clave] = {'tiene_tendencias': True}
+    return pd.DataFrame([por_clave[c] for c in claves], index=fechas)
+
+
+def caracteristicas_simbolo(simbolo, datos, fechas, fundamentales=None, precios_ajustados=True):
+    precios = datos.get('precios_historicos')
+    info = datos.get('info') or {}
+    if precios is None or precios.empty or info.get('marketCap') is None: return None
+    tabla = _caracteristicas_precios(precios, fechas, datos.get('dividendos') if precios_ajustados else None)
+    if tabla.empty: return None
+    fechas_v = pd.DatetimeIndex(tabla.index)
+    estados = _caracteristicas_estados(datos, fechas_v)
+    tabla = tabla.join(estados)
+    # El rendimiento divide dividendos brutos entre el precio de entonces: con el cierre ajustado saldría inflado.
+    rendimiento, anios, crecimiento = _caracteristicas_dividendos(datos.get('dividendos'), fechas_v, tabla.pop('precio_negociado').to_numpy())
+    tiene = tabla['tiene_tendencias'].to_numpy(dtype=bool)
+    # Igual que en AnalizadorAccion: sin estados financieros no hay tendencias, ni racha ni CAGR de dividendos.
+    tabla['rendimiento_div'] = rendimiento
+    tabla['anios_consecutivos_dividendo'] = np.where(tiene, anios, 0)
+    tabla['crecimiento_div_raw'] = np.where(tiene, crecimiento, np.nan)
+    tabla['sector'] = info.get('sector', 'N/A')
+    if fundamentales is not None and simbolo in fundamentales.index.get_level_values('simbolo'):
+        historico = fundamentales.xs(simbolo, level='simbolo').sort_index()
+        conocidos = historico.reindex(fechas_v, method='ffill')
+        for campo in CAMPOS_FUNDAMENTALES:
+            if campo in conocidos.columns: tabla[campo] = conocidos[campo].to_numpy()
+    tabla.index = pd.MultiIndex.from_arrays([fechas_v, [simbolo] * len(fechas_v)], names=['fecha', 'simbolo'])
+    return tabla
+
+
+# ==============================================================================
+# SECCIÓN 3: EJECUCIÓN Y RESUMEN
+# ==============================================================================
+def ejecutar_backtest(simbolos, proveedor=None, inicio=None, fin=None, frecuencia=FRECUENCIA_REBALANCEO,
+                      fundamentales=None, max_trabajadores=MAX_TRABAJADORES, precios_ajustados=True):
+    """Puntúa cada símbolo en cada fecha de rebalanceo usando solo los datos conocidos en esa fecha.
+
+    precios_ajustados: los cierres vienen ajustados por dividendos (yfinance con auto_adjust=True); el rendimiento por
+    dividendo se calcula sobre el precio negociado en cada fecha. Los datos sintéticos no están ajustados.
+
+    Los campos de `info` (PER, P/B, ROE...) son una foto actual y no se usan: cuentan como no disponibles
+    salvo que se pase `fundamentales`, un DataFrame con índice (fecha, simbolo) y columnas CAMPOS_FUNDAMENTALES.
+    """
+    proveedor = proveedor or crear_proveedor_backtest()
+    t0 = time.perf_counter()
+
+    def preparar(simbolo):
+        try:
+            return simbolo, {dataset: proveedor.obtener(simbolo, dataset) for dataset in
+                             ['info', 'precios_historicos', 'dividendos', 'financials', 'balance_sheet', 'cashflow']}
+        except Exception as e:
+            logging.error(f"No se pudieron obtener datos de {simbolo} para el backtest: {e}")
+            return simbolo, None
+
+    with ThreadPoolExecutor(max_workers=max_trabajadores) as executor:
+        universo = dict(executor.map(preparar, simbolos))
+    t_datos = time.perf_counter() - t0
+    historicos = [d['precios_historicos'] for d in universo.values() if d and d.get('precios_historicos') is not None and not d['precios_historicos'].empty]
+    if not historicos: return pd.DataFrame(), {}
+    inicio = pd.Timestamp(inicio) if inicio is not None else min(_sin_zona(h.index).min() for h in historicos)
+    fin = pd.Timestamp(fin) if fin is not None else max(_sin_zona(h.index).max() for h in historicos)
+    fechas = pd.date_range(inicio, fin, freq=frecuencia)
+    tablas = []
+    for simbolo, datos in universo.items():
+        if not datos: continue
+        try:
+            tabla = caracteristicas_simbolo(simbolo, datos, fechas, fundamentales, precios_ajustados)
+            if tabla is not None: tablas.append(tabla)
+        except Exception as e:
+            logging.error(f"Error preparando el backtest de {simbolo}: {e}")
+    if not tablas: return pd.DataFrame(), {}
+    tabla = pd.concat(tablas)
+    t1 = time.perf_counter()
+    resultados = puntuar_universo(tabla)
+    resultados['recomendacion'] = recomendaciones(resultados['probabilidad_ajustada'], resultados['factor_penalizacion'], tabla['sector'])
+    resultados = resultados.join(tabla[['sector', 'precio_actual'] + list(HORIZONTES)])
+    estadisticas = {
+        'simbolos': len(tablas), 'fechas': len(fechas), 'filas': len(resultados),
+        'segundos_datos': round(t_datos, 2), 'segundos_caracteristicas': round(t1 - t0 - t_datos, 2),
+        'segundos_puntuacion': round(time.perf_counter() - t1, 3)
+    }
+    return resultados.sort_index(), estadisticas
+
+
+def resumen_por_recomendacion(resultados):
+    """Rendimiento futuro medio, mediano y % de aciertos (>0) por categoría de recomendación."""
+    agregados = {'filas': ('probabilidad_ajustada', 'size'), 'puntuacion_media': ('probabilidad_ajustada', 'mean')}
+    for nombre in HORIZONTES:
+        agregados[f'{nombre}_medio'] = (nombre, 'mean')
+        agregados[f'{nombre}_mediano'] = (nombre, 'median')
+        agregados[f'{nombre}_aciertos'] = (nombre, lambda r: (r.dropna() > 0).mean() if r.notna().any() else np.nan)
+    orden = ['COMPRA FUERTE', 'COMPRA CÍCLICA', 'COMPRA POTENCIAL', 'ZONA DE MONITOREO', 'DESCARTAR']
+    resumen = resultados.groupby('recomendacion').agg(**agregados)
+    return resumen.reindex([c for c in orden if c in resumen.index])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest point-in-time de la puntuación y las recomendaciones.")
+    parser.add_argument('simbolos', nargs='*')
+    parser.add_argument('--archivo', help="Fichero con un símbolo por línea.")
+    parser.add_argument('--periodo', default=PERIODO_BACKTEST, help="Historia de precios a descargar (p. ej. 10y).")
+    parser.add_argument('--frecuencia', default=FRECUENCIA_REBALANCEO, help="Frecuencia de rebalanceo (alias de pandas: ME, QE, W-FRI...).")
+    parser.add_argument('--inicio'); parser.add_argument('--fin')
+    parser.add_argument('--sintetico', type=int, default=0, help="Usa N símbolos sintéticos sin conexión.")
+    parser.add_argument('--salida', help="CSV con la puntuación de cada (fecha, símbolo).")
+    args = parser.parse_args()
+    if args.sintetico:
+        from datos_sinteticos import ProveedorSintetico, simbolos_sinteticos
+        anios = int(args.periodo.rstrip('y')) if args.periodo.endswith('y') else 10
+        simbolos, proveedor = simbolos_sinteticos(args.sintetico), ProveedorSintetico(dias=252 * anios)
+    else:
+        from analisis_lote import leer_simbolos
+        simbolos = args.simbolos + (leer_simbolos(args.archivo) if args.archivo else [])
+        proveedor = crear_proveedor_backtest(args.periodo)
+    if not simbolos: parser.error("Indica símbolos, --archivo o --sintetico N.")
+    resultados, estadisticas = ejecutar_backtest(simbolos, proveedor, args.inicio, args.fin, args.frecuencia,
+                                                 precios_ajustados=not args.sintetico)
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(resumen_por_recomendacion(resultados).round(4).to_string())
+    print(f"\n{estadisticas}")
+    if args.salida: resultados.to_csv(args.salida)
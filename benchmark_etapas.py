@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import time
+import logging
+from datetime import datetime
+from analizador_acciones import AnalizadorAccion
+from datos_sinteticos import GeneradorSintetico, simbolos_sinteticos
+from proveedores_datos import ProveedorMemoria
+
+# ==============================================================================
+# SECCIÓN 1: CONFIGURACIÓN DEL BENCHMARK
+# ==============================================================================
+TAMANOS_UNIVERSO = (1, 100, 1000, 10000)
+RUTA_RESULTADOS = 'benchmark_resultados.json'
+UMBRAL_REGRESION = 1.10  # una etapa un 10% más lenta que la referencia se marca como regresión
+
+
+def _etapas(analizador):
+    """Etapas en el orden de ejecutar_analisis; cada una deja su resultado donde la siguiente lo espera."""
+    a = analizador
+
+    def tendencias(): a.tendencias = a._analizar_tendencias_historicas()
+    def indicadores(): a.hist_indicadores = a._calcular_indicadores_tecnicos()
+    def crecimiento_div_raw(): a.scores['crecimiento_div_raw'] = (a._calcular_crecimiento_dividendos(), [])
+    def juez(nombre, calculo): return nombre, lambda: a.scores.__setitem__(nombre, calculo())
+
+    return [
+        ('_analizar_tendencias_historicas', tendencias),
+        ('_calcular_indicadores_tecnicos', indicadores),
+        juez('fundamental', a._calcular_puntuacion_fundamental),
+        juez('tecnica', a._calcular_puntuacion_tecnica),
+        juez('consistencia_div', a._evaluar_historial_pagos_div),
+        ('_calcular_crecimiento_dividendos', crecimiento_div_raw),
+        juez('rendimiento_div_score', lambda: a._score_rendimiento(a._calcular_rendimiento_dividendos())),
+        juez('crecimiento_div_score', lambda: a._score_crecimiento_div(a.scores['crecimiento_div_raw'][0], a.tendencias.get('anios_consecutivos_dividendo', 0))),
+        juez('crecimiento_general', a._score_crecimiento_general),
+        juez('confianza_mgmt', a._score_confianza_management),
+        ('_calcular_probabilidad_inversion', lambda: setattr(a, 'probabilidad_base', a._calcular_probabilidad_inversion())),
+        ('_calcular_penalizacion_dinamica', a._calcular_penalizacion_dinamica),
+    ]
+
+
+def _resumen(tiempos_ns):
+    t = np.asarray(tiempos_ns, dtype=float) / 1e3
+    return {'total_s': round(t.sum() / 1e6, 6), 'media_us': round(t.mean(), 2), 'p50_us': round(np.percentile(t, 50), 2),
+            'p95_us': round(np.percentile(t, 95), 2), 'max_us': round(t.max(), 2)}
+
+
+# ==============================================================================
+# SECCIÓN 2: MEDICIÓN POR ETAPA
+# ==============================================================================
+def medir_universo(n_simbolos, semilla=0):
+    generador = GeneradorSintetico(semilla)
+    simbolos = simbolos_sinteticos(n_simbolos)
+    t0 = time.perf_counter()
+    proveedor = ProveedorMemoria({s: generador.datos_simbolo(s) for s in simbolos})
+    segundos_generacion = time.perf_counter() - t0
+    tiempos = {}
+
+    def anotar(etapa, ns): tiempos.setdefault(etapa, []).append(ns)
+
+    for simbolo in simbolos:
+        # Pasada 1: cada etapa por separado sobre un analizador recién creado.
+        a = AnalizadorAccion(simbolo, proveedor=proveedor)
+        inicio = time.perf_counter_ns()
+        valido = bool(a.datos_completos)
+        anotar('carga_datos', time.perf_counter_ns() - inicio)
+        if not valido: continue
+        for etapa, funcion in _etapas(a):
+            inicio = time.perf_counter_ns()
+            funcion()
+            anotar(etapa, time.perf_counter_ns() - inicio)
+        # Pasada 2: el análisis completo de extremo a extremo y el informe de texto.
+        a = AnalizadorAccion(simbolo, proveedor=proveedor)
+        inicio = time.perf_counter_ns()
+        a.ejecutar_analisis()
+        anotar('ejecutar_analisis', time.perf_counter_ns() - inicio)
+        inicio = time.perf_counter_ns()
+        with contextlib.redirect_stdout(io.StringIO()): a.generar_informe()
+        anotar('generar_informe', time.perf_counter_ns() - inicio)
+    return {'simbolos': n_simbolos, 'segundos_generacion_datos': round(segundos_generacion, 3),
+            'etapas': {etapa: _resumen(t) for etapa, t in tiempos.items()}}
+
+
+def _metadatos(semilla):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {'commit': commit, 'fecha': datetime.now().isoformat(timespec='seconds'), 'semilla': semilla,
+            'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+            'plataforma': platform.platform(), 'procesador': platform.processor() or platform.machine()}
+
+
+def ejecutar_benchmark(tamanos=TAMANOS_UNIVERSO, semilla=0, ruta=RUTA_RESULTADOS):
+    resultados = {'metadatos': _metadatos(semilla), 'universos': {}}
+    for n in tamanos:
+        logging.warning(f"Midiendo universo de {n} símbolos...")
+        resultados['universos'][str(n)] = medir_universo(n, semilla)
+    if ruta:
+        with open(ruta, 'w', encoding='utf-8') as f: json.dump(resultados, f, indent=2, ensure_ascii=False)
+    return resultados
+
+
+# ==============================================================================
+# SECCIÓN 3: COMPARACIÓN ENTRE COMMITS
+# ==============================================================================
+def comparar(actual, referencia, umbral=UMBRAL_REGRESION):
+    """Cociente de la mediana por símbolo (actual / referencia) para cada universo y etapa presentes en ambos."""
+    filas = []
+    for n, universo in actual['universos'].items():
+        previo = referencia['universos'].get(n)
+        if not previo: continue
+        for etapa, medida in universo['etapas'].items():
+            if etapa not in previo['etapas']: continue
+            base = previo['etapas'][etapa]['p50_us']
+            cociente = medida['p50_us'] / base if base else np.nan
+            filas.append({'simbolos': int(n), 'etapa': etapa, 'referencia_us': base, 'actual_us': medida['p50_us'],
+                          'cociente': round(cociente, 3), 'regresion': bool(cociente > umbral)})
+    return pd.DataFrame(filas)
+
+
+def tabla_resultados(resultados):
+    filas = [{'simbolos': int(n), 'etapa': etapa, **medida}
+             for n, universo in resultados['universos'].items() for etapa, medida in universo['etapas'].items()]
+    return pd.DataFrame(filas)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark sin conexión de cada etapa del análisis sobre universos sintéticos.")
+    parser.add_argument('--tamanos', type=int, nargs='+', default=list(TAMANOS_UNIVERSO))
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--salida', default=RUTA_RESULTADOS, help="JSON donde guardar los resultados.")
+    parser.add_argument('--comparar', help="JSON de un commit anterior con el que comparar.")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    resultados = ejecutar_benchmark(args.tamanos, args.semilla, args.salida)
+    with pd.option_context('display.width', 200, 'display.max_rows', None):
+        print(tabla_resultados(resultados).to_string(index=False))
+        if args.comparar:
+            with open(args.comparar, encoding='utf-8') as f: referencia = json.load(f)
+            comparacion = comparar(resultados, referencia)
+            print(f"\nComparación con {referencia['metadatos'].get('commit')}:")
+            print(comparacion.to_string(index=False))
+            if comparacion['regresion'].any(): print(f"\n{int(comparacion['regresion'].sum())} etapas más lentas que x{UMBRAL_REGRESION}.")
+    print(f"\nResultados guardados en {args.salida}")
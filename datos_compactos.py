@@ -0,0 +1,188 @@
+import numpy as np
+import pandas as pd
+import argparse
+import gc
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+from proveedores_datos import ProveedorDatos
+from analizador_acciones import AnalizadorAccion, ETIQUETAS_ESTADOS_ACTUALES, etiquetas_canonicas, indicadores_pandas_ta
+
+# ==============================================================================
+# SECCIÓN 1: CAMPOS QUE LEEN LOS JUECES
+# ==============================================================================
+CAMPOS_INFO = ('marketCap', 'sector', 'longName', 'longBusinessSummary', 'trailingPE', 'priceToBook', 'debtToEquity',
+               'returnOnEquity', 'payoutRatio', 'revenueGrowth')
+FILAS_ESTADOS = {
+    'financials': ('Net Income', 'Total Revenue'),
+    'cashflow': ('Total Cash From Operating Activities', 'Capital Expenditures'),
+    'balance_sheet': ('Total Stockholder Equity', 'Total Liab'),
+}
+FILA_SIN_DATOS = 'Sin filas usadas'
+EJERCICIOS_ESTADOS = 4  # tendencias_estados_financieros solo mira las 4 primeras columnas
+COLUMNAS_INDICADORES = ['Close', 'SMA_50', 'SMA_200', 'RSI_14', 'MACDh_12_26_9']
+
+
+def compactar(dataset, valor, precios_float32=False):
+    """Copia reducida de un dataset: solo las claves, filas y columnas que usan los jueces, en arrays contiguos tipados."""
+    if valor is None: return None
+    if dataset == 'info': return {campo: valor[campo] for campo in CAMPOS_INFO if campo in valor}
+    if dataset == 'precios_historicos':
+        if valor.empty or 'Close' not in valor.columns: return valor
+        # El constructor copia las columnas de un dict: un array propio, sin mantener vivo el bloque OHLCV original.
+        cierre = valor['Close'].to_numpy(dtype=np.float32 if precios_float32 else np.float64)
+        return pd.DataFrame({'Close': cierre}, index=valor.index.copy(deep=True))
+    if dataset in FILAS_ESTADOS:
+        if valor.empty: return valor
+        # Filas con el nombre de yfinance actual pasan a la etiqueta que leen las tendencias.
+        valor = etiquetas_canonicas(valor)
+        filas = [fila for fila in FILAS_ESTADOS[dataset] if fila in valor.index]
+        recorte = valor.loc[filas].iloc[:, :EJERCICIOS_ESTADOS]
+        datos = recorte.to_numpy(dtype=np.float64, na_value=np.nan, copy=True)
+        # Sin ninguna fila útil se deja una vacía: el estado no estaba vacío y las tendencias (racha de dividendos
+        # incluida) deben calcularse igual que con los datos completos.
+        if not filas: filas, datos = [FILA_SIN_DATOS], np.full((1, recorte.shape[1]), np.nan)
+        return pd.DataFrame(datos, index=filas, columns=recorte.columns.copy(deep=True))
+    if dataset == 'dividendos': return pd.Series(valor.to_numpy(dtype=np.float64, copy=True), index=valor.index.copy(deep=True), name=valor.name)
+    return valor
+
+
+# ==============================================================================
+# SECCIÓN 2: PROVEEDOR E INDICADORES COMPACTOS
+# ==============================================================================
+class ProveedorCompacto(ProveedorDatos):
+    """Envuelve otro proveedor (p. ej. la cache) y entrega cada dataset ya compactado. Va el último de la cadena:
+    la cache sigue guardando los datos completos."""
+
+    def __init__(self, origen, precios_float32=False):
+        self.origen = origen
+        self.precios_float32 = precios_float32
+
+    def precargar(self, simbolos, dataset):
+        return self.origen.precargar(simbolos, dataset)
+
+    def descartar_precarga(self):
+        return self.origen.descartar_precarga()
+
+    def obtener(self, simbolo, dataset):
+        return compactar(dataset, self.origen.obtener(simbolo, dataset), self.precios_float32)
+
+    def obtener_reciente(self, simbolo, dataset, max_antiguedad):
+        return compactar(dataset, self.origen.obtener_reciente(simbolo, dataset, max_antiguedad), self.precios_float32)
+
+    def obtenido_en(self, simbolo, dataset):
+        return self.origen.obtenido_en(simbolo, dataset)
+
+
+class IndicadoresUltimaFila:
+    """Misma interfaz que MotorIndicadores, pero con pandas_ta: calcula sobre la historia y guarda solo la última fila,
+    que es lo único que leen el juez técnico y el resultado, en lugar de una segunda copia completa de la historia."""
+
+    def ultima_fila(self, simbolo, precios_hist):
+        # Índice copiado: las tablas hash que pandas_ta construya al indexar por fecha se van con él, no con los precios.
+        hist = precios_hist.set_axis(precios_hist.index.copy(deep=True))
+        return indicadores_pandas_ta(hist)[COLUMNAS_INDICADORES].iloc[[-1]].copy()
+
+
+def analizador_compacto(simbolo, proveedor, precios_float32=False, motor_indicadores=None, almacen_dividendos=None):
+    """AnalizadorAccion en modo compacto. motor_indicadores (MotorIndicadores) ya devuelve una sola fila; si no se pasa,
+    se usa IndicadoresUltimaFila."""
+    return AnalizadorAccion(simbolo, proveedor=ProveedorCompacto(proveedor, precios_float32),
+                            motor_indicadores=motor_indicadores or IndicadoresUltimaFila(), almacen_dividendos=almacen_dividendos)
+
+
+# ==============================================================================
+# SECCIÓN 3: PRESUPUESTO DE MEMORIA POR SÍMBOLO
+# ==============================================================================
+MODOS = ('completo', 'compacto', 'compacto_float32')
+
+
+def _rss_mb():
+    with open('/proc/self/status') as f:
+        for linea in f:
+            if linea.startswith('VmRSS:'): return int(linea.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def medir_modo(modo, n_simbolos, semilla=0):
+    """Memoria residente que añaden n_simbolos analizadores vivos tras ejecutar_analisis() en el modo indicado."""
+    from datos_sinteticos import ProveedorSintetico, simbolos_sinteticos
+    proveedor = ProveedorSintetico(semilla)
+    simbolos = simbolos_sinteticos(n_simbolos)
+    # Calentamiento: importaciones perezosas y cachés internas de pandas fuera de la medida.
+    AnalizadorAccion(simbolos[0], proveedor=proveedor).ejecutar_analisis()
+    gc.collect()
+    antes = _rss_mb()
+    analizadores = []
+    for s in simbolos:
+        a = AnalizadorAccion(s, proveedor=proveedor) if modo == 'completo' else analizador_compacto(s, proveedor, modo == 'compacto_float32')
+        a.ejecutar_analisis()
+        analizadores.append(a)
+    gc.collect()
+    despues = _rss_mb()
+    return {'modo': modo, 'simbolos': n_simbolos, 'rss_mb': round(despues - antes, 1),
+            'kb_por_simbolo': round((despues - antes) * 1024 / n_simbolos, 1)}
+
+
+def presupuesto_memoria(n_simbolos=10000, semilla=0):
+    """Cada modo en un proceso aparte para que la memoria de uno no contamine la medida del otro."""
+    filas = []
+    for modo in MODOS:
+        salida = subprocess.run([sys.executable, os.path.abspath(__file__), '--modo', modo, '--simbolos', str(n_simbolos), '--semilla', str(semilla)],
+                                capture_output=True, text=True, check=True).stdout
+        filas.append(json.loads(salida.strip().splitlines()[-1]))
+    return pd.DataFrame(filas).set_index('modo')
+
+
+# ==============================================================================
+# SECCIÓN 4: PARIDAD CON EL MODO COMPLETO
+# ==============================================================================
+class ProveedorEtiquetasActuales(ProveedorDatos):
+    """Estados financieros con los nombres de fila de yfinance actual y alguna fila que ningún juez lee."""
+    _ACTUALES = {canonica: actual for actual, canonica in ETIQUETAS_ESTADOS_ACTUALES.items()}
+
+    def __init__(self, origen):
+        self.origen = origen
+
+    def obtener(self, simbolo, dataset):
+        valor = self.origen.obtener(simbolo, dataset)
+        if dataset not in FILAS_ESTADOS or valor is None or valor.empty: return valor
+        extra = pd.DataFrame([valor.iloc[0] * 0.5], index=['Normalized EBITDA'])
+        return pd.concat([valor.rename(index=self._ACTUALES), extra])
+
+
+def comprobar_paridad(n_simbolos=300, semilla=0, etiquetas_actuales=True):
+    """Compara puntuación ajustada, factor de penalización y racha de dividendos entre el modo completo y el compacto."""
+    from datos_sinteticos import ProveedorSintetico, simbolos_sinteticos
+    proveedor = ProveedorSintetico(semilla)
+    if etiquetas_actuales: proveedor = ProveedorEtiquetasActuales(proveedor)
+    diferencias = []
+    for s in simbolos_sinteticos(n_simbolos):
+        completo, compacto = AnalizadorAccion(s, proveedor=proveedor), analizador_compacto(s, proveedor)
+        completo.ejecutar_analisis(); compacto.ejecutar_analisis()
+        a, b = completo.resultado(), compacto.resultado()
+        if a is None or b is None:
+            if (a is None) != (b is None): diferencias.append(s)
+            continue
+        if (not np.isclose(a.probabilidad_ajustada, b.probabilidad_ajustada) or not np.isclose(a.factor_penalizacion, b.factor_penalizacion)
+                or a.anios_consecutivos_dividendo != b.anios_consecutivos_dividendo): diferencias.append(s)
+    return {'simbolos': n_simbolos, 'etiquetas': 'actuales' if etiquetas_actuales else 'clasicas',
+            'diferencias': len(diferencias), 'ejemplos': diferencias[:5]}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memoria residente por símbolo con datos completos y en modo compacto (universo sintético).")
+    parser.add_argument('--simbolos', type=int, default=10000)
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--modo', choices=MODOS, help="Mide solo este modo en el proceso actual.")
+    parser.add_argument('--paridad', action='store_true',
+                        help="Compara las puntuaciones del modo compacto con las del completo (filas de yfinance actual y clásicas).")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    if args.paridad:
+        for etiquetas_actuales in (True, False): print(comprobar_paridad(args.simbolos, args.semilla, etiquetas_actuales))
+    elif args.modo: print(json.dumps(medir_modo(args.modo, args.simbolos, args.semilla)))
+    else: print(presupuesto_memoria(args.simbolos, args.semilla).to_string())
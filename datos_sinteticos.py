@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+import zlib
+from proveedores_datos import ProveedorDatos, DATASETS
+
+# ==============================================================================
+# SECCIÓN 1: CONFIGURACIÓN DE LOS DATOS SINTÉTICOS
+# ==============================================================================
+SECTORES_SINTETICOS = [
+    'Technology', 'Financial Services', 'Healthcare', 'Utilities', 'Energy', 'Basic Materials', 'Industrials',
+    'Consumer Cyclical', 'Consumer Defensive', 'Real Estate', 'Communication Services', 'N/A'
+]
+DIAS_HISTORIA = 252
+ANIOS_ESTADOS = 4
+MAX_ANIOS_DIVIDENDOS = 15
+PROB_CAMPO_AUSENTE = 0.08
+ZONA_HORARIA = 'America/New_York'
+
+
+def simbolos_sinteticos(n):
+    return [f"SIN{i:05d}" for i in range(n)]
+
+
+# ==============================================================================
+# SECCIÓN 2: GENERADOR DETERMINISTA CON LA FORMA DE LOS DATOS DE YFINANCE
+# ==============================================================================
+class GeneradorSintetico:
+    """Genera, de forma determinista por (semilla, símbolo), datos con la forma que devuelve yfinance."""
+
+    def __init__(self, semilla=0, fecha_fin=None, dias=DIAS_HISTORIA):
+        self.semilla = semilla
+        self.fecha_fin = pd.Timestamp(fecha_fin if fecha_fin is not None else pd.Timestamp.today()).normalize()
+        self.dias = dias
+
+    def _rng(self, simbolo, flujo):
+        return np.random.default_rng([self.semilla, zlib.crc32(simbolo.encode()), flujo])
+
+    def _perfil(self, simbolo):
+        rng = self._rng(simbolo, 0)
+        paga_dividendos = rng.random() < 0.7
+        return {
+            'sector': SECTORES_SINTETICOS[rng.integers(len(SECTORES_SINTETICOS))],
+            'precio_inicial': rng.uniform(10, 400),
+            'rentabilidad_div': rng.uniform(0.005, 0.06) if paga_dividendos else 0.0,
+            'anios_dividendo': int(rng.integers(1, MAX_ANIOS_DIVIDENDOS + 1)) if paga_dividendos else 0,
+            'dividendo_suspendido': paga_dividendos and rng.random() < 0.1,
+            'crecimiento_div': rng.normal(0.05, 0.06),
+            'ingresos_base': rng.uniform(1e8, 1e11),
+            'margen': rng.normal(0.10, 0.12),
+        }
+
+    def info(self, simbolo):
+        perfil, rng = self._perfil(simbolo), self._rng(simbolo, 1)
+        info = {
+            'symbol': simbolo, 'longName': f"{simbolo} Synthetic Corp.", 'sector': perfil['sector'],
+            'marketCap': float(rng.uniform(1e8, 2e12)), 'currentPrice': perfil['precio_inicial'],
+            'trailingPE': float(rng.choice([-1.0, 1.0], p=[0.1, 0.9]) * rng.uniform(3, 60)),
+            'priceToBook': float(rng.uniform(0.3, 15)), 'debtToEquity': float(rng.uniform(0, 300)),
+            'returnOnEquity': float(rng.normal(0.12, 0.10)),
+            'payoutRatio': float(rng.uniform(0, 1.2)) if perfil['rentabilidad_div'] else 0.0,
+            'revenueGrowth': float(rng.normal(0.04, 0.08)),
+            'longBusinessSummary': f"{simbolo} es una empresa sintética del sector {perfil['sector']} generada para pruebas.",
+        }
+        for campo in ['trailingPE', 'priceToBook', 'debtToEquity', 'returnOnEquity', 'payoutRatio', 'revenueGrowth']:
+            if rng.random() < PROB_CAMPO_AUSENTE: del info[campo]
+        return info
+
+    def precios_historicos(self, simbolo):
+        perfil, rng = self._perfil(simbolo), self._rng(simbolo, 2)
+        indice = pd.bdate_range(end=self.fecha_fin, periods=self.dias, tz=ZONA_HORARIA, name='Date')
+        volatilidad = rng.uniform(0.008, 0.03)
+        cierre = perfil['precio_inicial'] * np.exp(np.cumsum(rng.normal(rng.normal(0.0003, 0.0008), volatilidad, self.dias)))
+        apertura = cierre * (1 + rng.normal(0, volatilidad / 3, self.dias))
+        maximo = np.maximum(apertura, cierre) * (1 + np.abs(rng.normal(0, volatilidad / 2, self.dias)))
+        minimo = np.minimum(apertura, cierre) * (1 - np.abs(rng.normal(0, volatilidad / 2, self.dias)))
+        return pd.DataFrame({
+            'Open': apertura, 'High': maximo, 'Low': minimo, 'Close': cierre,
+            'Volume': rng.integers(10_000, 5_000_000, self.dias), 'Dividends': 0.0, 'Stock Splits': 0.0
+        }, index=indice)
+
+    def dividendos(self, simbolo):
+        perfil = self._perfil(simbolo)
+        if not perfil['anios_dividendo']:
+            return pd.Series(dtype='float64', name='Dividends', index=pd.DatetimeIndex([], tz=ZONA_HORARIA, name='Date'))
+        rng = self._rng(simbolo, 3)
+        fin = self.fecha_fin - pd.DateOffset(years=3) if perfil['dividendo_suspendido'] else self.fecha_fin
+        fechas = pd.date_range(end=fin, periods=4 * perfil['anios_dividendo'], freq='QS', tz=ZONA_HORARIA, name='Date')
+        anios_atras = (fechas[-1] - fechas).days.to_numpy() / 365.25
+        importe_actual = perfil['precio_inicial'] * perfil['rentabilidad_div'] / 4
+        importes = importe_actual / (1 + perfil['crecimiento_div']) ** anios_atras * (1 + rng.normal(0, 0.01, len(fechas)))
+        return pd.Series(np.round(importes, 4), index=fechas, name='Dividends')
+
+    def _columnas_anuales(self):
+        return pd.DatetimeIndex([pd.Timestamp(self.fecha_fin.year - 1 - i, 12, 31) for i in range(ANIOS_ESTADOS)])
+
+    def financials(self, simbolo):
+        perfil, rng = self._perfil(simbolo), self._rng(simbolo, 4)
+        crecimiento = rng.normal(0.05, 0.08, ANIOS_ESTADOS)
+        ingresos = perfil['ingresos_base'] / np.cumprod(1 + crecimiento)
+        beneficio = ingresos * (perfil['margen'] + rng.normal(0, 0.05, ANIOS_ESTADOS))
+        return pd.DataFrame([ingresos, beneficio], index=['Total Revenue', 'Net Income'], columns=self._columnas_anuales())
+
+    def balance_sheet(self, simbolo):
+        perfil, rng = self._perfil(simbolo), self._rng(simbolo, 5)
+        patrimonio = perfil['ingresos_base'] * rng.uniform(0.2, 1.5) * (1 + rng.normal(0, 0.05, ANIOS_ESTADOS))
+        deuda = patrimonio * rng.uniform(0.2, 2.5) * np.cumprod(1 + rng.normal(0, 0.06, ANIOS_ESTADOS))
+        return pd.DataFrame([patrimonio, deuda], index=['Total Stockholder Equity', 'Total Liab'], columns=self._columnas_anuales())
+
+    def cashflow(self, simbolo):
+        perfil, rng = self._perfil(simbolo), self._rng(simbolo, 6)
+        flujo_operativo = perfil['ingresos_base'] * (perfil['margen'] + 0.05 + rng.normal(0, 0.06, ANIOS_ESTADOS))
+        capex = perfil['ingresos_base'] * rng.uniform(0.02, 0.10, ANIOS_ESTADOS)
+        return pd.DataFrame([flujo_operativo, capex], index=['Total Cash From Operating Activities', 'Capital Expenditures'], columns=self._columnas_anuales())
+
+    def datos_simbolo(self, simbolo):
+        return {dataset: getattr(self, dataset)(simbolo) for dataset in DATASETS}
+
+
+class ProveedorSintetico(ProveedorDatos):
+    """Proveedor sin red: genera bajo demanda los datos de cualquier símbolo."""
+
+    def __init__(self, semilla=0, fecha_fin=None, dias=DIAS_HISTORIA):
+        self.generador = GeneradorSintetico(semilla, fecha_fin, dias)
+
+    def obtener(self, simbolo, dataset):
+        if dataset not in DATASETS: raise KeyError(f"Dataset desconocido: {dataset}")
+        return getattr(self.generador, dataset)(simbolo)
@@ -0,0 +1,205 @@
+import pandas as pd
+import argparse
+import logging
+import threading
+import time
+import zlib
+from metricas import medir, contar
+from proveedores_datos import ProveedorDatos, PERIODO_PRECIOS, ejecutar_con_plazo, tiempo_restante
+
+# ==============================================================================
+# SECCIÓN 1: DESCARGA CONJUNTA Y REPARTO POR SÍMBOLO
+# ==============================================================================
+TAM_LOTE_PRECIOS = 100
+
+
+def descargar_yfinance(simbolos, periodo=PERIODO_PRECIOS):
+    """Historia diaria de varios símbolos en una sola llamada a yf.download; columnas (símbolo, campo).
+    threads=False: yf.download hace una petición por símbolo y, con hilos, las lanza todas a la vez sin pasar por el
+    limitador; en serie no hay ráfagas y el lote reserva en el limitador un turno por símbolo."""
+    import yfinance as yf  # importación diferida, como en ProveedorYFinance
+    return yf.download(list(simbolos), period=periodo, auto_adjust=True, group_by='ticker', progress=False, threads=False)
+
+
+def separar_descarga(combinado, simbolos):
+    """Divide el DataFrame conjunto (columnas símbolo -> campo) en {simbolo: historia} con el formato de stock.history().
+    Los símbolos ausentes o sin ningún cierre no aparecen: yf.download no falla por ellos, deja sus columnas vacías."""
+    if combinado is None or combinado.empty: return {}
+    if not isinstance(combinado.columns, pd.MultiIndex):
+        if len(simbolos) != 1: return {}
+        combinado = pd.concat({simbolos[0]: combinado}, axis=1)
+    presentes = set(combinado.columns.get_level_values(0))
+    historicos = {}
+    for simbolo in simbolos:
+        if simbolo not in presentes: continue
+        # dropna: el índice conjunto es la unión de fechas; las que no son de este símbolo quedan vacías.
+        historia = combinado[simbolo].dropna(how='all')
+        if historia.empty or 'Close' not in historia.columns or historia['Close'].isna().all(): continue
+        historia.columns.name = None
+        historicos[simbolo] = historia.copy()  # cada historia con su propio bloque, no una vista del conjunto
+    return historicos
+
+
+# ==============================================================================
+# SECCIÓN 2: PROVEEDOR CON PRECIOS EN BLOQUE
+# ==============================================================================
+class _Lote:
+    __slots__ = ('simbolos', 'lock', 'descargado', 'historicos')
+
+    def __init__(self, simbolos):
+        self.simbolos = simbolos
+        self.lock = threading.Lock()
+        self.descargado = False
+        self.historicos = {}
+
+    def tomar(self, simbolo, descargar):
+        # El primer hilo que pide un símbolo del lote lo descarga entero; los demás esperan y recogen su parte.
+        with self.lock:
+            if not self.descargado:
+                self.historicos = descargar(self.simbolos)
+                self.descargado = True
+            return self.historicos.pop(simbolo, None)
+
+
+class ProveedorPreciosLote(ProveedorDatos):
+    """Delante de un proveedor por símbolo: los precios de los símbolos anunciados con precargar() se piden en lotes
+    de `tam_lote` con una sola llamada. Cada lote se descarga al pedir el primero de sus símbolos, así que en memoria
+    solo hay unos pocos lotes a la vez. Si un lote falla, o un símbolo no viene en él, se pide suelto a `origen`."""
+
+    def __init__(self, origen, tam_lote=TAM_LOTE_PRECIOS, descargar=descargar_yfinance, periodo=PERIODO_PRECIOS, limitador=None):
+        self.origen = origen
+        self.tam_lote = tam_lote
+        self.descargar = descargar
+        self.periodo = periodo
+        self.limitador = limitador
+        self._lote_de = {}
+        self._lock = threading.Lock()
+        self.estadisticas = {'llamadas_lote': 0, 'simbolos_en_lote': 0, 'lotes_fallidos': 0, 'precios_sueltos': 0}
+
+    def precargar(self, simbolos, dataset):
+        if dataset != 'precios_historicos': return self.origen.precargar(simbolos, dataset)
+        simbolos = list(dict.fromkeys(simbolos))
+        with self._lock:
+            simbolos = [s for s in simbolos if s not in self._lote_de]
+            for i in range(0, len(simbolos), self.tam_lote):
+                lote = _Lote(simbolos[i:i + self.tam_lote])
+                for simbolo in lote.simbolos: self._lote_de[simbolo] = lote
+        return len(simbolos)
+
+    def descartar_precarga(self):
+        # Los lotes de símbolos anunciados que nunca se pidieron (sin info válida, timeout...) quedarían vivos con sus
+        # historias mientras viva el proveedor; sin la referencia del índice se liberan en cuanto nadie los usa.
+        with self._lock:
+            descartados = len(self._lote_de)
+            self._lote_de.clear()
+        return descartados + self.origen.descartar_precarga()
+
+    def _descargar_lote(self, simbolos):
+        try:
+            # Sin turno dentro del plazo del símbolo que dispara el lote, el lote cuenta como fallido (uno a uno).
+            if self.limitador: self.limitador.esperar(len(simbolos))
+            with medir('obtener.precios_lote'):
+                # Con el plazo del símbolo que dispara el lote: si se cuelga, el lote se pide símbolo a símbolo.
+                combinado = ejecutar_con_plazo(lambda: self.descargar(simbolos, self.periodo), tiempo_restante(), f"lote de {len(simbolos)}")
+                historicos = separar_descarga(combinado, simbolos)
+        except Exception as e:
+            logging.warning(f"Falló la descarga conjunta de {len(simbolos)} símbolos ({e}). Se pedirán uno a uno.")
+            contar('lotes_fallidos')
+            with self._lock: self.estadisticas['lotes_fallidos'] += 1
+            historicos = {}
+        contar('descargas_lote')
+        with self._lock:
+            self.estadisticas['llamadas_lote'] += 1
+            self.estadisticas['simbolos_en_lote'] += len(historicos)
+        return historicos
+
+    def obtener(self, simbolo, dataset):
+        if dataset == 'precios_historicos':
+            with self._lock: lote = self._lote_de.pop(simbolo, None)
+            if lote is not None:
+                historia = lote.tomar(simbolo, self._descargar_lote)
+                if historia is not None: return historia
+            with self._lock: self.estadisticas['precios_sueltos'] += 1
+        return self.origen.obtener(simbolo, dataset)
+
+
+# ==============================================================================
+# SECCIÓN 3: STUB LOCAL Y MEDICIÓN
+# ==============================================================================
+class ServidorSimulado:
+    """Imita las dos rutas de yfinance con datos sintéticos: stock.history() por símbolo y yf.download() conjunto
+    (columnas símbolo -> campo, índice unión de fechas). Cada llamada cuenta como una petición HTTP con su latencia."""
+
+    def __init__(self, semilla=0, latencia_llamada=0.02, latencia_simbolo=0.0005, prob_fallo_lote=0.0, desconocidos=()):
+        from datos_sinteticos import GeneradorSintetico
+        self.generador = GeneradorSintetico(semilla)
+        self.latencia_llamada = latencia_llamada
+        self.latencia_simbolo = latencia_simbolo
+        self.prob_fallo_lote = prob_fallo_lote
+        self.desconocidos = set(desconocidos)
+        self.llamadas_http = 0
+
+    def _historia(self, simbolo):
+        return self.generador.precios_historicos(simbolo)[['Open', 'High', 'Low', 'Close', 'Volume']]
+
+    def history(self, simbolo):
+        self.llamadas_http += 1
+        time.sleep(self.latencia_llamada + self.latencia_simbolo)
+        return pd.DataFrame() if simbolo in self.desconocidos else self._historia(simbolo)
+
+    def download(self, simbolos, periodo=PERIODO_PRECIOS):
+        self.llamadas_http += 1
+        time.sleep(self.latencia_llamada + self.latencia_simbolo * len(simbolos))
+        # Fallo determinista por lote para que las dos pasadas del benchmark vean lo mismo.
+        if self.prob_fallo_lote and zlib.crc32(','.join(simbolos).encode()) % 1000 < self.prob_fallo_lote * 1000:
+            raise ConnectionError("respuesta conjunta incompleta (simulado)")
+        # yf.download no falla por un símbolo desconocido: devuelve sus columnas vacías.
+        historias = {s: self._historia(s) * float('nan') if s in self.desconocidos else self._historia(s) for s in simbolos}
+        return pd.concat(historias, axis=1)
+
+
+class _ProveedorHistorySimulado(ProveedorDatos):
+    def __init__(self, servidor):
+        self.servidor = servidor
+
+    def obtener(self, simbolo, dataset):
+        if dataset != 'precios_historicos': raise KeyError(f"El stub solo sirve precios: {dataset}")
+        return self.servidor.history(simbolo)
+
+
+def medir_descarga(n_simbolos=500, tam_lote=TAM_LOTE_PRECIOS, latencia_llamada=0.02, prob_fallo_lote=0.0, semilla=0):
+    """Etapa de precios de un universo contra el stub: un history() por símbolo frente a lotes con reparto por símbolo."""
+    from datos_sinteticos import simbolos_sinteticos
+    simbolos = simbolos_sinteticos(n_simbolos)
+    desconocidos = simbolos[::97]
+    filas = []
+    servidor = ServidorSimulado(semilla, latencia_llamada, prob_fallo_lote=prob_fallo_lote, desconocidos=desconocidos)
+    por_simbolo = _ProveedorHistorySimulado(servidor)
+    inicio = time.perf_counter()
+    referencia = {s: por_simbolo.obtener(s, 'precios_historicos') for s in simbolos}
+    filas.append({'modo': 'por_simbolo', 'llamadas_http': servidor.llamadas_http, 'segundos': round(time.perf_counter() - inicio, 2)})
+
+    servidor = ServidorSimulado(semilla, latencia_llamada, prob_fallo_lote=prob_fallo_lote, desconocidos=desconocidos)
+    proveedor = ProveedorPreciosLote(_ProveedorHistorySimulado(servidor), tam_lote, servidor.download)
+    inicio = time.perf_counter()
+    proveedor.precargar(simbolos, 'precios_historicos')
+    en_lote = {s: proveedor.obtener(s, 'precios_historicos') for s in simbolos}
+    segundos = time.perf_counter() - inicio
+    diferencias = sum(not (h.empty and referencia[s].empty) and not h['Close'].equals(referencia[s]['Close']) for s, h in en_lote.items())
+    filas.append({'modo': f"lotes_de_{tam_lote}", 'llamadas_http': servidor.llamadas_http, 'segundos': round(segundos, 2),
+                  **proveedor.estadisticas, 'diferencias': diferencias})
+    tabla = pd.DataFrame(filas).set_index('modo')
+    tabla['llamadas_ahorradas'] = tabla.loc['por_simbolo', 'llamadas_http'] - tabla['llamadas_http']
+    return tabla
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mide la descarga de precios en lotes frente a una llamada por símbolo (stub local, sin red).")
+    parser.add_argument('--simbolos', type=int, default=500)
+    parser.add_argument('--tam-lote', type=int, default=TAM_LOTE_PRECIOS)
+    parser.add_argument('--latencia', type=float, default=0.02, help="Segundos por petición HTTP simulada.")
+    parser.add_argument('--prob-fallo-lote', type=float, default=0.0, help="Fracción de lotes que fallan y se piden símbolo a símbolo.")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.ERROR)
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(medir_descarga(args.simbolos, args.tam_lote, args.latencia, args.prob_fallo_lote).to_string())
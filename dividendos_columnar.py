@@ -0,0 +1,267 @@
+import numpy as np
+import pandas as pd
+import argparse
+import threading
+import time
+import logging
+from datetime import datetime, timedelta
+from analizador_acciones import CAGR_YEARS
+
+# ==============================================================================
+# SECCIÓN 1: ALMACÉN COLUMNAR DE EVENTOS DE DIVIDENDO
+# ==============================================================================
+CAPACIDAD_INICIAL = 1024
+NS_POR_DIA = 86_400 * 10**9
+
+
+def _crecer(arreglo, minimo, relleno=0):
+    if len(arreglo) >= minimo: return arreglo
+    nuevo = np.full(max(minimo, 2 * len(arreglo), CAPACIDAD_INICIAL), relleno, dtype=arreglo.dtype)
+    nuevo[:len(arreglo)] = arreglo
+    return nuevo
+
+
+class AlmacenDividendos:
+    """Pagos de dividendo de todo el universo en tres arrays contiguos (fecha UTC en ns, año local, importe)
+    más un (inicio, longitud) por símbolo.
+
+    Racha de años con pago y CAGR_YEARS se memorizan por símbolo y solo se recalculan (en bloque y vectorizado)
+    para los símbolos con pagos nuevos o cuando cambia el año de referencia. El TTM se calcula al pedirlo.
+    Se comparte entre los hilos de los analizadores: escribir sustituye arrays y desplazamientos (y la memoria también
+    se escribe al leer), así que cada operación pública toma el lock.
+    """
+
+    def __init__(self):
+        self.simbolos = []
+        self._indice = {}
+        self._n = 0
+        self._muertos = 0
+        self.fechas = np.empty(0, np.int64)
+        self.anios = np.empty(0, np.int16)
+        self.importes = np.empty(0, np.float64)
+        self.inicio = np.empty(0, np.int64)
+        self.longitud = np.empty(0, np.int64)
+        self._huellas = {}
+        self._racha = np.empty(0, np.int64)
+        self._cagr = np.empty(0, np.float64)
+        self._anio_memo = np.empty(0, np.int64)  # -1 = memo inválida
+        self._lock = threading.Lock()
+
+    def __contains__(self, simbolo):
+        return simbolo in self._indice
+
+    def __len__(self):
+        return len(self.simbolos)
+
+    # ------------------------------------------------------------------ escritura
+    def actualizar(self, simbolo, dividendos):
+        """Registra la serie de dividendos de un símbolo. Devuelve False (y no invalida nada) si no hay pagos nuevos."""
+        serie = pd.Series(dtype=float) if dividendos is None else dividendos
+        indice = pd.DatetimeIndex(serie.index)
+        if indice.tz is None: indice = indice.tz_localize('UTC')
+        orden = np.argsort(indice.asi8, kind='stable')
+        fechas = indice.tz_convert('UTC').as_unit('ns').asi8[orden]
+        importes = serie.to_numpy(dtype=float)[orden]
+        anios = indice.year.to_numpy()[orden]
+        huella = (len(fechas), int(fechas[-1]) if len(fechas) else None, float(importes.sum()))
+        with self._lock:
+            if self._huellas.get(simbolo) == huella: return False
+            self._huellas[simbolo] = huella
+            self._escribir(simbolo, fechas, anios, importes)
+        return True
+
+    def _escribir(self, simbolo, fechas, anios, importes):
+        if simbolo in self._indice:
+            i = self._indice[simbolo]
+            self._muertos += int(self.longitud[i])
+        else:
+            i = len(self.simbolos)
+            self._indice[simbolo] = i
+            self.simbolos.append(simbolo)
+            self.inicio, self.longitud = _crecer(self.inicio, i + 1), _crecer(self.longitud, i + 1)
+            self._racha, self._cagr = _crecer(self._racha, i + 1), _crecer(self._cagr, i + 1, np.nan)
+            self._anio_memo = _crecer(self._anio_memo, i + 1, -1)
+        n = len(fechas)
+        self.fechas, self.anios = _crecer(self.fechas, self._n + n), _crecer(self.anios, self._n + n)
+        self.importes = _crecer(self.importes, self._n + n)
+        self.fechas[self._n:self._n + n] = fechas
+        self.anios[self._n:self._n + n] = anios
+        self.importes[self._n:self._n + n] = importes
+        self.inicio[i], self.longitud[i] = self._n, n
+        self._n += n
+        self._anio_memo[i] = -1
+        if self._muertos > self._n // 2: self._compactar()
+
+    def cargar_universo(self, dividendos_por_simbolo):
+        """Registra {simbolo: serie}; devuelve cuántos símbolos tenían pagos nuevos."""
+        return sum(self.actualizar(s, d) for s, d in dividendos_por_simbolo.items())
+
+    def _compactar(self):
+        posiciones = np.arange(len(self.simbolos))
+        _, idx = self._eventos(posiciones)
+        self.fechas, self.anios, self.importes = self.fechas[idx], self.anios[idx], self.importes[idx]
+        longitudes = self.longitud[posiciones]
+        self.inicio[posiciones] = np.cumsum(longitudes) - longitudes
+        self._n, self._muertos = len(idx), 0
+
+    # ------------------------------------------------------------------ cálculo vectorizado
+    def _eventos(self, posiciones):
+        """(etiqueta de fila, índice en los arrays) de todos los pagos de `posiciones`, en orden."""
+        longitudes = self.longitud[posiciones]
+        fila = np.repeat(np.arange(len(posiciones)), longitudes)
+        desplazamiento = np.arange(len(fila)) - np.repeat(np.cumsum(longitudes) - longitudes, longitudes)
+        return fila, np.repeat(self.inicio[posiciones], longitudes) + desplazamiento
+
+    def _matriz_anual(self, posiciones):
+        """(primer año, totales por año, año con algún pago) como matrices densas símbolos x años."""
+        fila, idx = self._eventos(posiciones)
+        if len(idx) == 0: return 0, np.zeros((len(posiciones), 1)), np.zeros((len(posiciones), 1), dtype=bool)
+        anios = self.anios[idx].astype(np.int64)
+        primero = int(anios.min())
+        columnas = int(anios.max()) - primero + 1
+        clave = fila * columnas + (anios - primero)
+        tamano = len(posiciones) * columnas
+        totales = np.bincount(clave, weights=self.importes[idx], minlength=tamano).reshape(len(posiciones), columnas)
+        pagos = np.bincount(clave, minlength=tamano).reshape(len(posiciones), columnas) > 0
+        return primero, totales, pagos
+
+    def _calcular(self, posiciones, anio_referencia):
+        primero, totales, pagos = self._matriz_anual(posiciones)
+        filas = np.arange(len(posiciones))
+        anios = primero + np.arange(totales.shape[1])
+        # Racha: años consecutivos con pago que terminan en el último año con pago, si es este año o el anterior.
+        tiene = pagos.any(axis=1)
+        ultimo = totales.shape[1] - 1 - np.argmax(pagos[:, ::-1], axis=1)
+        acumulado = np.cumsum(pagos, axis=1)
+        racha_hasta = acumulado - np.maximum.accumulate(np.where(pagos, 0, acumulado), axis=1)
+        racha = np.where(tiene & (anios[ultimo] >= anio_referencia - 1), racha_hasta[filas, ultimo], 0)
+        # CAGR sobre los últimos CAGR_YEARS años completos con total positivo.
+        positivos = (totales > 0) & (anios <= anio_referencia - 1)[None, :]
+        cuantos = positivos.sum(axis=1)
+        desde_final = np.cumsum(positivos[:, ::-1], axis=1)[:, ::-1]
+        k = np.minimum(CAGR_YEARS, cuantos)
+        inicio = np.argmax(positivos & (desde_final == k[:, None]), axis=1)
+        fin = np.argmax(positivos & (desde_final == 1), axis=1)
+        periodos = fin - inicio
+        valido = (racha >= 2) & (cuantos >= 2) & (periodos > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cagr = ((totales[filas, fin] / totales[filas, inicio]) ** (1 / np.where(periodos > 0, periodos, 1)) - 1) * 100
+        self._racha[posiciones] = racha
+        self._cagr[posiciones] = np.where(valido, cagr, np.nan)
+        self._anio_memo[posiciones] = anio_referencia
+
+    def _asegurar(self, posiciones, anio_referencia):
+        posiciones = np.asarray(posiciones, dtype=np.int64)
+        pendientes = posiciones[self._anio_memo[posiciones] != anio_referencia]
+        if len(pendientes): self._calcular(pendientes, anio_referencia)
+
+    # ------------------------------------------------------------------ lectura
+    def metricas_universo(self, precios=None, ahora=None):
+        """Una fila por símbolo con las columnas que usa puntuacion_vectorizada: anios_consecutivos_dividendo,
+        crecimiento_div_raw, dividendos_12m y, si se pasan precios ({simbolo: precio}), rendimiento_div."""
+        ahora = ahora or datetime.now()
+        with self._lock:
+            posiciones = np.arange(len(self.simbolos))
+            self._asegurar(posiciones, ahora.year)
+            tabla = pd.DataFrame({
+                'anios_consecutivos_dividendo': self._racha[posiciones], 'crecimiento_div_raw': self._cagr[posiciones],
+                'dividendos_12m': self._dividendos_12m(posiciones, ahora),
+            }, index=pd.Index(list(self.simbolos), name='simbolo'))
+            con_pagos = self.longitud[posiciones] > 0
+        if precios is not None:
+            precio = pd.Series(precios, dtype=float).reindex(tabla.index).to_numpy()
+            with np.errstate(divide='ignore', invalid='ignore'):
+                tabla['rendimiento_div'] = np.where(con_pagos & (precio > 0), tabla['dividendos_12m'] / precio * 100, np.nan)
+        return tabla
+
+    def totales_anuales_universo(self):
+        """Matriz símbolos x años con la suma de los pagos de cada año natural."""
+        with self._lock:
+            posiciones = np.arange(len(self.simbolos))
+            primero, totales, _ = self._matriz_anual(posiciones)
+            simbolos = list(self.simbolos)
+        return pd.DataFrame(totales, index=pd.Index(simbolos, name='simbolo'), columns=primero + np.arange(totales.shape[1]))
+
+    def _dividendos_12m(self, posiciones, ahora):
+        umbral = pd.Timestamp(ahora).tz_localize(None) if pd.Timestamp(ahora).tz is None else pd.Timestamp(ahora).tz_convert('UTC').tz_localize(None)
+        umbral = (umbral - timedelta(days=365)).value
+        fila, idx = self._eventos(posiciones)
+        recientes = np.where(self.fechas[idx] >= umbral, self.importes[idx], 0.0)
+        return np.bincount(fila, weights=recientes, minlength=len(posiciones))
+
+    def racha(self, simbolo, ahora=None):
+        with self._lock:
+            i = self._indice[simbolo]
+            self._asegurar([i], (ahora or datetime.now()).year)
+            return int(self._racha[i])
+
+    def crecimiento(self, simbolo, ahora=None):
+        """CAGR (%) del dividendo en los últimos CAGR_YEARS años completos, o None (misma regla que el analizador)."""
+        with self._lock:
+            i = self._indice[simbolo]
+            self._asegurar([i], (ahora or datetime.now()).year)
+            cagr = float(self._cagr[i])
+        return None if np.isnan(cagr) else cagr
+
+    def dividendos_12m(self, simbolo, ahora=None):
+        with self._lock:
+            return float(self._dividendos_12m(np.array([self._indice[simbolo]]), ahora or pd.Timestamp.now(tz='UTC'))[0])
+
+    def totales_anuales(self, simbolo):
+        """Serie de totales anuales > 0 indexada por fin de año, como dividendos.resample('YE').sum() filtrado."""
+        with self._lock:
+            i = self._indice[simbolo]
+            ini, n = int(self.inicio[i]), int(self.longitud[i])
+            importes, anios = self.importes[ini:ini + n].copy(), self.anios[ini:ini + n].copy()
+        totales = pd.Series(importes).groupby(anios).sum()
+        totales = totales[totales > 0]
+        return pd.Series(totales.to_numpy(), index=pd.to_datetime([f"{a}-12-31" for a in totales.index]))
+
+
+# ==============================================================================
+# SECCIÓN 2: VERIFICACIÓN CONTRA EL ANALIZADOR Y BENCHMARK
+# ==============================================================================
+def benchmark(n_simbolos=2000, semilla=0):
+    """Racha, CAGR y rendimiento de todo el universo: analizador a analizador frente al almacén, con comparación de resultados."""
+    from analizador_acciones import AnalizadorAccion
+    from datos_sinteticos import GeneradorSintetico, simbolos_sinteticos
+    from proveedores_datos import ProveedorMemoria
+    generador = GeneradorSintetico(semilla)
+    datos = {s: generador.datos_simbolo(s) for s in simbolos_sinteticos(n_simbolos)}
+    proveedor = ProveedorMemoria(datos)
+    analizadores = [AnalizadorAccion(s, proveedor=proveedor) for s in datos]
+    for a in analizadores: a.datos_completos
+    inicio = time.perf_counter()
+    por_objeto = {a.simbolo: (a.tendencias.get('anios_consecutivos_dividendo'), a._calcular_crecimiento_dividendos(),
+                              a._calcular_rendimiento_dividendos()) for a in analizadores}
+    t_objeto = time.perf_counter() - inicio
+    almacen = AlmacenDividendos()
+    inicio = time.perf_counter()
+    almacen.cargar_universo({s: d['dividendos'] for s, d in datos.items()})
+    t_carga = time.perf_counter() - inicio
+    precios = {a.simbolo: a.datos_completos['precio_actual'] for a in analizadores}
+    inicio = time.perf_counter()
+    tabla = almacen.metricas_universo(precios)
+    t_vectorizado = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    almacen.metricas_universo(precios)
+    t_memorizado = time.perf_counter() - inicio
+    diferencias = 0
+    for s, (racha, cagr, rendimiento) in por_objeto.items():
+        fila = tabla.loc[s]
+        # Sin estados financieros el analizador no calcula racha ni CAGR; solo se compara el rendimiento.
+        if racha is not None:
+            diferencias += fila['anios_consecutivos_dividendo'] != racha
+            diferencias += not np.isclose(np.nan if cagr is None else cagr, fila['crecimiento_div_raw'], equal_nan=True)
+        diferencias += not np.isclose(np.nan if rendimiento is None else rendimiento, fila['rendimiento_div'], equal_nan=True)
+    return {'simbolos': n_simbolos, 'eventos': int(almacen.longitud[:len(almacen)].sum()), 'diferencias': int(diferencias),
+            'segundos_por_analizador': round(t_objeto, 3), 'segundos_carga_almacen': round(t_carga, 3),
+            'segundos_vectorizado': round(t_vectorizado, 4), 'segundos_memorizado': round(t_memorizado, 4)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Métricas de dividendo de todo un universo sintético desde el almacén columnar.")
+    parser.add_argument('--simbolos', type=int, default=2000)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    print(benchmark(args.simbolos))
@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+import argparse
+import itertools
+import time
+import logging
+from analizador_acciones import JUECES, SECTORES_CICLICOS
+from puntuacion_vectorizada import PONDERACIONES, CATEGORIAS, codigos_recomendacion, puntuar_universo
+
+# ==============================================================================
+# SECCIÓN 1: CONFIGURACIÓN DE LOS ESCENARIOS
+# ==============================================================================
+ESCENARIOS_POR_BLOQUE = 500  # acota la matriz intermedia a símbolos x 500
+TOP_N = 20
+
+
+def escenarios_aleatorios(n, semilla=0, concentracion=1.0):
+    """n vectores de pesos (uno por fila) que suman 1, muestreados de una Dirichlet simétrica."""
+    return np.random.default_rng(semilla).dirichlet(np.full(len(JUECES), concentracion), size=n)
+
+
+def rejilla(paso=0.1):
+    """Todas las combinaciones de pesos múltiplos de `paso` que suman 1 (paso=0.1 -> 8.008 escenarios)."""
+    unidades = int(round(1 / paso))
+    # Estrellas y barras: la posición de los len(JUECES)-1 separadores fija cuántas unidades recibe cada juez.
+    filas = []
+    for separadores in itertools.combinations(range(unidades + len(JUECES) - 1), len(JUECES) - 1):
+        limites = (-1, *separadores, unidades + len(JUECES) - 1)
+        filas.append([limites[i + 1] - limites[i] - 1 for i in range(len(JUECES))])
+    return np.array(filas, dtype=float) / unidades
+
+
+# ==============================================================================
+# SECCIÓN 2: MATRIZ DE PUNTUACIONES CACHEADA Y EVALUACIÓN EN BLOQUE
+# ==============================================================================
+class MatrizEscenarios:
+    """Puntuaciones símbolos x jueces calculadas una vez; cada escenario de pesos es solo un producto matricial."""
+
+    def __init__(self, puntuaciones, factor_penalizacion, sectores, base=PONDERACIONES):
+        self.simbolos = np.asarray(puntuaciones.index)
+        self.puntuaciones = np.clip(np.nan_to_num(puntuaciones[list(JUECES)].to_numpy(dtype=float)), 0.0, 100.0)
+        self.factor = np.asarray(factor_penalizacion, dtype=float)
+        self.ciclico = pd.Series(sectores).isin(SECTORES_CICLICOS).to_numpy()
+        self.base = np.asarray(base, dtype=float)
+        self.prob_base = self.probabilidades(self.base[None, :])[:, 0]
+        self.codigos_base = self._codigos(self.prob_base[:, None])[:, 0]
+        self.rango_base = self._rangos(self.prob_base[:, None])[:, 0]
+
+    @classmethod
+    def desde_tabla(cls, tabla, umbrales=None):
+        r = puntuar_universo(tabla, umbrales)
+        return cls(r[list(JUECES)], r['factor_penalizacion'], tabla.loc[r.index, 'sector'])
+
+    @classmethod
+    def desde_analizadores(cls, analizadores):
+        from puntuacion_vectorizada import construir_tabla
+        return cls.desde_tabla(construir_tabla(analizadores))
+
+    def probabilidades(self, ponderaciones):
+        """Probabilidad ajustada (símbolos x escenarios), con el mismo redondeo y recorte que _calcular_probabilidad_inversion."""
+        base = np.round(np.clip(self.puntuaciones @ np.asarray(ponderaciones, dtype=float).T, 0.0, 100.0), 2)
+        return base * self.factor[:, None]
+
+    def _codigos(self, probabilidades):
+        return codigos_recomendacion(probabilidades, self.factor[:, None], self.ciclico[:, None])
+
+    @staticmethod
+    def _rangos(probabilidades):
+        # Rango 1 = mejor puntuación; un solo argsort por columna y una dispersión en lugar de un segundo argsort.
+        orden = np.argsort(-probabilidades, axis=0, kind='stable')
+        rangos = np.empty_like(orden)
+        np.put_along_axis(rangos, orden, np.arange(1, len(probabilidades) + 1)[:, None], axis=0)
+        return rangos
+
+    def evaluar(self, ponderaciones, top_n=TOP_N, por_bloque=ESCENARIOS_POR_BLOQUE):
+        """Una fila por escenario: pesos, correlación de rangos con la base, solape del top-N y cambios de categoría."""
+        ponderaciones = np.atleast_2d(np.asarray(ponderaciones, dtype=float))
+        n = len(self.simbolos)
+        top_n = min(top_n, n)
+        en_top_base = self.rango_base <= top_n
+        bloques = []
+        for inicio in range(0, len(ponderaciones), por_bloque):
+            w = ponderaciones[inicio:inicio + por_bloque]
+            prob = self.probabilidades(w)
+            rangos = self._rangos(prob)
+            codigos = self._codigos(prob)
+            d2 = ((rangos - self.rango_base[:, None]).astype(float) ** 2).sum(axis=0)
+            bloque = {f"w_{j}": w[:, i] for i, j in enumerate(JUECES)}
+            bloque['spearman'] = 1 - 6 * d2 / (n * (n * n - 1)) if n > 1 else np.ones(len(w))
+            bloque[f"solape_top{top_n}"] = ((rangos <= top_n) & en_top_base[:, None]).sum(axis=0) / top_n
+            bloque['cambios_categoria'] = (codigos != self.codigos_base[:, None]).sum(axis=0)
+            for c, categoria in enumerate(CATEGORIAS): bloque[categoria] = (codigos == c).sum(axis=0)
+            bloque['mejor'] = self.simbolos[np.argmax(prob, axis=0)]
+            bloques.append(pd.DataFrame(bloque))
+        return pd.concat(bloques, ignore_index=True)
+
+    def detalle(self, ponderaciones):
+        """Por símbolo, rango y categoría bajo la base y bajo un escenario concreto."""
+        prob = self.probabilidades(np.asarray(ponderaciones, dtype=float)[None, :])
+        rangos, codigos = self._rangos(prob)[:, 0], self._codigos(prob)[:, 0]
+        return pd.DataFrame({
+            'probabilidad_base': self.prob_base, 'probabilidad_escenario': prob[:, 0],
+            'rango_base': self.rango_base, 'rango_escenario': rangos, 'salto': self.rango_base - rangos,
+            'categoria_base': CATEGORIAS[self.codigos_base], 'categoria_escenario': CATEGORIAS[codigos],
+        }, index=pd.Index(self.simbolos, name='simbolo')).sort_values('rango_escenario')
+
+
+# ==============================================================================
+# SECCIÓN 3: UNIVERSO SINTÉTICO Y BENCHMARK
+# ==============================================================================
+def matriz_sintetica(n_simbolos=3000, n_analizadores=500, semilla=0):
+    """Universo de n_simbolos filas repitiendo (con ruido leve en las puntuaciones) las de n_analizadores sintéticos."""
+    from analizador_acciones import AnalizadorAccion
+    from datos_sinteticos import ProveedorSintetico, simbolos_sinteticos
+    from puntuacion_vectorizada import construir_tabla
+    proveedor = ProveedorSintetico(semilla)
+    tabla = construir_tabla([AnalizadorAccion(s, proveedor=proveedor) for s in simbolos_sinteticos(min(n_analizadores, n_simbolos))])
+    r = puntuar_universo(tabla)
+    repeticiones = -(-n_simbolos // len(r))
+    puntuaciones = pd.concat([r[list(JUECES)]] * repeticiones).iloc[:n_simbolos]
+    ruido = np.random.default_rng(semilla).normal(0, 1.0, puntuaciones.shape)
+    puntuaciones = (puntuaciones + ruido).clip(0, 100)
+    puntuaciones.index = simbolos_sinteticos(n_simbolos)
+    factor = np.tile(r['factor_penalizacion'].to_numpy(), repeticiones)[:n_simbolos]
+    sectores = np.tile(tabla.loc[r.index, 'sector'].to_numpy(), repeticiones)[:n_simbolos]
+    return MatrizEscenarios(puntuaciones, factor, sectores)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evalúa miles de vectores de pesos de los jueces sobre un universo ya puntuado.")
+    parser.add_argument('--simbolos', type=int, default=3000, help="Tamaño del universo sintético.")
+    parser.add_argument('--escenarios', type=int, default=10000, help="Vectores de pesos aleatorios (Dirichlet).")
+    parser.add_argument('--rejilla', type=float, metavar='PASO', help="Usa la rejilla completa de pesos con este paso en vez de muestreo aleatorio.")
+    parser.add_argument('--top', type=int, default=TOP_N)
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--salida', help="CSV con una fila por escenario.")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    inicio = time.perf_counter()
+    matriz = matriz_sintetica(args.simbolos, semilla=args.semilla)
+    t_matriz = time.perf_counter() - inicio
+    ponderaciones = rejilla(args.rejilla) if args.rejilla else escenarios_aleatorios(args.escenarios, args.semilla)
+    inicio = time.perf_counter()
+    resultados = matriz.evaluar(ponderaciones, args.top)
+    t_evaluacion = time.perf_counter() - inicio
+    print(f"Matriz {len(matriz.simbolos)} x {len(JUECES)} construida en {t_matriz:.1f}s; "
+          f"{len(ponderaciones)} escenarios evaluados en {t_evaluacion:.2f}s.")
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(resultados.sort_values('spearman').head(5).round(3).to_string(index=False))
+    if args.salida: resultados.to_csv(args.salida, index=False)
@@ -0,0 +1,165 @@
+import argparse
+import csv
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from analizador_acciones import AnalizadorAccion, ResultadoAnalisis, JUECES
+from proveedores_datos import obtener_proveedor_por_defecto
+
+# ==============================================================================
+# SECCIÓN 1: CONFIGURACIÓN DE LA EXPORTACIÓN
+# ==============================================================================
+FORMATOS = {'.parquet': 'parquet', '.arrow': 'arrow', '.feather': 'arrow', '.csv': 'csv', '.jsonl': 'jsonl'}
+TAM_GRUPO_FILAS = 1000  # filas por row group / record batch en los formatos columnares
+COLUMNAS_TEXTO = {'simbolo', 'nombre', 'sector', 'fecha_datos', 'nivel_riesgo', 'recomendacion', 'penalizaciones', 'datasets_fallidos', 'resumen_negocio',
+                  *(f"razones_{j}" for j in JUECES)}
+COLUMNAS_ENTERAS = {'anios_consecutivos_dividendo'}
+
+
+# ==============================================================================
+# SECCIÓN 2: ESCRITORES EN STREAMING
+# ==============================================================================
+class EscritorResultados:
+    """Escribe ResultadoAnalisis uno a uno; ningún formato necesita tener el lote completo en memoria."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.columnas = ResultadoAnalisis.columnas()
+        self.filas = 0
+
+    def escribir(self, resultado):
+        self._escribir_fila(resultado.a_dict())
+        self.filas += 1
+
+    def _escribir_fila(self, fila):
+        raise NotImplementedError
+
+    def cerrar(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+class EscritorJSONL(EscritorResultados):
+    def __init__(self, ruta):
+        super().__init__(ruta)
+        self._fichero = open(ruta, 'w', encoding='utf-8')
+
+    def _escribir_fila(self, fila):
+        self._fichero.write(json.dumps(fila, ensure_ascii=False) + '\n')
+
+    def cerrar(self):
+        self._fichero.close()
+
+
+class EscritorCSV(EscritorResultados):
+    def __init__(self, ruta):
+        super().__init__(ruta)
+        self._fichero = open(ruta, 'w', encoding='utf-8', newline='')
+        self._csv = csv.DictWriter(self._fichero, fieldnames=self.columnas)
+        self._csv.writeheader()
+
+    def _escribir_fila(self, fila):
+        self._csv.writerow(fila)
+
+    def cerrar(self):
+        self._fichero.close()
+
+
+class EscritorArrow(EscritorResultados):
+    """Parquet o Arrow IPC (requiere pyarrow). Acumula como mucho `tam_grupo` filas antes de volcarlas."""
+
+    def __init__(self, ruta, formato='parquet', tam_grupo=TAM_GRUPO_FILAS):
+        super().__init__(ruta)
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("Exportar a Parquet/Arrow requiere pyarrow (pip install pyarrow); usa .csv o .jsonl si no está disponible.")
+        self._pa = pa
+        self.esquema = pa.schema([(c, pa.string() if c in COLUMNAS_TEXTO else pa.int64() if c in COLUMNAS_ENTERAS else pa.float64())
+                                  for c in self.columnas])
+        if formato == 'parquet':
+            import pyarrow.parquet as pq
+            self._escritor = pq.ParquetWriter(ruta, self.esquema)
+        else:
+            self._escritor = pa.ipc.new_file(ruta, self.esquema)
+        self.tam_grupo = tam_grupo
+        self._pendientes = []
+
+    def _escribir_fila(self, fila):
+        self._pendientes.append(fila)
+        if len(self._pendientes) >= self.tam_grupo: self._volcar()
+
+    def _volcar(self):
+        if not self._pendientes: return
+        self._escritor.write_table(self._pa.Table.from_pylist(self._pendientes, schema=self.esquema))
+        self._pendientes = []
+
+    def cerrar(self):
+        self._volcar()
+        self._escritor.close()
+
+
+def abrir_escritor(ruta, formato=None):
+    """Escritor según `formato` ('parquet', 'arrow', 'csv', 'jsonl') o, si no se indica, según la extensión de `ruta`."""
+    formato = formato or FORMATOS.get(os.path.splitext(ruta)[1].lower())
+    if formato in ('parquet', 'arrow'): return EscritorArrow(ruta, formato)
+    if formato == 'csv': return EscritorCSV(ruta)
+    if formato == 'jsonl': return EscritorJSONL(ruta)
+    raise ValueError(f"Formato de exportación desconocido para {ruta!r}. Usa uno de: {sorted(set(FORMATOS.values()))}")
+
+
+def exportar(resultados, ruta, formato=None):
+    """Escribe un iterable de ResultadoAnalisis en una sola pasada y devuelve cuántas filas se escribieron."""
+    with abrir_escritor(ruta, formato) as escritor:
+        for resultado in resultados:
+            if resultado is not None: escritor.escribir(resultado)
+    return escritor.filas
+
+
+# ==============================================================================
+# SECCIÓN 3: ANÁLISIS + EXPORTACIÓN CON MEMORIA PLANA
+# ==============================================================================
+def _resultado_simbolo(simbolo, proveedor, jueces):
+    try:
+        analizador = AnalizadorAccion(simbolo, proveedor=proveedor)
+        if not analizador.datos_completos: return None
+        analizador.ejecutar_analisis(jueces)
+        # El analizador (y sus DataFrames) se descarta aquí; solo sobrevive el registro compacto.
+        return analizador.resultado(liberar=True)
+    except Exception as e:
+        logging.error(f"Fallo analizando {simbolo}: {e}")
+        return None
+
+
+def analizar_y_exportar(simbolos, ruta, proveedor=None, max_trabajadores=8, jueces=None, formato=None):
+    proveedor = proveedor or obtener_proveedor_por_defecto()
+    with ThreadPoolExecutor(max_workers=max_trabajadores) as executor:
+        return exportar(executor.map(lambda s: _resultado_simbolo(s, proveedor, jueces), simbolos), ruta, formato)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analiza símbolos y exporta un registro por símbolo a Parquet/Arrow, CSV o JSONL.")
+    parser.add_argument('simbolos', nargs='*')
+    parser.add_argument('--archivo', help="Fichero con un símbolo por línea.")
+    parser.add_argument('--salida', required=True, help="Ruta de salida (.parquet, .arrow, .csv o .jsonl).")
+    parser.add_argument('--formato', choices=sorted(set(FORMATOS.values())))
+    parser.add_argument('--trabajadores', type=int, default=8)
+    parser.add_argument('--sintetico', type=int, metavar='N', help="Usa N símbolos sintéticos sin conexión.")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    simbolos, proveedor = list(args.simbolos), None
+    if args.archivo:
+        from analisis_lote import leer_simbolos
+        simbolos += leer_simbolos(args.archivo)
+    if args.sintetico:
+        from datos_sinteticos import ProveedorSintetico, simbolos_sinteticos
+        simbolos, proveedor = simbolos_sinteticos(args.sintetico), ProveedorSintetico()
+    if not simbolos: parser.error("Indica símbolos, un --archivo o --sintetico N.")
+    filas = analizar_y_exportar(simbolos, args.salida, proveedor, args.trabajadores, formato=args.formato)
+    print(f"{filas} resultados exportados a {args.salida}")
@@ -0,0 +1,205 @@
+import math
+import json
+import os
+import argparse
+import time
+import logging
+import pandas as pd
+
+# ==============================================================================
+# SECCIÓN 1: PARÁMETROS DE LOS INDICADORES (LOS MISMOS QUE USA pandas_ta)
+# ==============================================================================
+SMA_CORTA, SMA_LARGA = 50, 200
+RSI_PERIODO = 14
+MACD_RAPIDA, MACD_LENTA, MACD_SENAL = 12, 26, 9
+COLUMNAS_INDICADORES = ['SMA_50', 'SMA_200', 'RSI_14', 'MACD_12_26_9', 'MACDh_12_26_9', 'MACDs_12_26_9']
+TOLERANCIA_REAJUSTE = 1e-6
+
+
+# ==============================================================================
+# SECCIÓN 2: ESTADO O(1) POR SÍMBOLO
+# ==============================================================================
+class _EMA:
+    """EMA como la de pandas_ta: semilla con la SMA de las primeras `periodo` barras y luego ewm(span, adjust=False)."""
+    __slots__ = ('periodo', 'alfa', 'n', 'suma_semilla', 'valor')
+
+    def __init__(self, periodo):
+        self.periodo, self.alfa = periodo, 2.0 / (periodo + 1)
+        self.n, self.suma_semilla, self.valor = 0, 0.0, math.nan
+
+    def actualizar(self, x):
+        self.n += 1
+        if self.n < self.periodo: self.suma_semilla += x
+        elif self.n == self.periodo: self.valor = (self.suma_semilla + x) / self.periodo
+        else: self.valor = self.alfa * x + (1 - self.alfa) * self.valor
+        return self.valor
+
+    def a_dict(self):
+        return {'n': self.n, 'suma_semilla': self.suma_semilla, 'valor': self.valor}
+
+    def cargar(self, datos):
+        self.n, self.suma_semilla, self.valor = datos['n'], datos['suma_semilla'], datos['valor']
+
+
+class EstadoIndicadores:
+    """Estado incremental de SMA 50/200, RSI 14 (suavizado de Wilder) y MACD 12/26/9 de un símbolo.
+
+    Cada barra nueva se procesa en O(1) sin volver a recorrer la historia. El RSI acumula las
+    ganancias y pérdidas con alfa = 1/14 y los pesos normalizados que usa pandas_ta (ewm con
+    adjust=True), por lo que coincide con él también en las primeras barras.
+    """
+    __slots__ = ('buffer', 'posicion', 'n', 'suma_corta', 'suma_larga', 'cierre_previo',
+                 'ganancias', 'perdidas', 'n_deltas', 'ema_rapida', 'ema_lenta', 'senal', 'macd', 'ultima_fecha')
+
+    def __init__(self):
+        self.buffer = [0.0] * SMA_LARGA
+        self.posicion = self.n = 0
+        self.suma_corta = self.suma_larga = 0.0
+        self.cierre_previo = math.nan
+        self.ganancias = self.perdidas = 0.0
+        self.n_deltas = 0
+        self.ema_rapida, self.ema_lenta, self.senal = _EMA(MACD_RAPIDA), _EMA(MACD_LENTA), _EMA(MACD_SENAL)
+        self.macd = math.nan
+        self.ultima_fecha = None
+
+    def actualizar(self, cierre, fecha=None):
+        cierre = float(cierre)
+        # Medias simples: el buffer circular guarda las últimas SMA_LARGA barras.
+        saliente_larga = self.buffer[self.posicion] if self.n >= SMA_LARGA else 0.0
+        saliente_corta = self.buffer[(self.posicion - SMA_CORTA) % SMA_LARGA] if self.n >= SMA_CORTA else 0.0
+        self.buffer[self.posicion] = cierre
+        self.posicion = (self.posicion + 1) % SMA_LARGA
+        self.suma_corta += cierre - saliente_corta
+        self.suma_larga += cierre - saliente_larga
+        self.n += 1
+        # RSI: alfa = 1/RSI_PERIODO; el denominador de la media ponderada se cancela en el cociente.
+        if not math.isnan(self.cierre_previo):
+            delta, decaimiento = cierre - self.cierre_previo, 1.0 - 1.0 / RSI_PERIODO
+            self.ganancias = max(delta, 0.0) + decaimiento * self.ganancias
+            self.perdidas = max(-delta, 0.0) + decaimiento * self.perdidas
+            self.n_deltas += 1
+        self.cierre_previo = cierre
+        # MACD: la señal es la EMA de la línea MACD desde su primer valor válido.
+        rapida, lenta = self.ema_rapida.actualizar(cierre), self.ema_lenta.actualizar(cierre)
+        if self.ema_lenta.n >= MACD_LENTA:
+            self.macd = rapida - lenta
+            self.senal.actualizar(self.macd)
+        if fecha is not None: self.ultima_fecha = pd.Timestamp(fecha)
+
+    def valores(self):
+        sma_corta = self.suma_corta / SMA_CORTA if self.n >= SMA_CORTA else math.nan
+        sma_larga = self.suma_larga / SMA_LARGA if self.n >= SMA_LARGA else math.nan
+        total = self.ganancias + self.perdidas
+        rsi = 100.0 * self.ganancias / total if self.n_deltas >= RSI_PERIODO and total > 0 else math.nan
+        senal = self.senal.valor
+        return {'SMA_50': sma_corta, 'SMA_200': sma_larga, 'RSI_14': rsi, 'MACD_12_26_9': self.macd,
+                'MACDh_12_26_9': self.macd - senal, 'MACDs_12_26_9': senal}
+
+    def a_dict(self):
+        orden = self.buffer[self.posicion:] + self.buffer[:self.posicion]
+        return {
+            'ultimos_cierres': orden[-min(self.n, SMA_LARGA):] if self.n else [], 'n': self.n,
+            'cierre_previo': self.cierre_previo, 'ganancias': self.ganancias, 'perdidas': self.perdidas, 'n_deltas': self.n_deltas,
+            'ema_rapida': self.ema_rapida.a_dict(), 'ema_lenta': self.ema_lenta.a_dict(), 'senal': self.senal.a_dict(),
+            'macd': self.macd, 'ultima_fecha': self.ultima_fecha.isoformat() if self.ultima_fecha is not None else None
+        }
+
+    @classmethod
+    def desde_dict(cls, datos):
+        estado = cls()
+        cierres = datos['ultimos_cierres']
+        estado.buffer = [0.0] * (SMA_LARGA - len(cierres)) + list(cierres)
+        estado.posicion, estado.n = 0, datos['n']
+        estado.suma_larga = sum(cierres[-SMA_LARGA:]) if estado.n >= SMA_LARGA else sum(cierres)
+        estado.suma_corta = sum(cierres[-SMA_CORTA:]) if estado.n >= SMA_CORTA else sum(cierres)
+        estado.cierre_previo, estado.ganancias, estado.perdidas = datos['cierre_previo'], datos['ganancias'], datos['perdidas']
+        estado.n_deltas, estado.macd = datos['n_deltas'], datos['macd']
+        estado.ema_rapida.cargar(datos['ema_rapida']); estado.ema_lenta.cargar(datos['ema_lenta']); estado.senal.cargar(datos['senal'])
+        estado.ultima_fecha = pd.Timestamp(datos['ultima_fecha']) if datos['ultima_fecha'] else None
+        return estado
+
+    @classmethod
+    def desde_precios(cls, precios_hist):
+        estado = cls()
+        for fecha, cierre in precios_hist['Close'].dropna().items(): estado.actualizar(cierre, fecha)
+        return estado
+
+
+# ==============================================================================
+# SECCIÓN 3: MOTOR PARA UNA LISTA DE SEGUIMIENTO
+# ==============================================================================
+class MotorIndicadores:
+    """Mantiene un EstadoIndicadores por símbolo y aplica solo las barras nuevas de cada histórico."""
+
+    def __init__(self):
+        self.estados = {}
+        self.barras_procesadas = 0
+
+    def actualizar(self, simbolo, precios_hist):
+        cierres = precios_hist['Close'].dropna()
+        estado = self.estados.get(simbolo)
+        if estado is not None and estado.ultima_fecha is not None:
+            previo = cierres.get(estado.ultima_fecha)
+            # auto_adjust reescala la historia tras cada dividendo o split: entonces se reconstruye.
+            if previo is None or not math.isclose(previo, estado.cierre_previo, rel_tol=TOLERANCIA_REAJUSTE):
+                logging.info(f"Histórico de {simbolo} reajustado o sin solape. Se reconstruyen los indicadores.")
+                estado = None
+            else:
+                cierres = cierres[cierres.index > estado.ultima_fecha]
+        if estado is None: estado = EstadoIndicadores()
+        for fecha, cierre in cierres.items(): estado.actualizar(cierre, fecha)
+        self.barras_procesadas += len(cierres)
+        self.estados[simbolo] = estado
+        return estado
+
+    def ultima_fila(self, simbolo, precios_hist):
+        """DataFrame de una fila (la última barra) con las columnas de indicadores que usan los jueces."""
+        estado = self.actualizar(simbolo, precios_hist)
+        fila = precios_hist.iloc[[-1]].copy()
+        for columna, valor in estado.valores().items(): fila[columna] = valor if not math.isnan(valor) else pd.NA
+        return fila
+
+    def guardar(self, ruta):
+        directorio = os.path.dirname(os.path.abspath(ruta))
+        os.makedirs(directorio, exist_ok=True)
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump({simbolo: estado.a_dict() for simbolo, estado in self.estados.items()}, f)
+
+    @classmethod
+    def cargar(cls, ruta):
+        motor = cls()
+        if os.path.exists(ruta):
+            with open(ruta, encoding='utf-8') as f:
+                motor.estados = {simbolo: EstadoIndicadores.desde_dict(d) for simbolo, d in json.load(f).items()}
+        return motor
+
+
+# ==============================================================================
+# SECCIÓN 4: VERIFICACIÓN CONTRA pandas_ta
+# ==============================================================================
+def comparar_con_pandas_ta(precios_hist):
+    """Diferencia absoluta, en la última barra, entre el estado incremental y pandas_ta."""
+    import pandas_ta as ta  # noqa: F401 (registra el accessor .ta)
+    df = precios_hist.copy()
+    df.ta.sma(length=SMA_CORTA, append=True); df.ta.sma(length=SMA_LARGA, append=True)
+    df.ta.rsi(append=True); df.ta.macd(append=True)
+    incremental = EstadoIndicadores.desde_precios(precios_hist).valores()
+    return {col: abs(float(df[col].iloc[-1]) - incremental[col]) for col in COLUMNAS_INDICADORES if col in df.columns}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verifica los indicadores incrementales contra pandas_ta y mide el coste por barra.")
+    parser.add_argument('--simbolos', type=int, default=50)
+    args = parser.parse_args()
+    from datos_sinteticos import ProveedorSintetico, simbolos_sinteticos
+    proveedor = ProveedorSintetico()
+    historicos = {s: proveedor.obtener(s, 'precios_historicos') for s in simbolos_sinteticos(args.simbolos)}
+    max_dif = {}
+    for precios in historicos.values():
+        for col, dif in comparar_con_pandas_ta(precios).items(): max_dif[col] = max(max_dif.get(col, 0.0), dif)
+    print("Máxima diferencia absoluta con pandas_ta:", {c: f"{d:.2e}" for c, d in max_dif.items()})
+    motor = MotorIndicadores()
+    for s, precios in historicos.items(): motor.actualizar(s, precios.iloc[:-1])
+    inicio = time.perf_counter()
+    for s, precios in historicos.items(): motor.ultima_fila(s, precios)
+    print(f"Refresco de {len(historicos)} símbolos con una barra nueva: {(time.perf_counter() - inicio) * 1000:.1f} ms")
@@ -0,0 +1,248 @@
+import pandas as pd
+import argparse
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from datetime import datetime
+import analizador_acciones as aa
+from analizador_acciones import AnalizadorAccion, DEPENDENCIAS
+from metricas import contar
+from proveedores_datos import DATASETS
+from vigilancia import ORDEN_RECALCULO, huella
+
+# ==============================================================================
+# SECCIÓN 1: CONFIGURACIÓN Y CLAVES POR CONTENIDO
+# ==============================================================================
+RUTA_MEMO_POR_DEFECTO = os.path.join(os.path.expanduser('~'), '.cache', 'verificador_acciones', 'memo_etapas.sqlite')
+MAX_BYTES_MEMO = 256 * 1024 * 1024
+FRACCION_TRAS_DESALOJO = 0.9  # al pasarse del límite se libera hasta el 90% para no desalojar en cada escritura
+VERSION_ETAPAS = 3  # súbela si cambia el código de alguna etapa: invalida todo lo memorizado
+NO_MEMORIZADOS = ('precio_actual',)  # un .iloc[-1]: cuesta menos calcularlo que buscarlo
+
+
+def _umbrales_fundamental(analizador):
+    sector = analizador.info.get('sector', 'N/A')
+    umbrales = aa.UMBRALES_POR_SECTOR.get(sector, aa.UMBRALES_POR_SECTOR['default'])
+    if analizador.indice_percentiles is not None: umbrales = analizador.indice_percentiles.umbrales(sector, umbrales)
+    return umbrales
+
+
+# Constantes (y colaboradores) que lee la función de cada etapa. Se consultan en el módulo al hacer la clave, así que un
+# cambio en tiempo de ejecución (o un umbral de otro sector) solo invalida las etapas que de verdad lo usan.
+# Cada nodo de DEPENDENCIAS tiene su entrada, aunque sea vacía: uno nuevo sin ella falla en lugar de no invalidarse nunca.
+CONFIGURACION_ETAPAS = {
+    'precio_actual': lambda a: [],
+    'hist_indicadores': lambda a: [type(a.motor_indicadores).__name__ if a.motor_indicadores is not None else 'pandas_ta'],
+    'tendencias': lambda a: [aa.ETIQUETAS_ESTADOS_ACTUALES],
+    'crecimiento_div_raw': lambda a: [aa.CAGR_YEARS],
+    'fundamental': lambda a: [_umbrales_fundamental(a), aa.ROE_UMBRAL_BUENO, aa.ROE_UMBRAL_ACEPTABLE],
+    'tecnica': lambda a: [aa.RSI_SOBREVENTA, aa.RSI_SOBRECOMPRA],
+    'consistencia_div': lambda a: [],
+    'rendimiento_div_score': lambda a: [],
+    'crecimiento_div_score': lambda a: [aa.SECTORES_CICLICOS, aa.CAGR_YEARS],
+    'crecimiento_general': lambda a: [],
+    'confianza_mgmt': lambda a: [],
+    'penalizacion': lambda a: [aa.FACTORES_PENALIZACION_ADAPTATIVOS, aa.FACTOR_DIVIDENDO_JOVEN_NEGATIVO, aa.FACTOR_PENALIZACION_MINIMO,
+                               aa.ROE_UMBRAL_ACEPTABLE, aa.SECTORES_CICLICOS],
+}
+
+
+def _configuracion(analizador, nodo):
+    return CONFIGURACION_ETAPAS[nodo](analizador)
+
+
+def _clave(*partes):
+    return hashlib.sha1(json.dumps(partes, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def claves_etapas(analizador):
+    """Clave de cada dataset (huella del contenido) y de cada etapa: hash de su nombre, su configuración y las claves
+    de lo que lee según DEPENDENCIAS. Si cambia un dataset o una constante, cambian su clave y las de sus dependientes."""
+    datos = analizador.datos_completos
+    hoy = datetime.now()
+    claves = {dataset: huella(datos.get(dataset)) for dataset in DATASETS}
+    claves.update(fecha=hoy.date().isoformat(), anio=hoy.year)
+    for nodo in ORDEN_RECALCULO:
+        claves[nodo] = _clave(nodo, VERSION_ETAPAS, _configuracion(analizador, nodo), [claves[previo] for previo in DEPENDENCIAS[nodo]])
+    return claves
+
+
+# ==============================================================================
+# SECCIÓN 2: CACHE EN DISCO CON LÍMITE DE TAMAÑO (LRU)
+# ==============================================================================
+class CacheEtapas:
+    """Salidas de etapas en SQLite por clave de contenido, con un tope de bytes y desalojo de lo usado hace más tiempo.
+    Lleva aciertos y fallos por etapa."""
+
+    def __init__(self, ruta=RUTA_MEMO_POR_DEFECTO, max_bytes=MAX_BYTES_MEMO):
+        self.ruta = ruta
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.aciertos, self.fallos = {}, {}
+        self.desalojados = 0
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+        with self._conectar() as conexion:
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("CREATE TABLE IF NOT EXISTS memo (clave TEXT PRIMARY KEY, etapa TEXT NOT NULL, "
+                             "usado_en REAL NOT NULL, bytes INTEGER NOT NULL, contenido BLOB NOT NULL)")
+            conexion.execute("CREATE INDEX IF NOT EXISTS memo_usado_en ON memo (usado_en)")
+            self._bytes = conexion.execute("SELECT COALESCE(SUM(bytes), 0) FROM memo").fetchone()[0]
+
+    def _conectar(self):
+        # Una conexión por operación, como ProveedorCache: la cache puede compartirse entre hilos.
+        return sqlite3.connect(self.ruta, timeout=30)
+
+    def _anotar(self, tabla, etapa, evento):
+        with self._lock: tabla[etapa] = tabla.get(etapa, 0) + 1
+        contar(evento, etapa=etapa)
+
+    def obtener(self, etapa, clave):
+        """(True, valor) si la salida está memorizada; (False, None) si no."""
+        with self._conectar() as conexion:
+            fila = conexion.execute("SELECT contenido FROM memo WHERE clave = ?", (clave,)).fetchone()
+            if fila is not None: conexion.execute("UPDATE memo SET usado_en = ? WHERE clave = ?", (time.time(), clave))
+        if fila is None:
+            self._anotar(self.fallos, etapa, 'memo_fallos')
+            return False, None
+        self._anotar(self.aciertos, etapa, 'memo_aciertos')
+        return True, pickle.loads(fila[0])
+
+    def guardar(self, etapa, clave, valor):
+        contenido = pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._conectar() as conexion:
+            previo = conexion.execute("SELECT bytes FROM memo WHERE clave = ?", (clave,)).fetchone()
+            conexion.execute("INSERT OR REPLACE INTO memo VALUES (?, ?, ?, ?, ?)", (clave, etapa, time.time(), len(contenido), contenido))
+        with self._lock:
+            self._bytes += len(contenido) - (previo[0] if previo else 0)
+            if self._bytes > self.max_bytes: self._desalojar()
+
+    def _desalojar(self):
+        objetivo = self.max_bytes * FRACCION_TRAS_DESALOJO
+        liberar, claves = self._bytes - objetivo, []
+        with self._conectar() as conexion:
+            for clave, tamano in conexion.execute("SELECT clave, bytes FROM memo ORDER BY usado_en"):
+                if liberar <= 0: break
+                claves.append(clave)
+                liberar -= tamano
+                self._bytes -= tamano
+            conexion.executemany("DELETE FROM memo WHERE clave = ?", [(c,) for c in claves])
+        self.desalojados += len(claves)
+        logging.debug(f"Memo de etapas: {len(claves)} entradas desalojadas ({self._bytes / 2**20:.1f} MB en uso).")
+
+    @property
+    def bytes_en_uso(self):
+        return self._bytes
+
+    def ratios(self):
+        """Aciertos, fallos y ratio de aciertos por etapa desde que se abrió la cache."""
+        etapas = sorted(set(self.aciertos) | set(self.fallos), key=lambda e: ORDEN_RECALCULO.index(e) if e in ORDEN_RECALCULO else len(ORDEN_RECALCULO))
+        filas = [{'etapa': e, 'aciertos': self.aciertos.get(e, 0), 'fallos': self.fallos.get(e, 0)} for e in etapas]
+        tabla = pd.DataFrame(filas, columns=['etapa', 'aciertos', 'fallos'])
+        tabla['ratio_aciertos'] = (tabla['aciertos'] / (tabla['aciertos'] + tabla['fallos'])).round(3)
+        return tabla
+
+    def reiniciar_estadisticas(self):
+        with self._lock: self.aciertos, self.fallos = {}, {}
+
+
+# ==============================================================================
+# SECCIÓN 3: ANÁLISIS MEMORIZADO
+# ==============================================================================
+def _calcular(analizador, nodo, calculos):
+    if nodo == 'hist_indicadores':
+        hist = analizador._calcular_indicadores_tecnicos()
+        # Solo la última fila: es lo único que leen el juez técnico y el resultado.
+        return hist if hist is None or hist.empty else hist.iloc[[-1]].copy()
+    if nodo == 'tendencias': return analizador._analizar_tendencias_historicas()
+    if nodo == 'crecimiento_div_raw': return analizador._calcular_crecimiento_dividendos()
+    if nodo == 'penalizacion': return analizador._calcular_penalizacion_dinamica()
+    return calculos[nodo]()
+
+
+def _asignar(analizador, nodo, valor):
+    if nodo == 'hist_indicadores': analizador.hist_indicadores = valor
+    elif nodo == 'tendencias': analizador.tendencias = valor
+    elif nodo == 'crecimiento_div_raw': analizador.scores['crecimiento_div_raw'] = (valor, [])
+    elif nodo == 'penalizacion': analizador.factor_penalizacion, analizador.razones_penalizacion = valor
+    else: analizador.scores[nodo] = valor
+
+
+def ejecutar_memoizado(analizador, cache):
+    """Equivale a analizador.ejecutar_analisis() con todos los jueces, pero cada etapa se busca antes en `cache` por la
+    clave de sus entradas. Las ponderaciones solo intervienen en la suma final, que se rehace siempre.
+    Devuelve cuántas etapas hubo que calcular (0 = símbolo sin cambios)."""
+    if not analizador.datos_completos: return None
+    claves = claves_etapas(analizador)
+    calculos = analizador._calculos_jueces()
+    analizador.scores = {}
+    calculadas = 0
+    for nodo in ORDEN_RECALCULO:
+        if nodo in NO_MEMORIZADOS: continue
+        encontrado, valor = cache.obtener(nodo, claves[nodo])
+        if not encontrado:
+            # Las dependencias ya están asignadas: ORDEN_RECALCULO es topológico.
+            valor = _calcular(analizador, nodo, calculos)
+            cache.guardar(nodo, claves[nodo], valor)
+            calculadas += 1
+        _asignar(analizador, nodo, valor)
+    analizador.probabilidad_base = analizador._calcular_probabilidad_inversion()
+    analizador.probabilidad_ajustada = analizador.probabilidad_base * analizador.factor_penalizacion
+    return calculadas
+
+
+# ==============================================================================
+# SECCIÓN 4: MEDICIÓN SOBRE ENTRADAS GUARDADAS
+# ==============================================================================
+def medir(n_simbolos=500, semilla=0, ruta=None, max_bytes=MAX_BYTES_MEMO):
+    """Tres pasadas sobre los mismos datos sintéticos: en frío, repetida y tras cambiar un umbral de un sector."""
+    import tempfile
+    from datos_sinteticos import GeneradorSintetico, simbolos_sinteticos
+    from proveedores_datos import ProveedorMemoria
+    generador = GeneradorSintetico(semilla)
+    proveedor = ProveedorMemoria({s: generador.datos_simbolo(s) for s in simbolos_sinteticos(n_simbolos)})
+    ruta = ruta or os.path.join(tempfile.mkdtemp(), 'memo_etapas.sqlite')
+    cache = CacheEtapas(ruta, max_bytes)
+
+    def pasada(nombre):
+        cache.reiniciar_estadisticas()
+        inicio = time.perf_counter()
+        analizadores = [AnalizadorAccion(s, proveedor=proveedor) for s in proveedor.datos]
+        calculadas = [ejecutar_memoizado(a, cache) for a in analizadores]
+        segundos = time.perf_counter() - inicio
+        referencia = []
+        for a in analizadores:
+            b = AnalizadorAccion(a.simbolo, proveedor=proveedor)
+            b.ejecutar_analisis()
+            referencia.append(b)
+        diferencias = sum(bool(a.datos_completos) and aa.informe_texto(a.resultado()) != aa.informe_texto(b.resultado()) for a, b in zip(analizadores, referencia))
+        ratios = cache.ratios().set_index('etapa')['ratio_aciertos'].to_dict()
+        return {'pasada': nombre, 'segundos': round(segundos, 2), 'simbolos_sin_calculo': sum(c == 0 for c in calculadas if c is not None),
+                'etapas_calculadas': sum(c or 0 for c in calculadas), 'diferencias': int(diferencias), **ratios}
+
+    filas = [pasada('en_frio'), pasada('repetida')]
+    original = aa.UMBRALES_POR_SECTOR['Technology']['PE_BAJO']
+    aa.UMBRALES_POR_SECTOR['Technology']['PE_BAJO'] = original + 5
+    try:
+        filas.append(pasada('umbral_technology'))
+    finally:
+        aa.UMBRALES_POR_SECTOR['Technology']['PE_BAJO'] = original
+    return pd.DataFrame(filas).set_index('pasada'), cache
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memorización de etapas por contenido: pasadas en frío, repetida y tras cambiar un umbral.")
+    parser.add_argument('--simbolos', type=int, default=500)
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--ruta', help="Fichero SQLite de la memo (por defecto, uno temporal).")
+    parser.add_argument('--max-mb', type=float, default=MAX_BYTES_MEMO / 2**20)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    tabla, cache = medir(args.simbolos, args.semilla, args.ruta, int(args.max_mb * 2**20))
+    with pd.option_context('display.width', 250, 'display.max_columns', None):
+        print(tabla.to_string())
+    print(f"Memo en disco: {cache.bytes_en_uso / 2**20:.1f} MB, {cache.desalojados} entradas desalojadas.")
@@ -0,0 +1,190 @@
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+from functools import wraps
+
+# ==============================================================================
+# SECCIÓN 1: CONFIGURACIÓN DE LA INSTRUMENTACIÓN
+# ==============================================================================
+CUANTILES = (0.5, 0.95, 0.99)
+PREFIJO_PROMETHEUS = 'verificador'
+_NULO = nullcontext()
+_registro = None  # None = instrumentación desactivada: medir() y contar() vuelven sin hacer nada
+
+
+# ==============================================================================
+# SECCIÓN 2: REGISTRO DE TIEMPOS Y CONTADORES
+# ==============================================================================
+def _cuantil(valores_ordenados, q):
+    if not valores_ordenados: return float('nan')
+    posicion = q * (len(valores_ordenados) - 1)
+    bajo = int(posicion)
+    alto = min(bajo + 1, len(valores_ordenados) - 1)
+    return valores_ordenados[bajo] + (valores_ordenados[alto] - valores_ordenados[bajo]) * (posicion - bajo)
+
+
+class RegistroMetricas:
+    """Acumula duraciones por etapa y contadores; reenvía cada evento a los sumideros. Seguro entre hilos."""
+
+    def __init__(self, sumideros=()):
+        self.sumideros = list(sumideros)
+        self.tiempos = defaultdict(list)
+        self.contadores = defaultdict(int)
+        self.series = defaultdict(int)  # (nombre, ((etiqueta, valor), ...)) -> total: el desglose de cada contador
+        self._lock = threading.Lock()
+
+    def observar(self, etapa, segundos, etiquetas=None):
+        with self._lock:
+            self.tiempos[etapa].append(segundos)
+            for sumidero in self.sumideros: sumidero.evento('tiempo', etapa, segundos, etiquetas)
+
+    def contar(self, nombre, n=1, etiquetas=None):
+        with self._lock:
+            self.contadores[nombre] += n
+            self.series[(nombre, tuple(sorted(etiquetas.items())) if etiquetas else ())] += n
+            for sumidero in self.sumideros: sumidero.evento('contador', nombre, n, etiquetas)
+
+    def resumen_etapas(self):
+        """Una fila por etapa: llamadas, segundos totales y cuantiles en milisegundos."""
+        with self._lock:
+            tiempos = {etapa: sorted(valores) for etapa, valores in self.tiempos.items()}
+        filas = []
+        for etapa, valores in sorted(tiempos.items(), key=lambda par: -sum(par[1])):
+            fila = {'etapa': etapa, 'llamadas': len(valores), 'total_s': round(sum(valores), 4)}
+            fila.update({f"p{int(q * 100)}_ms": round(_cuantil(valores, q) * 1000, 3) for q in CUANTILES})
+            filas.append(fila)
+        return filas
+
+    def resumen(self):
+        import pandas as pd
+        return pd.DataFrame(self.resumen_etapas(), columns=['etapa', 'llamadas', 'total_s', *(f"p{int(q * 100)}_ms" for q in CUANTILES)])
+
+    def cerrar(self):
+        for sumidero in self.sumideros: sumidero.cerrar(self)
+
+
+class _Cronometro:
+    __slots__ = ('registro', 'etapa', 'etiquetas', 'inicio')
+
+    def __init__(self, registro, etapa, etiquetas):
+        self.registro, self.etapa, self.etiquetas = registro, etapa, etiquetas
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registro.observar(self.etapa, time.perf_counter() - self.inicio, self.etiquetas)
+
+
+# ==============================================================================
+# SECCIÓN 3: SUMIDEROS
+# ==============================================================================
+class SumideroJSONL:
+    """Escribe una línea JSON por evento (tiempo o contador) según se producen."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._fichero = open(ruta, 'a', encoding='utf-8')
+
+    def evento(self, tipo, nombre, valor, etiquetas):
+        linea = {'ts': round(time.time(), 6), 'tipo': tipo, 'nombre': nombre, 'valor': valor}
+        # Anidadas: una etiqueta llamada 'nombre' o 'valor' no pisa los campos del evento.
+        if etiquetas: linea['etiquetas'] = etiquetas
+        self._fichero.write(json.dumps(linea, ensure_ascii=False) + '\n')
+
+    def cerrar(self, registro):
+        self._fichero.close()
+
+
+def _etiqueta_prometheus(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class SumideroPrometheus:
+    """Vuelca el registro en formato de texto de Prometheus al cerrar (apto para el textfile collector de node_exporter)."""
+
+    def __init__(self, ruta, prefijo=PREFIJO_PROMETHEUS):
+        self.ruta = ruta
+        self.prefijo = prefijo
+
+    def evento(self, tipo, nombre, valor, etiquetas):
+        pass
+
+    def texto(self, registro):
+        p = self.prefijo
+        lineas = [f"# TYPE {p}_etapa_segundos summary"]
+        with registro._lock:
+            tiempos = {etapa: sorted(valores) for etapa, valores in registro.tiempos.items()}
+            series = dict(registro.series)
+        for etapa, valores in sorted(tiempos.items()):
+            for q in CUANTILES:
+                lineas.append(f'{p}_etapa_segundos{{etapa="{etapa}",quantile="{q}"}} {_cuantil(valores, q):.6g}')
+            lineas.append(f'{p}_etapa_segundos_sum{{etapa="{etapa}"}} {sum(valores):.6g}')
+            lineas.append(f'{p}_etapa_segundos_count{{etapa="{etapa}"}} {len(valores)}')
+        lineas.append(f"# TYPE {p}_eventos_total counter")
+        for (nombre, etiquetas), n in sorted(series.items()):
+            # Una serie por combinación de etiquetas (p. ej. cache_aciertos por dataset).
+            extra = ''.join(f',{clave}="{_etiqueta_prometheus(valor)}"' for clave, valor in etiquetas)
+            lineas.append(f'{p}_eventos_total{{evento="{nombre}"{extra}}} {n}')
+        return '\n'.join(lineas) + '\n'
+
+    def cerrar(self, registro):
+        with open(self.ruta, 'w', encoding='utf-8') as f: f.write(self.texto(registro))
+
+
+def crear_sumidero(especificacion):
+    """'jsonl:RUTA' o 'prometheus:RUTA'."""
+    tipo, _, ruta = especificacion.partition(':')
+    if not ruta: raise ValueError(f"Sumidero sin ruta: {especificacion!r} (usa 'jsonl:RUTA' o 'prometheus:RUTA').")
+    if tipo == 'jsonl': return SumideroJSONL(ruta)
+    if tipo == 'prometheus': return SumideroPrometheus(ruta)
+    raise ValueError(f"Tipo de sumidero desconocido: {tipo!r}")
+
+
+# ==============================================================================
+# SECCIÓN 4: API DE INSTRUMENTACIÓN
+# ==============================================================================
+def activar(*sumideros):
+    global _registro
+    _registro = RegistroMetricas(sumideros)
+    return _registro
+
+
+def desactivar():
+    """Desactiva la instrumentación, cierra los sumideros y devuelve el registro acumulado."""
+    global _registro
+    registro, _registro = _registro, None
+    if registro is not None: registro.cerrar()
+    return registro
+
+
+def registro_activo():
+    return _registro
+
+
+def medir(etapa, **etiquetas):
+    """Context manager que cronometra un bloque; desactivado devuelve un nullcontext compartido."""
+    registro = _registro
+    if registro is None: return _NULO
+    return _Cronometro(registro, etapa, etiquetas or None)
+
+
+def medido(etapa):
+    """Decorador equivalente a envolver la función en medir(etapa)."""
+    def decorador(funcion):
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            registro = _registro
+            if registro is None: return funcion(*args, **kwargs)
+            with _Cronometro(registro, etapa, None):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def contar(nombre, n=1, **etiquetas):
+    registro = _registro
+    if registro is not None: registro.contar(nombre, n, etiquetas or None)
@@ -0,0 +1,218 @@
+import numpy as np
+import argparse
+import bisect
+import logging
+import math
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from proveedores_datos import plazo_descargas
+
+# ==============================================================================
+# SECCIÓN 1: CONFIGURACIÓN DE LOS UMBRALES ADAPTATIVOS
+# ==============================================================================
+METRICAS = ('trailingPE', 'priceToBook', 'debtToEquity')
+# Umbral de UMBRALES_POR_SECTOR -> (métrica de info, cuantil de la distribución actual del sector).
+CUANTILES_UMBRALES = {
+    'PE_BAJO': ('trailingPE', 0.25), 'PE_ALTO': ('trailingPE', 0.75),
+    'PB_BUENO': ('priceToBook', 0.25), 'PB_ALTO': ('priceToBook', 0.75),
+    'DEUDA_BAJA': ('debtToEquity', 0.25), 'DEUDA_ALTA': ('debtToEquity', 0.75),
+}
+MUESTRA_MINIMA = 20  # con menos valores en el sector se mantiene el umbral estático
+HILOS_CARGA = 8
+
+
+def _valor_valido(metrica, valor):
+    """Mismo filtro que el juez fundamental: PER y P/B solo cuentan si son positivos."""
+    if valor is None: return None
+    valor = float(valor)
+    if math.isnan(valor) or (metrica != 'debtToEquity' and valor <= 0): return None
+    return valor
+
+
+# ==============================================================================
+# SECCIÓN 2: DISTRIBUCIÓN ORDENADA E ÍNDICE POR SECTOR
+# ==============================================================================
+class DistribucionOrdenada:
+    """Valores de una métrica en un sector, siempre ordenados: percentil en O(log n) y cuantil en O(1)."""
+    __slots__ = ('valores',)
+
+    def __init__(self):
+        self.valores = []
+
+    def __len__(self):
+        return len(self.valores)
+
+    def insertar(self, valor):
+        bisect.insort(self.valores, valor)
+
+    def quitar(self, valor):
+        i = bisect.bisect_left(self.valores, valor)
+        if i < len(self.valores) and self.valores[i] == valor: del self.valores[i]
+
+    def percentil(self, valor):
+        """Fracción (0-1) de valores por debajo; los empates cuentan la mitad."""
+        if not self.valores: return None
+        return (bisect.bisect_left(self.valores, valor) + bisect.bisect_right(self.valores, valor)) / (2 * len(self.valores))
+
+    def cuantil(self, q):
+        """Cuantil con interpolación lineal, como np.quantile."""
+        if not self.valores: return None
+        posicion = q * (len(self.valores) - 1)
+        i = int(posicion)
+        if i + 1 >= len(self.valores): return self.valores[-1]
+        return self.valores[i] + (self.valores[i + 1] - self.valores[i]) * (posicion - i)
+
+
+class IndicePercentiles:
+    """Distribución actual de PER, P/B y deuda/capital por sector, mantenida símbolo a símbolo.
+
+    Actualizar un símbolo quita sus valores anteriores e inserta los nuevos (búsqueda binaria), así que refrescar un ticker
+    no obliga a recalcular los cuantiles del universo. Con umbrales() el juez fundamental puntúa contra los cuartiles
+    actuales del sector en lugar de la tabla estática UMBRALES_POR_SECTOR.
+    """
+
+    def __init__(self, muestra_minima=MUESTRA_MINIMA):
+        self.muestra_minima = muestra_minima
+        self._distribuciones = defaultdict(DistribucionOrdenada)
+        self._por_simbolo = {}
+        self._lock = threading.Lock()
+        self.actualizaciones = 0
+
+    def __len__(self):
+        with self._lock: return len(self._por_simbolo)
+
+    def __getstate__(self):
+        # Se envía a los procesos de analisis_paralelo: el lock no se serializa, cada copia crea el suyo.
+        with self._lock: return {clave: valor for clave, valor in self.__dict__.items() if clave != '_lock'}
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        self._lock = threading.Lock()
+
+    def actualizar(self, simbolo, info):
+        """Registra (o sustituye) los valores de un símbolo a partir de su info. Devuelve False si no cambió nada."""
+        info = info or {}
+        sector = info.get('sector', 'N/A')
+        valores = {m: v for m in METRICAS if (v := _valor_valido(m, info.get(m))) is not None}
+        with self._lock:
+            anterior = self._por_simbolo.get(simbolo)
+            if anterior == (sector, valores): return False
+            if anterior is not None: self._quitar(simbolo, anterior)
+            for metrica, valor in valores.items(): self._distribuciones[(sector, metrica)].insertar(valor)
+            self._por_simbolo[simbolo] = (sector, valores)
+            self.actualizaciones += 1
+        return True
+
+    def quitar(self, simbolo):
+        with self._lock:
+            anterior = self._por_simbolo.pop(simbolo, None)
+            if anterior is not None: self._quitar(simbolo, anterior)
+
+    def _quitar(self, simbolo, anterior):
+        sector, valores = anterior
+        for metrica, valor in valores.items(): self._distribuciones[(sector, metrica)].quitar(valor)
+
+    def cargar(self, infos):
+        """Registra {simbolo: info}; devuelve cuántos símbolos cambiaron."""
+        return sum(self.actualizar(simbolo, info) for simbolo, info in infos.items())
+
+    def cargar_proveedor(self, proveedor, simbolos, max_hilos=HILOS_CARGA, plazo=None):
+        """Descarga la info de los símbolos (con la cache delante, el análisis posterior la reutiliza) y la registra.
+        Un símbolo sin info se omite; `plazo` limita los segundos de cada uno. Devuelve cuántos cambiaron."""
+        def info(simbolo):
+            try:
+                with plazo_descargas(plazo): return simbolo, proveedor.obtener(simbolo, 'info')
+            except Exception as e:
+                logging.warning(f"Sin info de {simbolo} para los umbrales adaptativos: {e}")
+                return simbolo, None
+
+        with ThreadPoolExecutor(max_workers=max_hilos, thread_name_prefix='percentiles') as ejecutor:
+            return self.cargar({simbolo: valor for simbolo, valor in ejecutor.map(info, simbolos) if valor})
+
+    def tamano(self, sector, metrica):
+        with self._lock:
+            distribucion = self._distribuciones.get((sector, metrica))
+            return len(distribucion) if distribucion is not None else 0
+
+    def percentil(self, sector, metrica, valor):
+        """Posición (0-1) de `valor` dentro del sector, o None si el sector no tiene datos de esa métrica."""
+        with self._lock:
+            distribucion = self._distribuciones.get((sector, metrica))
+            return distribucion.percentil(float(valor)) if distribucion is not None else None
+
+    def cuantil(self, sector, metrica, q):
+        with self._lock:
+            distribucion = self._distribuciones.get((sector, metrica))
+            return distribucion.cuantil(q) if distribucion is not None else None
+
+    def umbrales(self, sector, base):
+        """Copia de `base` (la entrada de UMBRALES_POR_SECTOR) con los umbrales sustituidos por cuantiles del sector
+        cuando este tiene al menos muestra_minima valores de la métrica."""
+        umbrales = dict(base)
+        with self._lock:
+            for clave, (metrica, q) in CUANTILES_UMBRALES.items():
+                distribucion = self._distribuciones.get((sector, metrica))
+                if distribucion is None or len(distribucion) < self.muestra_minima: continue
+                valor = distribucion.cuantil(q)
+                # debtToEquity viene en %, y el juez compara el ratio (deuda_ratio /= 100).
+                umbrales[clave] = valor / 100 if metrica == 'debtToEquity' else valor
+        return umbrales
+
+
+# ==============================================================================
+# SECCIÓN 3: BENCHMARK
+# ==============================================================================
+def benchmark(n_simbolos=10000, n_operaciones=20000, semilla=0):
+    """Coste de cargar, actualizar y consultar el índice frente a recalcular los cuantiles del sector por consulta."""
+    from analizador_acciones import UMBRALES_POR_SECTOR
+    from datos_sinteticos import GeneradorSintetico, simbolos_sinteticos
+    generador = GeneradorSintetico(semilla)
+    infos = {s: generador.info(s) for s in simbolos_sinteticos(n_simbolos)}
+    rng = np.random.default_rng(semilla)
+    indice = IndicePercentiles()
+    inicio = time.perf_counter()
+    indice.cargar(infos)
+    t_carga = time.perf_counter() - inicio
+
+    simbolos = list(infos)
+    elegidos = [simbolos[i] for i in rng.integers(0, len(simbolos), n_operaciones)]
+    factores = rng.lognormal(0, 0.05, n_operaciones)
+    refrescos = [{**infos[s], 'trailingPE': (infos[s].get('trailingPE') or 15.0) * f} for s, f in zip(elegidos, factores)]
+    inicio = time.perf_counter()
+    for s, info in zip(elegidos, refrescos): indice.actualizar(s, info)
+    t_actualizar = time.perf_counter() - inicio
+
+    consultas = [(infos[s]['sector'], info['trailingPE']) for s, info in zip(elegidos, refrescos)]
+    inicio = time.perf_counter()
+    for sector, pe in consultas: indice.percentil(sector, 'trailingPE', pe)
+    t_percentil = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    for sector, _ in consultas: indice.umbrales(sector, UMBRALES_POR_SECTOR.get(sector, UMBRALES_POR_SECTOR['default']))
+    t_umbrales = time.perf_counter() - inicio
+
+    # Referencia: reunir los valores del sector y calcular los cuantiles desde cero en cada consulta.
+    n_ingenuo = min(n_operaciones, 2000)
+    inicio = time.perf_counter()
+    for sector, _ in consultas[:n_ingenuo]:
+        for metrica in METRICAS:
+            valores = [v for v in (_valor_valido(metrica, i.get(metrica)) for i in infos.values() if i.get('sector') == sector) if v is not None]
+            np.quantile(valores, [0.25, 0.75])
+    t_ingenuo = time.perf_counter() - inicio
+    sectores = {sector for sector, _ in indice._distribuciones}
+    return {
+        'simbolos': n_simbolos, 'sectores': len(sectores), 'carga_s': round(t_carga, 3),
+        'actualizar_us': round(t_actualizar / n_operaciones * 1e6, 2), 'percentil_us': round(t_percentil / n_operaciones * 1e6, 2),
+        'umbrales_us': round(t_umbrales / n_operaciones * 1e6, 2), 'recalculo_completo_us': round(t_ingenuo / n_ingenuo * 1e6, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Índice de percentiles por sector: coste de actualización y consulta en un universo sintético.")
+    parser.add_argument('--simbolos', type=int, default=10000)
+    parser.add_argument('--operaciones', type=int, default=20000)
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    print(benchmark(args.simbolos, args.operaciones, args.semilla))
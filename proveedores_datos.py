@@ -0,0 +1,349 @@
+import os
+import pickle
+import random
+import sqlite3
+import time
+import threading
+import logging
+from contextlib import contextmanager
+from metricas import contar
+
+# ==============================================================================
+# SECCIÓN 1: CONSTANTES Y CONFIGURACIONES DE LOS PROVEEDORES
+# ==============================================================================
+DATASETS = ('info', 'precios_historicos', 'dividendos', 'financials', 'balance_sheet', 'cashflow')
+HORA, DIA = 3600, 24 * 3600
+TTL_POR_DATASET = {
+    'info': 12 * HORA,
+    'precios_historicos': 6 * HORA,
+    'dividendos': 7 * DIA,
+    'financials': 28 * DIA,
+    'balance_sheet': 28 * DIA,
+    'cashflow': 28 * DIA,
+}
+TTL_VACIO = 30 * 60  # una respuesta vacía (a menudo un fallo pasajero de yfinance) se vuelve a pedir pasado este tiempo
+RUTA_CACHE_POR_DEFECTO = os.path.join(os.path.expanduser('~'), '.cache', 'verificador_acciones', 'datos_mercado.sqlite')
+PERIODO_PRECIOS = '1y'
+MAX_REINTENTOS = 3
+ESPERA_BASE_REINTENTO = 1.0
+TIMEOUT_DESCARGA = 60  # segundos por llamada a yfinance (una llamada puede hacer varias peticiones HTTP)
+
+
+# ==============================================================================
+# SECCIÓN 2: PLAZOS DE LAS DESCARGAS
+# ==============================================================================
+_plazos = threading.local()
+
+
+@contextmanager
+def plazo_descargas(segundos):
+    """Tiempo máximo para todas las descargas que haga este hilo dentro del bloque (p. ej. las de un símbolo del lote)."""
+    anterior = getattr(_plazos, 'limite', None)
+    limite = time.monotonic() + segundos if segundos else None
+    # Un bloque anidado sin plazo propio conserva el de fuera; con plazo, manda el que venza antes.
+    _plazos.limite = min((l for l in (anterior, limite) if l is not None), default=None)
+    try:
+        yield
+    finally:
+        _plazos.limite = anterior
+
+
+def tiempo_restante():
+    """Segundos que le quedan al plazo del hilo actual, o None si no tiene plazo."""
+    limite = getattr(_plazos, 'limite', None)
+    return None if limite is None else limite - time.monotonic()
+
+
+def ejecutar_con_plazo(funcion, plazo, descripcion):
+    """Ejecuta funcion() en un hilo aparte y lanza TimeoutError si no termina en `plazo` segundos.
+
+    yfinance no deja fijar un timeout en cada llamada (info, dividends, financials...). Quien llama queda libre al
+    vencer el plazo; el hilo auxiliar termina cuando la librería suelte la petición colgada.
+    """
+    if plazo is None: return funcion()
+    if plazo <= 0: raise TimeoutError(f"Sin tiempo para descargar {descripcion}.")
+    resultado = {}
+
+    def objetivo():
+        try:
+            resultado['valor'] = funcion()
+        except BaseException as e:
+            resultado['error'] = e
+
+    hilo = threading.Thread(target=objetivo, name=f"descarga-{descripcion}", daemon=True)
+    hilo.start()
+    hilo.join(plazo)
+    if hilo.is_alive():
+        contar('descargas_colgadas')
+        raise TimeoutError(f"{descripcion} sin respuesta tras {plazo:.0f}s.")
+    if 'error' in resultado: raise resultado['error']
+    return resultado['valor']
+
+
+def _plazo(timeout):
+    restante = tiempo_restante()
+    if restante is None: return timeout
+    return restante if not timeout else min(timeout, restante)
+
+
+# ==============================================================================
+# SECCIÓN 3: INTERFAZ Y PROVEEDORES CONCRETOS
+# ==============================================================================
+class ProveedorDatos:
+    """Interfaz común: devuelve un dataset ('info', 'precios_historicos', ...) de un símbolo."""
+
+    def obtener(self, simbolo, dataset):
+        raise NotImplementedError
+
+    def obtener_todos(self, simbolo):
+        return {dataset: self.obtener(simbolo, dataset) for dataset in DATASETS}
+
+    def precargar(self, simbolos, dataset):
+        """Anuncia que se va a pedir `dataset` de estos símbolos, para proveedores que pueden descargarlo en bloque
+        (descarga_lotes.ProveedorPreciosLote). Por defecto no hace nada: cada obtener() va por su cuenta."""
+        return 0
+
+    def descartar_precarga(self):
+        """Olvida lo anunciado con precargar() y aún no pedido (al terminar un lote). Por defecto no hay nada que soltar."""
+        return 0
+
+    def obtener_reciente(self, simbolo, dataset, max_antiguedad):
+        """Como obtener(), pero sin aceptar una copia local de más de `max_antiguedad` segundos aunque siga en su TTL."""
+        return self.obtener(simbolo, dataset)
+
+    def obtenido_en(self, simbolo, dataset):
+        """Hora (time.time()) en que se descargó la copia que sirve obtener(), o None si el proveedor no guarda copias."""
+        return None
+
+
+class ProveedorYFinance(ProveedorDatos):
+    """Descarga directa desde yfinance, sin ningún almacenamiento local."""
+    _ATRIBUTOS = {'info': 'info', 'dividendos': 'dividends', 'financials': 'financials',
+                  'balance_sheet': 'balance_sheet', 'cashflow': 'cashflow'}
+
+    def __init__(self, periodo_precios=PERIODO_PRECIOS, timeout=TIMEOUT_DESCARGA):
+        self.periodo_precios = periodo_precios
+        self.timeout = timeout
+
+    def obtener(self, simbolo, dataset):
+        if dataset != 'precios_historicos' and dataset not in self._ATRIBUTOS: raise KeyError(f"Dataset desconocido: {dataset}")
+        import yfinance as yf  # importación diferida: es costosa y no hace falta si todo sale de la cache local
+        # Un Ticker por llamada (crearlo no toca la red): guardarlos retendría lo que yfinance memoriza en cada uno
+        # para todo el universo durante toda la vida del proveedor.
+        stock = yf.Ticker(simbolo)
+        # Plazo: el menor entre el de cada llamada y lo que le quede al del hilo (plazo_descargas).
+        return ejecutar_con_plazo(lambda: self._descargar(stock, dataset), _plazo(self.timeout), f"{simbolo}/{dataset}")
+
+    def _descargar(self, stock, dataset):
+        if dataset == 'precios_historicos': return stock.history(period=self.periodo_precios, auto_adjust=True)
+        return getattr(stock, self._ATRIBUTOS[dataset])
+
+
+def _vacio(valor):
+    """None, un DataFrame/Series vacío o una info {} sin claves."""
+    if valor is None: return True
+    if isinstance(valor, dict): return not valor
+    return bool(getattr(valor, 'empty', False))
+
+
+class ProveedorCache(ProveedorDatos):
+    """Almacén SQLite (símbolo, dataset) delante de otro proveedor, con un TTL por dataset.
+
+    Las respuestas vacías no se guardan en disco (ocultarían los datos durante todo el TTL, semanas en los estados):
+    se recuerdan en memoria solo TTL_VACIO segundos y, si había una copia con datos, se sigue sirviendo esa.
+    """
+
+    def __init__(self, origen, ruta=RUTA_CACHE_POR_DEFECTO, ttls=None, ttl_vacio=TTL_VACIO):
+        self.origen = origen
+        self.ruta = ruta
+        self.ttls = {**TTL_POR_DATASET, **(ttls or {})}
+        self.ttl_vacio = ttl_vacio
+        self._vacios = {}  # (simbolo, dataset) -> (hora, valor vacío)
+        directorio = os.path.dirname(os.path.abspath(ruta))
+        os.makedirs(directorio, exist_ok=True)
+        with self._conectar() as conexion:
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute(
+                "CREATE TABLE IF NOT EXISTS datos (simbolo TEXT NOT NULL, dataset TEXT NOT NULL, "
+                "obtenido_en REAL NOT NULL, contenido BLOB NOT NULL, PRIMARY KEY (simbolo, dataset))"
+            )
+
+    def _conectar(self):
+        # Una conexión por operación: el proveedor puede compartirse entre hilos.
+        return sqlite3.connect(self.ruta, timeout=30)
+
+    def _leer(self, simbolo, dataset):
+        with self._conectar() as conexion:
+            fila = conexion.execute("SELECT obtenido_en, contenido FROM datos WHERE simbolo = ? AND dataset = ?", (simbolo, dataset)).fetchone()
+        if fila is None: return None, None
+        return fila[0], pickle.loads(fila[1])
+
+    def _guardar(self, simbolo, dataset, valor):
+        contenido = pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._conectar() as conexion:
+            conexion.execute("INSERT OR REPLACE INTO datos VALUES (?, ?, ?, ?)", (simbolo, dataset, time.time(), contenido))
+
+    def precargar(self, simbolos, dataset):
+        # Solo se anuncian los símbolos sin copia local vigente: esos sí saldrán a la red.
+        with self._conectar() as conexion:
+            vigentes = {simbolo for simbolo, obtenido_en in conexion.execute(
+                "SELECT simbolo, obtenido_en FROM datos WHERE dataset = ?", (dataset,)) if time.time() - obtenido_en < self.ttls.get(dataset, 0)}
+        pendientes = [s for s in simbolos if s not in vigentes]
+        return self.origen.precargar(pendientes, dataset) if pendientes else 0
+
+    def descartar_precarga(self):
+        return self.origen.descartar_precarga()
+
+    def obtener(self, simbolo, dataset):
+        return self._obtener(simbolo, dataset, self.ttls.get(dataset, 0))
+
+    def obtener_reciente(self, simbolo, dataset, max_antiguedad):
+        return self._obtener(simbolo, dataset, min(self.ttls.get(dataset, 0), max_antiguedad))
+
+    def obtenido_en(self, simbolo, dataset):
+        with self._conectar() as conexion:
+            fila = conexion.execute("SELECT obtenido_en FROM datos WHERE simbolo = ? AND dataset = ?", (simbolo, dataset)).fetchone()
+        return fila[0] if fila else None
+
+    def _obtener(self, simbolo, dataset, ttl):
+        obtenido_en, valor = self._leer(simbolo, dataset)
+        # Una copia vacía guardada por versiones anteriores no cuenta como acierto.
+        if obtenido_en is not None and time.time() - obtenido_en < ttl and not _vacio(valor):
+            logging.debug(f"Cache local válida para {simbolo}/{dataset}.")
+            contar('cache_aciertos', dataset=dataset)
+            return valor
+        vacio = self._vacios.get((simbolo, dataset))
+        if vacio is not None and time.time() - vacio[0] < min(ttl, self.ttl_vacio):
+            contar('cache_vacios', dataset=dataset)
+            return valor if obtenido_en is not None and not _vacio(valor) else vacio[1]
+        contar('cache_fallos', dataset=dataset)
+        try:
+            nuevo = self.origen.obtener(simbolo, dataset)
+        except Exception as e:
+            if obtenido_en is None: raise
+            contar('cache_caducada_usada', dataset=dataset)
+            logging.warning(f"Fallo al refrescar {simbolo}/{dataset} ({e}). Se usa la copia local caducada.")
+            return valor
+        if not _vacio(nuevo):
+            self._vacios.pop((simbolo, dataset), None)
+            self._guardar(simbolo, dataset, nuevo)
+            return nuevo
+        self._vacios[(simbolo, dataset)] = (time.time(), nuevo)
+        if obtenido_en is not None and not _vacio(valor):
+            contar('cache_caducada_usada', dataset=dataset)
+            logging.warning(f"Respuesta vacía al refrescar {simbolo}/{dataset}. Se usa la copia local caducada.")
+            return valor
+        return nuevo
+
+    def invalidar(self, simbolo, dataset=None):
+        for clave in [c for c in self._vacios if c[0] == simbolo and dataset in (None, c[1])]: self._vacios.pop(clave, None)
+        with self._conectar() as conexion:
+            if dataset is None: conexion.execute("DELETE FROM datos WHERE simbolo = ?", (simbolo,))
+            else: conexion.execute("DELETE FROM datos WHERE simbolo = ? AND dataset = ?", (simbolo, dataset))
+
+
+class ProveedorMemoria(ProveedorDatos):
+    """Datos ya cargados en un dict {simbolo: {dataset: valor}}; útil para datos sintéticos."""
+
+    def __init__(self, datos):
+        self.datos = datos
+
+    def obtener(self, simbolo, dataset):
+        return self.datos.get(simbolo, {}).get(dataset)
+
+
+class ProveedorFixtures(ProveedorDatos):
+    """Lee datos grabados en <directorio>/<SIMBOLO>/<dataset>.pkl para trabajar sin conexión."""
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+
+    def _ruta(self, simbolo, dataset):
+        return os.path.join(self.directorio, simbolo, f"{dataset}.pkl")
+
+    def obtener(self, simbolo, dataset):
+        ruta = self._ruta(simbolo, dataset)
+        if not os.path.exists(ruta):
+            logging.debug(f"No hay fixture para {simbolo}/{dataset} en {self.directorio}.")
+            return None
+        with open(ruta, 'rb') as f:
+            return pickle.load(f)
+
+
+class LimitadorTasa:
+    """Reparte las llamadas de red entre hilos a un máximo de `llamadas_por_segundo`."""
+
+    def __init__(self, llamadas_por_segundo):
+        self.intervalo = 1.0 / llamadas_por_segundo if llamadas_por_segundo else 0.0
+        self._lock = threading.Lock()
+        self._siguiente = 0.0
+
+    def esperar(self, llamadas=1):
+        """Espera turno para `llamadas` peticiones seguidas (p. ej. una descarga conjunta que hace una por símbolo).
+        Si el turno llega después del plazo del hilo (plazo_descargas), lanza TimeoutError sin reservarlo."""
+        if not self.intervalo: return
+        restante = tiempo_restante()
+        with self._lock:
+            ahora = time.monotonic()
+            turno = max(ahora, self._siguiente)
+            if restante is not None and turno - ahora >= restante:
+                contar('turnos_fuera_de_plazo')
+                raise TimeoutError(f"Sin turno de descarga antes del plazo (faltan {max(restante, 0):.1f}s, el turno llega en {turno - ahora:.1f}s).")
+            self._siguiente = turno + self.intervalo * llamadas
+        if turno > ahora: time.sleep(turno - ahora)
+
+
+class ProveedorConReintentos(ProveedorDatos):
+    """Aplica el limitador de tasa y reintenta con espera exponencial los fallos transitorios."""
+
+    def __init__(self, origen, limitador=None, max_reintentos=MAX_REINTENTOS, espera_base=ESPERA_BASE_REINTENTO):
+        self.origen = origen
+        self.limitador = limitador
+        self.max_reintentos = max_reintentos
+        self.espera_base = espera_base
+
+    def precargar(self, simbolos, dataset):
+        return self.origen.precargar(simbolos, dataset)
+
+    def descartar_precarga(self):
+        return self.origen.descartar_precarga()
+
+    def obtener(self, simbolo, dataset):
+        for intento in range(self.max_reintentos + 1):
+            if self.limitador: self.limitador.esperar()
+            try:
+                return self.origen.obtener(simbolo, dataset)
+            except KeyError:
+                raise
+            except Exception as e:
+                if intento == self.max_reintentos:
+                    contar('descargas_fallidas', dataset=dataset)
+                    raise
+                espera = self.espera_base * (2 ** intento) * (0.5 + random.random())
+                restante = tiempo_restante()
+                if restante is not None and restante <= espera:
+                    contar('descargas_fallidas', dataset=dataset)
+                    raise
+                contar('reintentos', dataset=dataset)
+                logging.warning(f"Fallo transitorio en {simbolo}/{dataset} ({e}). Reintento {intento + 1}/{self.max_reintentos} en {espera:.1f}s.")
+                time.sleep(espera)
+
+
+def grabar_fixtures(simbolos, directorio, proveedor=None):
+    """Graba todos los datasets de cada símbolo para poder reproducirlos con ProveedorFixtures."""
+    proveedor = proveedor or ProveedorYFinance()
+    for simbolo in simbolos:
+        os.makedirs(os.path.join(directorio, simbolo), exist_ok=True)
+        for dataset, valor in proveedor.obtener_todos(simbolo).items():
+            with open(os.path.join(directorio, simbolo, f"{dataset}.pkl"), 'wb') as f:
+                pickle.dump(valor, f, protocol=pickle.HIGHEST_PROTOCOL)
+        logging.info(f"Fixtures grabados para {simbolo} en {directorio}.")
+
+
+_proveedor_por_defecto = None
+
+def obtener_proveedor_por_defecto():
+    global _proveedor_por_defecto
+    if _proveedor_por_defecto is None:
+        _proveedor_por_defecto = ProveedorCache(ProveedorYFinance())
+    return _proveedor_por_defecto
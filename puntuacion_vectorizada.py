@@ -0,0 +1,255 @@
+import numpy as np
+import pandas as pd
+import argparse
+import time
+import logging
+from analizador_acciones import (
+    UMBRALES_POR_SECTOR, SECTORES_CICLICOS, FACTORES_PENALIZACION_ADAPTATIVOS, RSI_SOBREVENTA, RSI_SOBRECOMPRA,
+    ROE_UMBRAL_BUENO, ROE_UMBRAL_ACEPTABLE, FACTOR_DIVIDENDO_JOVEN_NEGATIVO, FACTOR_PENALIZACION_MINIMO,
+    JUECES, PONDERACIONES_JUECES
+)
+
+# ==============================================================================
+# SECCIÓN 1: ESQUEMA DE LA TABLA DE ENTRADA (UNA FILA POR SÍMBOLO)
+# ==============================================================================
+# Columna -> valor por defecto si falta. NaN equivale a "dato no disponible".
+COLUMNAS_ENTRADA = {
+    'sector': 'N/A', 'tiene_info': True,
+    'trailingPE': np.nan, 'priceToBook': np.nan, 'debtToEquity': np.nan, 'returnOnEquity': np.nan,
+    'payoutRatio': np.nan, 'revenueGrowth': np.nan,
+    'tiene_indicadores': False, 'precio_actual': np.nan,
+    'RSI_14': np.nan, 'MACDh_12_26_9': np.nan, 'SMA_50': np.nan, 'SMA_200': np.nan,
+    'rendimiento_div': np.nan, 'crecimiento_div_raw': np.nan, 'anios_consecutivos_dividendo': 0,
+    'tiene_tendencias': False, 'anios_eps_neg': 0, 'anios_fcf_neg': 0,
+    'ingresos_cagr_5a': np.nan, 'roe_promedio_5a': np.nan, 'deuda_creciente': False,
+}
+PONDERACIONES = np.array([PONDERACIONES_JUECES[juez] for juez in JUECES])
+
+
+def tabla_umbrales_sectoriales():
+    tabla = pd.DataFrame.from_dict(UMBRALES_POR_SECTOR, orient='index')
+    tabla['PAYOUT_ALTO_ACEPTABLE'] = tabla.get('PAYOUT_ALTO_ACEPTABLE', pd.Series(dtype=float)).fillna(0.8)
+    return tabla.astype(float)
+
+
+# ==============================================================================
+# SECCIÓN 2: CONSTRUCCIÓN DE LA TABLA A PARTIR DE ANALIZADORES
+# ==============================================================================
+def caracteristicas_analizador(analizador):
+    """Extrae de un AnalizadorAccion ya cargado la fila de entrada del motor vectorizado."""
+    info, tendencias = analizador.info, analizador.tendencias
+    fila = {campo: info.get(campo) for campo in ['trailingPE', 'priceToBook', 'debtToEquity', 'returnOnEquity', 'payoutRatio', 'revenueGrowth']}
+    fila.update(sector=info.get('sector', 'N/A'), tiene_info=bool(info),
+                precio_actual=analizador.datos_completos.get('precio_actual'),
+                rendimiento_div=analizador._calcular_rendimiento_dividendos(),
+                crecimiento_div_raw=analizador._calcular_crecimiento_dividendos(),
+                tiene_tendencias=bool(tendencias))
+    for campo in ['anios_consecutivos_dividendo', 'anios_eps_neg', 'anios_fcf_neg', 'ingresos_cagr_5a', 'roe_promedio_5a', 'deuda_creciente']:
+        if campo in tendencias: fila[campo] = tendencias[campo]
+    hist = analizador.hist_indicadores
+    fila['tiene_indicadores'] = hist is not None and not hist.empty
+    if fila['tiene_indicadores']:
+        ultimo = hist.iloc[-1]
+        for col in ['RSI_14', 'MACDh_12_26_9', 'SMA_50', 'SMA_200']: fila[col] = ultimo.get(col)
+    return fila
+
+
+def construir_tabla(analizadores):
+    filas = {a.simbolo: caracteristicas_analizador(a) for a in analizadores if a.datos_completos}
+    return normalizar_tabla(pd.DataFrame.from_dict(filas, orient='index'))
+
+
+def normalizar_tabla(tabla):
+    tabla = tabla.copy()
+    for columna, defecto in COLUMNAS_ENTRADA.items():
+        if columna not in tabla.columns: tabla[columna] = defecto
+        elif isinstance(defecto, (bool, int)) and not isinstance(defecto, float):
+            tabla[columna] = tabla[columna].fillna(defecto).infer_objects()
+    numericas = [c for c, d in COLUMNAS_ENTRADA.items() if isinstance(d, float)]
+    tabla[numericas] = tabla[numericas].apply(pd.to_numeric, errors='coerce').astype(float)
+    tabla['sector'] = tabla['sector'].fillna('N/A').astype(str)
+    return tabla
+
+
+# ==============================================================================
+# SECCIÓN 3: JUECES VECTORIZADOS (MISMAS REGLAS QUE AnalizadorAccion)
+# ==============================================================================
+def _col(tabla, nombre):
+    return tabla[nombre].to_numpy(dtype=float)
+
+
+def _umbrales_por_fila(sectores, umbrales=None):
+    umbrales = tabla_umbrales_sectoriales() if umbrales is None else umbrales
+    posiciones = umbrales.index.get_indexer(sectores)
+    posiciones[posiciones < 0] = umbrales.index.get_loc('default')
+    return {columna: umbrales[columna].to_numpy()[posiciones] for columna in umbrales.columns}
+
+
+def puntuacion_fundamental(tabla, umbrales=None):
+    u = _umbrales_por_fila(tabla['sector'].to_numpy(), umbrales)
+    pe, pb, deuda = _col(tabla, 'trailingPE'), _col(tabla, 'priceToBook'), _col(tabla, 'debtToEquity') / 100
+    roe, payout = _col(tabla, 'returnOnEquity'), _col(tabla, 'payoutRatio')
+    s_pe = np.where(pe > 0, np.select([pe < u['PE_BAJO'], pe <= u['PE_ALTO']], [100, 75], 25), 0)
+    s_pb = np.where(pb > 0, np.select([pb < u['PB_BUENO'], pb <= u['PB_ALTO']], [100, 50], 0), 50)
+    s_deuda = np.where(np.isnan(deuda), 50, np.select([deuda < u['DEUDA_BAJA'], deuda <= u['DEUDA_ALTA']], [100, 75], 0))
+    s_roe = np.select([roe > ROE_UMBRAL_BUENO, roe > ROE_UMBRAL_ACEPTABLE], [100, 75], 25)
+    s_payout = np.where(np.isnan(payout), 50, np.select([(payout > 0) & (payout <= 0.6), payout <= u['PAYOUT_ALTO_ACEPTABLE']], [100, 75], 0))
+    score = (s_pe + s_pb + s_deuda + s_roe + s_payout) / 5.0
+    return np.where(tabla['tiene_info'].to_numpy(dtype=bool), score, 0.0)
+
+
+def puntuacion_tecnica(tabla):
+    rsi, macd_hist = _col(tabla, 'RSI_14'), _col(tabla, 'MACDh_12_26_9')
+    precio, sma50, sma200 = _col(tabla, 'precio_actual'), _col(tabla, 'SMA_50'), _col(tabla, 'SMA_200')
+    s_rsi = np.select([rsi < RSI_SOBREVENTA, rsi > RSI_SOBRECOMPRA], [100.0, 0.0],
+                      100 - (rsi - RSI_SOBREVENTA) * 100 / (RSI_SOBRECOMPRA - RSI_SOBREVENTA))
+    s_macd = np.where(macd_hist > 0, 90.0, 10.0)
+    s_sma = np.select([
+        (sma50 > sma200) & (precio > sma50), (sma50 < sma200) & (precio < sma50),
+        (precio > sma50) & (precio > sma200), (precio < sma50) & (precio < sma200)
+    ], [100.0, 0.0, 85.0, 15.0], 50.0)
+    hay_rsi, hay_macd = ~np.isnan(rsi), ~np.isnan(macd_hist)
+    suma = np.where(hay_rsi, s_rsi, 0.0) + np.where(hay_macd, s_macd, 0.0) + s_sma
+    score = suma / (1 + hay_rsi + hay_macd)
+    return np.where(tabla['tiene_indicadores'].to_numpy(dtype=bool), score, 50.0)
+
+
+def puntuacion_consistencia_div(tabla):
+    anios = _col(tabla, 'anios_consecutivos_dividendo')
+    return np.select([anios >= 10, anios >= 5, anios > 0], [100.0, 75.0, 25.0], 0.0)
+
+
+def puntuacion_rendimiento(tabla):
+    r = _col(tabla, 'rendimiento_div')
+    score = np.select([r >= 4.5, r >= 2.5], [100.0, 50.0 + (r - 2.5) * 25.0], r * 20.0)
+    return np.where(r > 0, score, 0.0)
+
+
+def puntuacion_crecimiento_div(tabla):
+    c, anios = _col(tabla, 'crecimiento_div_raw'), _col(tabla, 'anios_consecutivos_dividendo')
+    ciclico = tabla['sector'].isin(SECTORES_CICLICOS).to_numpy()
+    negativo = np.where(anios >= 5, 0.0, 25.0)
+    score = np.select([c >= 8.0, c >= 4.0, c >= 0], [100.0, 75.0, 50.0], negativo)
+    return np.select([ciclico, anios < 2, np.isnan(c)], [50.0, 50.0, 25.0], score)
+
+
+def puntuacion_crecimiento_general(tabla):
+    c = _col(tabla, 'revenueGrowth')
+    return np.where(np.isnan(c), 50.0, np.select([c >= 0.05, c >= 0.01], [100.0, 75.0], 25.0))
+
+
+def factor_penalizacion(tabla):
+    f = np.ones(len(tabla))
+    f *= np.where(_col(tabla, 'anios_eps_neg') >= 2, FACTORES_PENALIZACION_ADAPTATIVOS["beneficios_negativos"][0]["factor"], 1.0)
+    f *= np.where(_col(tabla, 'anios_fcf_neg') >= 2, FACTORES_PENALIZACION_ADAPTATIVOS["fcf_negativo"][0]["factor"], 1.0)
+    c, anios = _col(tabla, 'crecimiento_div_raw'), _col(tabla, 'anios_consecutivos_dividendo')
+    reglas_maduro = FACTORES_PENALIZACION_ADAPTATIVOS["dividendo_crecimiento_maduro"]
+    f_maduro = np.select([c < p["umbral"] for p in reglas_maduro], [p["factor"] for p in reglas_maduro], 1.0)
+    f_joven = np.where(c < -0.01, FACTOR_DIVIDENDO_JOVEN_NEGATIVO, 1.0)
+    aplica_div = ~tabla['sector'].isin(SECTORES_CICLICOS).to_numpy() & ~np.isnan(c)
+    f *= np.where(aplica_div, np.where(anios >= 5, f_maduro, f_joven), 1.0)
+    f *= np.where(_col(tabla, 'ingresos_cagr_5a') < 0, FACTORES_PENALIZACION_ADAPTATIVOS["ingresos_crecimiento"][0]["factor"], 1.0)
+    f *= np.where(_col(tabla, 'roe_promedio_5a') < ROE_UMBRAL_ACEPTABLE, FACTORES_PENALIZACION_ADAPTATIVOS["roe"][0]["factor"], 1.0)
+    f *= np.where(tabla['deuda_creciente'].to_numpy(dtype=bool), FACTORES_PENALIZACION_ADAPTATIVOS["deuda"][0]["factor"], 1.0)
+    f = np.maximum(f, FACTOR_PENALIZACION_MINIMO)
+    return np.where(tabla['tiene_tendencias'].to_numpy(dtype=bool), f, 1.0)
+
+
+def matriz_puntuaciones(tabla, umbrales=None):
+    """Matriz (símbolos x JUECES) con la puntuación de cada juez."""
+    columnas = {
+        'fundamental': puntuacion_fundamental(tabla, umbrales), 'consistencia_div': puntuacion_consistencia_div(tabla),
+        'rendimiento_div_score': puntuacion_rendimiento(tabla), 'crecimiento_div_score': puntuacion_crecimiento_div(tabla),
+        'crecimiento_general': puntuacion_crecimiento_general(tabla), 'confianza_mgmt': np.full(len(tabla), 50.0),
+        'tecnica': puntuacion_tecnica(tabla),
+    }
+    return pd.DataFrame(columnas, index=tabla.index)[list(JUECES)]
+
+
+def probabilidad_inversion(puntuaciones, ponderaciones=PONDERACIONES):
+    scores = np.clip(np.nan_to_num(np.asarray(puntuaciones, dtype=float)), 0.0, 100.0)
+    return np.round(np.clip(scores @ ponderaciones, 0.0, 100.0), 2)
+
+
+def puntuar_universo(tabla, umbrales=None):
+    """Equivalente vectorizado de ejecutar_analisis para todas las filas de `tabla` a la vez."""
+    tabla = normalizar_tabla(tabla)
+    resultado = matriz_puntuaciones(tabla, umbrales)
+    resultado['probabilidad_base'] = probabilidad_inversion(resultado[list(JUECES)].to_numpy())
+    resultado['factor_penalizacion'] = factor_penalizacion(tabla)
+    resultado['probabilidad_ajustada'] = resultado['probabilidad_base'] * resultado['factor_penalizacion']
+    return resultado
+
+
+CATEGORIAS = np.array(['COMPRA CÍCLICA', 'COMPRA FUERTE', 'COMPRA POTENCIAL', 'ZONA DE MONITOREO', 'DESCARTAR'])
+
+
+def codigos_recomendacion(probabilidad_ajustada, factor_penalizacion, ciclico):
+    """Índice en CATEGORIAS de cada puntuación. Admite matrices (símbolos x escenarios) con factor y ciclico en columna."""
+    score, f = np.asarray(probabilidad_ajustada, dtype=float), np.asarray(factor_penalizacion, dtype=float)
+    riesgo_bajo, riesgo_moderado = f >= 0.98, (f >= 0.92) & (f < 0.98)
+    return np.select([
+        ciclico & (score >= 60), (score >= 80) & riesgo_bajo,
+        (score >= 70) & (score < 80) & (riesgo_bajo | riesgo_moderado), (score >= 55) & (score < 70)
+    ], [0, 1, 2, 3], 4).astype(np.int8)
+
+
+def recomendaciones(probabilidad_ajustada, factor_penalizacion, sectores):
+    """Versión vectorizada de recomendacion_automatica: devuelve la categoría ('COMPRA FUERTE', ...) de cada fila."""
+    ciclico = pd.Series(sectores).isin(SECTORES_CICLICOS).to_numpy()
+    return CATEGORIAS[codigos_recomendacion(probabilidad_ajustada, factor_penalizacion, ciclico)]
+
+
+# ==============================================================================
+# SECCIÓN 4: VERIFICACIÓN CONTRA EL CAMINO POR OBJETO Y BENCHMARK
+# ==============================================================================
+def comparar_con_analizadores(analizadores, tolerancia=1e-6):
+    """Devuelve las filas en las que el motor vectorizado difiere del cálculo por objeto."""
+    resultado = puntuar_universo(construir_tabla(analizadores))
+    diferencias = []
+    for a in analizadores:
+        if not a.datos_completos: continue
+        if not a.scores: a.ejecutar_analisis()
+        esperado = {j: a.scores[j][0] for j in JUECES}
+        esperado.update(probabilidad_base=a.probabilidad_base, factor_penalizacion=a.factor_penalizacion, probabilidad_ajustada=a.probabilidad_ajustada)
+        for campo, valor in esperado.items():
+            obtenido = resultado.at[a.simbolo, campo]
+            if not np.isclose(obtenido, valor, atol=tolerancia):
+                diferencias.append({'simbolo': a.simbolo, 'campo': campo, 'esperado': valor, 'obtenido': obtenido})
+    return pd.DataFrame(diferencias, columns=['simbolo', 'campo', 'esperado', 'obtenido'])
+
+
+def benchmark(n_analizadores=500, repeticiones=10, semilla=0):
+    from analizador_acciones import AnalizadorAccion
+    from datos_sinteticos import ProveedorSintetico, simbolos_sinteticos
+    proveedor = ProveedorSintetico(semilla)
+    analizadores = [AnalizadorAccion(s, proveedor=proveedor) for s in simbolos_sinteticos(n_analizadores)]
+    diferencias = comparar_con_analizadores(analizadores)
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        for a in analizadores: a.ejecutar_analisis()
+    t_objetos = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    tabla = construir_tabla(analizadores)
+    t_extraccion = time.perf_counter() - inicio
+    tabla = pd.concat([tabla] * repeticiones)
+    inicio = time.perf_counter()
+    puntuar_universo(tabla)
+    t_vectorizado = time.perf_counter() - inicio
+    return {
+        'filas': len(tabla), 'diferencias': len(diferencias), 'segundos_por_objeto': round(t_objetos, 4),
+        'segundos_extraccion_tabla': round(t_extraccion, 4), 'segundos_vectorizado': round(t_vectorizado, 4),
+        'aceleracion': round(t_objetos / t_vectorizado, 1)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara el motor vectorizado con el cálculo por objeto sobre datos sintéticos.")
+    parser.add_argument('--analizadores', type=int, default=500)
+    parser.add_argument('--repeticiones', type=int, default=10, help="Filas totales = analizadores x repeticiones.")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+    r = benchmark(args.analizadores, args.repeticiones)
+    print(f"{r['filas']} filas | diferencias con el cálculo por objeto: {r['diferencias']}")
+    print(f"Por objeto: {r['segundos_por_objeto']}s | Vectorizado: {r['segundos_vectorizado']}s "
+          f"(+{r['segundos_extraccion_tabla']}s extrayendo la tabla) | Aceleración: x{r['aceleracion']}")
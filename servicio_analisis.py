@@ -0,0 +1,305 @@
+import numpy as np
+import argparse
+import json
+import math
+import threading
+import time
+import logging
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as TimeoutFuturo
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import pytz
+from analizador_acciones import AnalizadorAccion
+from proveedores_datos import obtener_proveedor_por_defecto
+
+# ==============================================================================
+# SECCIÓN 1: CONFIGURACIÓN DEL SERVICIO
+# ==============================================================================
+HOST_POR_DEFECTO = '127.0.0.1'
+PUERTO_POR_DEFECTO = 8765
+CAPACIDAD_CACHE = 2000
+TTL_RESULTADOS = 15 * 60
+MAX_ANALISIS_SIMULTANEOS = 8
+MAX_SIMBOLOS_LOTE = 500
+TIMEOUT_ANALISIS = 120
+ZONA_MERCADO = pytz.timezone('America/New_York')
+
+
+# ==============================================================================
+# SECCIÓN 2: CACHE LRU/TTL Y COALESCENCIA DE PETICIONES
+# ==============================================================================
+class CacheLRU:
+    """Cache en memoria con capacidad máxima (expulsa el menos usado) y caducidad por entrada. Segura entre hilos."""
+
+    def __init__(self, capacidad=CAPACIDAD_CACHE, ttl=TTL_RESULTADOS):
+        self.capacidad = capacidad
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None: return None
+            guardado_en, valor = entrada
+            if time.monotonic() - guardado_en > self.ttl:
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = (time.monotonic(), valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.capacidad: self._datos.popitem(last=False)
+
+    def __len__(self):
+        return len(self._datos)
+
+
+def _json_seguro(valor):
+    # NaN/inf no son JSON válido; numpy.float64 ya es float.
+    if isinstance(valor, float) and not math.isfinite(valor): return None
+    return valor
+
+
+class ServicioAnalisis:
+    """Análisis con cache por (símbolo, fecha de sesión) y una sola ejecución en curso por clave.
+
+    La fecha de sesión (día de mercado en Nueva York) forma parte de la clave para que los resultados de un día
+    nunca se sirvan al siguiente aunque el TTL no haya vencido; `fecha_datos` en la respuesta es la de la última barra.
+    Con un IndicePercentiles, cada análisis registra en él la info que acaba de obtener y el juez fundamental puntúa
+    contra los cuartiles actuales del sector.
+    """
+
+    def __init__(self, proveedor=None, capacidad=CAPACIDAD_CACHE, ttl=TTL_RESULTADOS, max_simultaneos=MAX_ANALISIS_SIMULTANEOS,
+                 indice_percentiles=None):
+        self.proveedor = proveedor or obtener_proveedor_por_defecto()
+        self.indice_percentiles = indice_percentiles
+        self.cache = CacheLRU(capacidad, ttl)
+        self._en_curso = {}
+        self._lock = threading.Lock()
+        self._ejecutor = ThreadPoolExecutor(max_workers=max_simultaneos, thread_name_prefix='servicio')
+        self.estadisticas = {'peticiones': 0, 'aciertos_cache': 0, 'coalescidas': 0, 'analisis': 0, 'sin_datos': 0, 'parciales': 0, 'errores': 0}
+
+    def _contar(self, clave):
+        with self._lock: self.estadisticas[clave] += 1
+
+    @staticmethod
+    def _fecha_sesion():
+        return datetime.now(ZONA_MERCADO).strftime('%Y-%m-%d')
+
+    def _calcular(self, simbolo):
+        self._contar('analisis')
+        analizador = AnalizadorAccion(simbolo, proveedor=self.proveedor, indice_percentiles=self.indice_percentiles)
+        if not analizador.datos_completos: return None
+        if self.indice_percentiles is not None: self.indice_percentiles.actualizar(simbolo, analizador.info)
+        analizador.ejecutar_analisis()
+        resultado = analizador.resultado(liberar=True)
+        return {clave: _json_seguro(valor) for clave, valor in resultado.a_dict().items()}
+
+    def _futuro(self, simbolo):
+        """Devuelve (futuro, origen); solo la primera petición de una clave lanza el análisis."""
+        clave = (simbolo, self._fecha_sesion())
+        with self._lock:
+            self.estadisticas['peticiones'] += 1
+            valor = self.cache.obtener(clave)
+            if valor is not None:
+                self.estadisticas['aciertos_cache'] += 1
+                futuro = Future()
+                futuro.set_result(valor)
+                return futuro, 'cache'
+            if clave in self._en_curso:
+                self.estadisticas['coalescidas'] += 1
+                return self._en_curso[clave], 'compartido'
+            futuro = self._en_curso[clave] = self._ejecutor.submit(self._calcular, simbolo)
+        futuro.add_done_callback(lambda f: self._terminar(clave, f))
+        return futuro, 'calculado'
+
+    def _terminar(self, clave, futuro):
+        # Se guarda en cache antes de retirar el análisis en curso para que ninguna petición lo repita entre medias.
+        if futuro.exception() is not None:
+            logging.error(f"Fallo analizando {clave[0]}: {futuro.exception()}")
+            self._contar('errores')
+        elif futuro.result() is None:
+            self._contar('sin_datos')
+        elif futuro.result()['datasets_fallidos']:
+            # Se responde, pero no se guarda: la siguiente petición vuelve a intentar las descargas que fallaron.
+            self._contar('parciales')
+        else:
+            self.cache.guardar(clave, futuro.result())
+        with self._lock:
+            self._en_curso.pop(clave, None)
+
+    def analizar(self, simbolo, timeout=TIMEOUT_ANALISIS):
+        """Devuelve (registro como dict o None si no hay datos, origen: 'cache' | 'compartido' | 'calculado')."""
+        futuro, origen = self._futuro(simbolo.strip().upper())
+        return futuro.result(timeout=timeout), origen
+
+    def analizar_lote(self, simbolos, timeout=TIMEOUT_ANALISIS):
+        """Lanza todos los símbolos a la vez (compartiendo cache y análisis en curso) y espera a que terminen."""
+        simbolos = list(dict.fromkeys(s.strip().upper() for s in simbolos if s and s.strip()))
+        futuros = {s: self._futuro(s) for s in simbolos}
+        limite = time.monotonic() + timeout
+        respuesta = {}
+        for simbolo, (futuro, origen) in futuros.items():
+            try:
+                respuesta[simbolo] = {'resultado': futuro.result(timeout=max(0.0, limite - time.monotonic())), 'origen': origen}
+            except (TimeoutError, TimeoutFuturo):
+                respuesta[simbolo] = {'resultado': None, 'origen': origen, 'error': f"Sin respuesta en {timeout}s.", 'timeout': True}
+            except Exception as e:
+                respuesta[simbolo] = {'resultado': None, 'origen': origen, 'error': str(e) or type(e).__name__}
+        return respuesta
+
+    def cerrar(self):
+        self._ejecutor.shutdown(wait=False, cancel_futures=True)
+
+
+# ==============================================================================
+# SECCIÓN 3: API HTTP/JSON
+# ==============================================================================
+class _Manejador(BaseHTTPRequestHandler):
+    servicio = None  # lo fija crear_servidor
+
+    def log_message(self, formato, *args):
+        logging.debug(f"{self.address_string()} {formato % args}")
+
+    def _responder(self, codigo, cuerpo):
+        datos = json.dumps(cuerpo, ensure_ascii=False).encode('utf-8')
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _lote(self, simbolos):
+        if not simbolos: return self._responder(400, {'error': "Indica al menos un símbolo."})
+        if len(simbolos) > MAX_SIMBOLOS_LOTE: return self._responder(400, {'error': f"Máximo {MAX_SIMBOLOS_LOTE} símbolos por lote."})
+        self._responder(200, {'resultados': self.servicio.analizar_lote(simbolos)})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        partes = [p for p in url.path.split('/') if p]
+        try:
+            if partes == ['salud']:
+                return self._responder(200, {'estado': 'ok', 'en_cache': len(self.servicio.cache)})
+            if partes == ['estadisticas']:
+                return self._responder(200, dict(self.servicio.estadisticas, en_cache=len(self.servicio.cache)))
+            if len(partes) == 2 and partes[0] == 'analisis':
+                resultado, origen = self.servicio.analizar(partes[1])
+                if resultado is None: return self._responder(404, {'error': f"Sin datos válidos para {partes[1].upper()}."})
+                return self._responder(200, {'resultado': resultado, 'origen': origen})
+            if partes == ['lote']:
+                return self._lote([s for valor in parse_qs(url.query).get('simbolos', []) for s in valor.split(',')])
+            self._responder(404, {'error': f"Ruta desconocida: {url.path}"})
+        except (TimeoutError, TimeoutFuturo):
+            # El análisis sigue en curso (y se guardará en cache); quien pregunte después lo encontrará.
+            self._responder(504, {'error': f"El análisis no terminó en {TIMEOUT_ANALISIS}s; vuelve a intentarlo."})
+        except Exception as e:
+            logging.error(f"Error atendiendo {self.path}: {e}")
+            self._responder(500, {'error': str(e) or type(e).__name__})
+
+    def do_POST(self):
+        if urlparse(self.path).path.rstrip('/') != '/lote': return self._responder(404, {'error': f"Ruta desconocida: {self.path}"})
+        try:
+            cuerpo = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            simbolos = (cuerpo.get('simbolos') or []) if isinstance(cuerpo, dict) else None
+            if not isinstance(simbolos, list) or not all(isinstance(s, str) for s in simbolos):
+                return self._responder(400, {'error': "Se espera un objeto JSON {\"simbolos\": [\"AAPL\", ...]}."})
+            self._lote(simbolos)
+        except json.JSONDecodeError:
+            self._responder(400, {'error': "Cuerpo JSON inválido; se espera {\"simbolos\": [...]}."})
+        except Exception as e:
+            logging.error(f"Error atendiendo el lote: {e}")
+            self._responder(500, {'error': str(e) or type(e).__name__})
+
+
+def crear_servidor(servicio, host=HOST_POR_DEFECTO, puerto=PUERTO_POR_DEFECTO):
+    """ThreadingHTTPServer con las rutas GET /analisis/<SIMBOLO>, GET /lote?simbolos=A,B, POST /lote, GET /salud y GET /estadisticas."""
+    manejador = type('Manejador', (_Manejador,), {'servicio': servicio})
+    servidor = ThreadingHTTPServer((host, puerto), manejador)
+    servidor.daemon_threads = True
+    return servidor
+
+
+# ==============================================================================
+# SECCIÓN 4: PRUEBA DE CARGA
+# ==============================================================================
+def prueba_carga(url_base, simbolos, peticiones=2000, concurrencia=16, timeout=TIMEOUT_ANALISIS):
+    """Lanza `peticiones` GET /analisis/<SIMBOLO> repartidas entre `simbolos` y devuelve peticiones/s y percentiles de latencia."""
+    def pedir(i):
+        inicio = time.perf_counter()
+        try:
+            with urllib.request.urlopen(f"{url_base}/analisis/{simbolos[i % len(simbolos)]}", timeout=timeout) as respuesta:
+                respuesta.read()
+                codigo = respuesta.status
+        except urllib.error.HTTPError as e:
+            codigo = e.code
+        return time.perf_counter() - inicio, codigo
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as executor:
+        medidas = list(executor.map(pedir, range(peticiones)))
+    duracion = time.perf_counter() - inicio
+    latencias = np.array([m[0] for m in medidas]) * 1000
+    return {'peticiones': peticiones, 'concurrencia': concurrencia, 'simbolos': len(simbolos), 'segundos': round(duracion, 2),
+            'peticiones_por_segundo': round(peticiones / duracion, 1),
+            'p50_ms': round(float(np.percentile(latencias, 50)), 2), 'p95_ms': round(float(np.percentile(latencias, 95)), 2),
+            'p99_ms': round(float(np.percentile(latencias, 99)), 2), 'max_ms': round(float(latencias.max()), 2),
+            'errores': sum(1 for _, codigo in medidas if codigo != 200)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servicio HTTP/JSON local de análisis con cache LRU/TTL y coalescencia de peticiones.")
+    parser.add_argument('--host', default=HOST_POR_DEFECTO)
+    parser.add_argument('--puerto', type=int, default=PUERTO_POR_DEFECTO)
+    parser.add_argument('--capacidad', type=int, default=CAPACIDAD_CACHE, help="Resultados máximos en cache.")
+    parser.add_argument('--ttl', type=float, default=TTL_RESULTADOS, help="Segundos de validez de un resultado.")
+    parser.add_argument('--sintetico', action='store_true', help="Sirve datos sintéticos (sin conexión).")
+    parser.add_argument('--prueba-carga', type=int, metavar='PETICIONES',
+                        help="Arranca el servicio con datos sintéticos en un puerto libre, lanza la prueba de carga y termina.")
+    parser.add_argument('--concurrencia', type=int, default=16)
+    parser.add_argument('--simbolos-prueba', type=int, default=50)
+    parser.add_argument('--umbrales-adaptativos', action='store_true',
+                        help="Umbrales del juez fundamental según los cuartiles del sector (percentiles_sector.py), al día con cada análisis.")
+    parser.add_argument('--universo', help="Fichero con un símbolo por línea cuya info llena el índice al arrancar (con --umbrales-adaptativos).")
+    args = parser.parse_args()
+    if args.universo and not args.umbrales_adaptativos: parser.error("--universo requiere --umbrales-adaptativos.")
+    proveedor = None
+    if args.sintetico or args.prueba_carga:
+        from datos_sinteticos import ProveedorSintetico, simbolos_sinteticos
+        proveedor = ProveedorSintetico()
+    indice = None
+    if args.umbrales_adaptativos:
+        from percentiles_sector import IndicePercentiles
+        indice = IndicePercentiles()
+    servicio = ServicioAnalisis(proveedor, args.capacidad, args.ttl, indice_percentiles=indice)
+    if args.universo:
+        from analisis_lote import leer_simbolos
+        universo = [s.strip().upper() for s in leer_simbolos(args.universo)]
+        indice.cargar_proveedor(servicio.proveedor, universo)
+        logging.info(f"Índice de percentiles con {len(indice)} de {len(universo)} símbolos del universo.")
+    if args.prueba_carga:
+        logging.getLogger().setLevel(logging.WARNING)
+        servidor = crear_servidor(servicio, '127.0.0.1', 0)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{servidor.server_address[1]}"
+        resultado = prueba_carga(url, simbolos_sinteticos(args.simbolos_prueba), args.prueba_carga, args.concurrencia)
+        servidor.shutdown()
+        print(json.dumps(resultado, indent=2))
+        print(json.dumps(servicio.estadisticas, indent=2))
+    else:
+        servidor = crear_servidor(servicio, args.host, args.puerto)
+        logging.info(f"Servicio de análisis escuchando en http://{args.host}:{servidor.server_address[1]}")
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            servidor.server_close()
+            servicio.cerrar()
@@ -0,0 +1,56 @@
+import logging
+import numpy as np
+import pytest
+from analizador_acciones import AnalizadorAccion
+from datos_sinteticos import ProveedorSintetico, simbolos_sinteticos
+
+# ==============================================================================
+# PARIDAD DE LOS CAMINOS OPTIMIZADOS CON AnalizadorAccion (UNIVERSO SINTÉTICO)
+# ==============================================================================
+N_SIMBOLOS = 60
+logging.getLogger().setLevel(logging.ERROR)
+
+
+@pytest.fixture(scope='module')
+def proveedor():
+    return ProveedorSintetico(0)
+
+
+def test_puntuacion_vectorizada(proveedor):
+    from puntuacion_vectorizada import comparar_con_analizadores
+    analizadores = [AnalizadorAccion(s, proveedor=proveedor) for s in simbolos_sinteticos(N_SIMBOLOS)]
+    diferencias = comparar_con_analizadores(analizadores)
+    assert diferencias.empty, diferencias.head().to_string()
+
+
+def test_indicadores_incrementales(proveedor):
+    pytest.importorskip('pandas_ta')
+    from indicadores_incrementales import MotorIndicadores
+    motor, diferencias = MotorIndicadores(), []
+    for s in simbolos_sinteticos(N_SIMBOLOS):
+        referencia, incremental = AnalizadorAccion(s, proveedor=proveedor), AnalizadorAccion(s, proveedor=proveedor, motor_indicadores=motor)
+        referencia.ejecutar_analisis(); incremental.ejecutar_analisis()
+        if not referencia.datos_completos: continue
+        esperado, obtenido = referencia.scores['tecnica'], incremental.scores['tecnica']
+        if not np.isclose(esperado[0], obtenido[0]) or esperado[1] != obtenido[1]: diferencias.append(s)
+    assert diferencias == []
+
+
+def test_almacen_dividendos():
+    from dividendos_columnar import benchmark
+    assert benchmark(N_SIMBOLOS)['diferencias'] == 0
+
+
+@pytest.mark.parametrize('etiquetas_actuales', [True, False])
+def test_modo_compacto(etiquetas_actuales):
+    from datos_compactos import comprobar_paridad
+    resultado = comprobar_paridad(N_SIMBOLOS, etiquetas_actuales=etiquetas_actuales)
+    assert resultado['diferencias'] == 0, resultado['ejemplos']
+
+
+def test_memo_etapas(tmp_path):
+    from memo_etapas import medir
+    tabla, cache = medir(N_SIMBOLOS, ruta=str(tmp_path / 'memo_etapas.sqlite'))
+    assert tabla['diferencias'].sum() == 0, tabla.to_string()
+    assert tabla.loc['repetida', 'etapas_calculadas'] == 0  # la pasada repetida sale entera de la memo
+    assert tabla.loc['umbral_technology', 'etapas_calculadas'] > 0  # y el cambio de umbral invalida lo que depende de él
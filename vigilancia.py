@@ -0,0 +1,256 @@
+import pandas as pd
+import argparse
+import hashlib
+import pickle
+import time
+import logging
+from datetime import datetime
+from analizador_acciones import AnalizadorAccion, DEPENDENCIAS, UMBRALES_POR_SECTOR, nivel_riesgo, recomendacion_automatica
+from proveedores_datos import DATASETS, TTL_POR_DATASET, obtener_proveedor_por_defecto
+
+# ==============================================================================
+# SECCIÓN 1: CONFIGURACIÓN Y GRAFO DE DEPENDENCIAS
+# ==============================================================================
+INTERVALO_CICLO = 15 * 60
+
+
+def _orden_topologico(dependencias):
+    orden, visitados = [], set()
+
+    def visitar(nodo):
+        if nodo in visitados: return
+        visitados.add(nodo)
+        for previo in dependencias.get(nodo, ()): visitar(previo)
+        if nodo in dependencias: orden.append(nodo)
+
+    for nodo in dependencias: visitar(nodo)
+    return orden
+
+
+ORDEN_RECALCULO = _orden_topologico(DEPENDENCIAS)
+
+
+def afectados(cambiados):
+    """Nodos derivados (en orden de recálculo) que dependen directa o indirectamente de alguna entrada cambiada."""
+    sucios = set(cambiados)
+    for nodo in ORDEN_RECALCULO:
+        if any(previo in sucios for previo in DEPENDENCIAS[nodo]): sucios.add(nodo)
+    return [nodo for nodo in ORDEN_RECALCULO if nodo in sucios]
+
+
+def huella(valor):
+    """Resumen estable del contenido de un dataset para saber si ha cambiado desde la última descarga."""
+    if valor is None: return None
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        contenido = pd.util.hash_pandas_object(valor, index=True).values.tobytes()
+        columnas = repr(list(valor.columns)).encode() if isinstance(valor, pd.DataFrame) else b''
+        return hashlib.sha1(contenido + columnas).hexdigest()
+    return hashlib.sha1(pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()
+
+
+# ==============================================================================
+# SECCIÓN 2: ESTADO POR SÍMBOLO Y RECÁLCULO SELECTIVO
+# ==============================================================================
+class SimboloVigilado:
+    """Un analizador vivo entre ciclos más la huella y la hora de descarga de cada dataset."""
+
+    def __init__(self, simbolo, proveedor, motor_indicadores=None, indice_percentiles=None):
+        self.simbolo = simbolo
+        self.proveedor = proveedor
+        self.indice_percentiles = indice_percentiles
+        self.analizador = AnalizadorAccion(simbolo, proveedor=proveedor, motor_indicadores=motor_indicadores, indice_percentiles=indice_percentiles)
+        self.huellas = {}
+        self.descargado_en = {}
+        self.calendario = {}
+        self.umbrales = None
+
+    def _calendario_actual(self):
+        hoy = datetime.now()
+        return {'fecha': hoy.date(), 'anio': hoy.year}
+
+    def _hora_descarga(self, dataset, ahora):
+        # La de la copia que sirvió la cache, no la del ciclo: si ya llevaba horas guardada, vence antes.
+        obtenido_en = self.proveedor.obtenido_en(self.simbolo, dataset)
+        return ahora if obtenido_en is None else min(ahora, obtenido_en)
+
+    def _umbrales(self):
+        # Umbrales con los que puntúa el juez fundamental; con el índice cambian al refrescarse otros símbolos del sector.
+        if self.indice_percentiles is None: return None
+        sector = self.analizador.info.get('sector', 'N/A')
+        return self.indice_percentiles.umbrales(sector, UMBRALES_POR_SECTOR.get(sector, UMBRALES_POR_SECTOR['default']))
+
+    def analisis_inicial(self, ahora):
+        a = self.analizador
+        if not a.datos_completos: return False
+        if self.indice_percentiles is not None: self.indice_percentiles.actualizar(self.simbolo, a.info)
+        self.umbrales = self._umbrales()
+        a.ejecutar_analisis()
+        for dataset in a.datos_completos.cargados():
+            if dataset in a.datasets_fallidos: continue  # sin hora de descarga: se reintenta en el próximo ciclo
+            self.huellas[dataset] = huella(a.datos_completos.get(dataset))
+            self.descargado_en[dataset] = self._hora_descarga(dataset, ahora)
+        self.calendario = self._calendario_actual()
+        return True
+
+    def refrescar(self, ahora, intervalos, informe):
+        """Descarga los datasets vencidos y recalcula solo los nodos que dependen de lo que cambió."""
+        a = self.analizador
+        cambiados = set()
+        for dataset in DATASETS:
+            if ahora - self.descargado_en.get(dataset, float('-inf')) < intervalos.get(dataset, 0):
+                informe['descargas_omitidas'] += 1
+                continue
+            try:
+                # Vencido el intervalo, una copia de la cache más antigua que él no vale aunque siga dentro de su TTL.
+                valor = self.proveedor.obtener_reciente(self.simbolo, dataset, intervalos.get(dataset, 0))
+            except Exception as e:
+                logging.error(f"No se pudo refrescar {self.simbolo}/{dataset}: {e}. Se mantiene la versión anterior.")
+                informe['descargas_fallidas'] += 1
+                continue
+            informe['descargas'] += 1
+            self.descargado_en[dataset] = self._hora_descarga(dataset, ahora)
+            nueva = huella(valor)
+            if nueva == self.huellas.get(dataset): continue
+            self.huellas[dataset] = nueva
+            a.datos_completos[dataset] = valor
+            if dataset == 'info':
+                a.info = valor or {}
+                if self.indice_percentiles is not None: self.indice_percentiles.actualizar(self.simbolo, a.info)
+            cambiados.add(dataset)
+        calendario = self._calendario_actual()
+        cambiados.update(clave for clave, valor in calendario.items() if self.calendario.get(clave) != valor)
+        self.calendario = calendario
+        informe['datasets_cambiados'] += len(cambiados & set(DATASETS))
+
+        recalcular = afectados(cambiados)
+        umbrales = self._umbrales()
+        if umbrales != self.umbrales:
+            # Otro símbolo del sector movió sus cuartiles: solo el juez fundamental los lee.
+            self.umbrales = umbrales
+            if 'fundamental' not in recalcular: recalcular.append('fundamental')
+        informe['nodos_omitidos'] += len(ORDEN_RECALCULO) - len(recalcular)
+        if not recalcular: return False
+        calculos = a._calculos_jueces()
+        for nodo in recalcular:
+            informe['recalculos'][nodo] = informe['recalculos'].get(nodo, 0) + 1
+            if nodo == 'precio_actual': a.datos_completos['precio_actual'] = a.datos_completos.get('precios_historicos')['Close'].iloc[-1]
+            elif nodo == 'hist_indicadores': a.hist_indicadores = a._calcular_indicadores_tecnicos()
+            elif nodo == 'tendencias': a.tendencias = a._analizar_tendencias_historicas()
+            elif nodo == 'crecimiento_div_raw': a.scores['crecimiento_div_raw'] = (a._calcular_crecimiento_dividendos(), [])
+            elif nodo == 'penalizacion': a.factor_penalizacion, a.razones_penalizacion = a._calcular_penalizacion_dinamica()
+            else: a.scores[nodo] = calculos[nodo]()
+        a.probabilidad_base = a._calcular_probabilidad_inversion()
+        a.probabilidad_ajustada = a.probabilidad_base * a.factor_penalizacion
+        return True
+
+    def fila(self):
+        a = self.analizador
+        sector = a.info.get('sector', 'N/A')
+        return {'simbolo': self.simbolo, 'nombre': a.info.get('longName', 'N/A'), 'sector': sector,
+                'precio_actual': a.datos_completos.get('precio_actual'), 'probabilidad_base': a.probabilidad_base,
+                'factor_penalizacion': a.factor_penalizacion, 'probabilidad_ajustada': round(a.probabilidad_ajustada, 2),
+                'nivel_riesgo': nivel_riesgo(a.factor_penalizacion)[0],
+                'recomendacion': recomendacion_automatica(a.probabilidad_ajustada, a.factor_penalizacion, sector)}
+
+
+# ==============================================================================
+# SECCIÓN 3: DEMONIO DE LA LISTA DE SEGUIMIENTO
+# ==============================================================================
+class Vigilante:
+    """Mantiene una lista de seguimiento al día refrescando cada dataset según su propio intervalo."""
+
+    def __init__(self, simbolos, proveedor=None, intervalos=None, motor_indicadores=None, indice_percentiles=None):
+        self.proveedor = proveedor or obtener_proveedor_por_defecto()
+        self.intervalos = {**TTL_POR_DATASET, **(intervalos or {})}
+        self.motor_indicadores = motor_indicadores
+        # Con un IndicePercentiles, el juez fundamental puntúa contra los cuartiles actuales del sector en la lista.
+        self.indice_percentiles = indice_percentiles
+        self.simbolos = {s: SimboloVigilado(s, self.proveedor, motor_indicadores, indice_percentiles) for s in dict.fromkeys(simbolos)}
+        self.ciclos = 0
+
+    def ciclo(self, ahora=None):
+        """Un ciclo de refresco. Devuelve un informe con el trabajo hecho y el omitido."""
+        ahora = time.time() if ahora is None else ahora
+        inicio = time.perf_counter()
+        informe = {'ciclo': self.ciclos + 1, 'simbolos': len(self.simbolos), 'iniciales': 0, 'sin_datos': 0, 'actualizados': 0,
+                   'descargas': 0, 'descargas_omitidas': 0, 'descargas_fallidas': 0, 'datasets_cambiados': 0,
+                   'nodos_omitidos': 0, 'recalculos': {}}
+        nuevos = [simbolo for simbolo, vigilado in self.simbolos.items() if not vigilado.descargado_en]
+        # La info de los que aún no tienen análisis entra al índice antes de puntuar a ninguno (la cache la reutiliza).
+        if self.indice_percentiles is not None and nuevos: self.indice_percentiles.cargar_proveedor(self.proveedor, nuevos)
+        for simbolo, vigilado in self.simbolos.items():
+            try:
+                if not vigilado.descargado_en:
+                    if vigilado.analisis_inicial(ahora): informe['iniciales'] += 1
+                    else:
+                        informe['sin_datos'] += 1
+                        vigilado.analizador = AnalizadorAccion(simbolo, proveedor=self.proveedor, motor_indicadores=self.motor_indicadores,
+                                                               indice_percentiles=self.indice_percentiles)
+                elif vigilado.refrescar(ahora, self.intervalos, informe):
+                    informe['actualizados'] += 1
+            except Exception as e:
+                logging.error(f"Fallo refrescando {simbolo}: {e}")
+        recalculados = sum(informe['recalculos'].values())
+        total = recalculados + informe['nodos_omitidos']
+        informe['nodos_recalculados'] = recalculados
+        informe['trabajo_omitido'] = round(informe['nodos_omitidos'] / total, 3) if total else None
+        informe['segundos'] = round(time.perf_counter() - inicio, 3)
+        self.ciclos += 1
+        return informe
+
+    def ranking(self):
+        filas = [v.fila() for v in self.simbolos.values() if v.descargado_en]
+        ranking = pd.DataFrame(filas).sort_values('probabilidad_ajustada', ascending=False).reset_index(drop=True) if filas else pd.DataFrame()
+        ranking.index += 1
+        return ranking
+
+    def ejecutar(self, intervalo_ciclo=INTERVALO_CICLO, max_ciclos=None, salida=None):
+        while max_ciclos is None or self.ciclos < max_ciclos:
+            informe = self.ciclo()
+            logging.info(f"Ciclo {informe['ciclo']}: {informe['descargas']} descargas ({informe['descargas_omitidas']} omitidas), "
+                         f"{informe['datasets_cambiados']} datasets cambiados, {informe['nodos_recalculados']} recálculos "
+                         f"({informe['nodos_omitidos']} omitidos, {informe['trabajo_omitido']}) en {informe['segundos']}s.")
+            if salida: self.ranking().to_csv(salida, index_label='posicion')
+            if max_ciclos is not None and self.ciclos >= max_ciclos: break
+            time.sleep(intervalo_ciclo)
+
+
+def _intervalo(texto):
+    dataset, _, segundos = texto.partition('=')
+    if dataset not in DATASETS or not segundos: raise argparse.ArgumentTypeError(f"Usa DATASET=SEGUNDOS con DATASET en {DATASETS}.")
+    return dataset, float(segundos)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Demonio que mantiene una lista de seguimiento recalculando solo lo que cambia.")
+    parser.add_argument('simbolos', nargs='*')
+    parser.add_argument('--archivo', help="Fichero con un símbolo por línea.")
+    parser.add_argument('--ciclo', type=float, default=INTERVALO_CICLO, help="Segundos entre ciclos.")
+    parser.add_argument('--ciclos', type=int, help="Termina tras N ciclos.")
+    parser.add_argument('--intervalo', type=_intervalo, action='append', default=[], metavar='DATASET=SEGUNDOS',
+                        help="Intervalo de refresco de un dataset (por defecto, su TTL de cache).")
+    parser.add_argument('--incremental', action='store_true', help="Indicadores técnicos con estado incremental (MotorIndicadores).")
+    parser.add_argument('--compacto', action='store_true', help="Guarda solo los campos que leen los jueces (datos_compactos.py).")
+    parser.add_argument('--salida', help="CSV con el ranking, reescrito al final de cada ciclo.")
+    parser.add_argument('--umbrales-adaptativos', action='store_true',
+                        help="Umbrales del juez fundamental según los cuartiles del sector en la lista, al día con cada refresco de info.")
+    args = parser.parse_args()
+    simbolos = list(args.simbolos)
+    if args.archivo:
+        from analisis_lote import leer_simbolos
+        simbolos += leer_simbolos(args.archivo)
+    if not simbolos: parser.error("Indica al menos un símbolo o un --archivo.")
+    motor = None
+    if args.incremental:
+        from indicadores_incrementales import MotorIndicadores
+        motor = MotorIndicadores()
+    proveedor = None
+    if args.compacto:
+        from datos_compactos import ProveedorCompacto, IndicadoresUltimaFila
+        proveedor, motor = ProveedorCompacto(obtener_proveedor_por_defecto()), motor or IndicadoresUltimaFila()
+    indice = None
+    if args.umbrales_adaptativos:
+        from percentiles_sector import IndicePercentiles
+        indice = IndicePercentiles()
+    vigilante = Vigilante([s.strip().upper() for s in simbolos], proveedor, dict(args.intervalo), motor, indice)
+    vigilante.ejecutar(args.ciclo, args.ciclos, args.salida)